@@ -0,0 +1,517 @@
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ספי ציון חריגה (ביחידות סטיית תקן) לאזהרה ולמצב קריטי
+Z_WARNING = 3.0
+Z_CRITICAL = 4.5
+
+# מספר דגימות חימום לפני שגלאי מתחיל לדווח
+WARMUP_SAMPLES = 10
+
+# קבוע הנרמול של MAD לסטיית תקן בהתפלגות נורמלית
+MAD_SCALE = 0.6745
+
+# חלון הניקוד ההיסטורי (בדגימות) ותקציב האלמנטים לבלוק אחד בניקוד באצווה -
+# בלוקים קטנים (כחצי מגה-בייט למערך זמני) נשארים במטמון המעבד ומהירים יותר
+ROLLING_WINDOW = 60
+SCORE_CHUNK_ELEMENTS = 65_536
+
+# תיאור התבנית שכל גלאי מזהה - לכרטיסי האנומליות
+DETECTOR_PATTERNS = {
+    'welford': 'חריגה מהממוצע ההיסטורי',
+    'ewma': 'סטייה מהמגמה האחרונה',
+    'cusum': 'סחף מצטבר',
+    'robust_z': 'קפיצה חדה ביחס לחציון',
+}
+
+
+class AnomalyEvent(NamedTuple):
+    """אירוע אנומליה שזוהה בדגימה אחת על ידי גלאי אחד"""
+    sensor: str
+    timestamp: object
+    value: float
+    detector: str
+    score: float
+    severity: str
+
+
+def severity_for(score, warning=Z_WARNING, critical=Z_CRITICAL):
+    """מחזיר 'critical', 'warning' או None לפי ערך מוחלט של ציון"""
+    score = abs(score)
+    if score >= critical:
+        return 'critical'
+    if score >= warning:
+        return 'warning'
+    return None
+
+
+def _linear_recurrence(c, u, y0, block=256):
+    """מחשב y[t] = c*y[t-1] + u[t] לכל המערך, בבלוקים (פתרון סגור בכל בלוק)"""
+    out = np.empty(len(u))
+    powers = c ** np.arange(1, block + 1)
+    for start in range(0, len(u), block):
+        segment = u[start:start + block]
+        p = powers[:len(segment)]
+        out[start:start + len(segment)] = p * (y0 + np.cumsum(segment / p))
+        y0 = out[start + len(segment) - 1]
+    return out
+
+
+def _median_rows(rows, chunk=65536):
+    """חציון של כל שורה בעזרת np.partition (מהיר מ-np.median), בנתחים לחיסכון בזיכרון"""
+    width = rows.shape[1]
+    middle = [width // 2] if width % 2 else [width // 2 - 1, width // 2]
+    out = np.empty(len(rows))
+    for start in range(0, len(rows), chunk):
+        part = np.partition(rows[start:start + chunk], middle, axis=1)
+        out[start:start + chunk] = part[:, middle].mean(axis=1)
+    return out
+
+
+def _mad_rows(rows, medians, chunk=65536):
+    """סטייה מוחלטת חציונית (MAD) של כל שורה סביב החציון שלה"""
+    out = np.empty(len(rows))
+    for start in range(0, len(rows), chunk):
+        part = rows[start:start + chunk]
+        out[start:start + chunk] = _median_rows(np.abs(part - medians[start:start + chunk, None]))
+    return out
+
+
+class WelfordDetector:
+    """ממוצע ושונות מצטברים (אלגוריתם Welford) - ציון z ביחס לכל ההיסטוריה"""
+    name = 'welford'
+    warning, critical = Z_WARNING, Z_CRITICAL
+
+    def __init__(self, warmup=WARMUP_SAMPLES):
+        self.warmup = warmup
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def score(self, x):
+        if self.n < self.warmup or self.m2 <= 0:
+            return math.nan
+        return (x - self.mean) / math.sqrt(self.m2 / (self.n - 1))
+
+    def update(self, x):
+        """מעדכן את המצב בדגימה אחת ומחזיר את הציון שלה (לפני העדכון)
+
+        מסלול הדגימה הבודדת הוא פייתון סקלרי בלבד (math ולא numpy) - קריאה ל-numpy על
+        סקלר עולה יותר מכל החישוב.
+        """
+        z = self.score(x)
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        return z
+
+    def update_batch(self, x):
+        """גרסה וקטורית של update לאצווה - אותם ציונים ואותו מצב סופי"""
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return np.empty(0)
+
+        # סכומים מצטברים של סטיות מנקודת הזזה c - הסטטיסטיקה שלפני כל דגימה
+        c = self.mean if self.n else x[0]
+        d = x - c
+        s1 = np.concatenate([[0.0], np.cumsum(d)])
+        s2 = np.concatenate([[0.0], np.cumsum(d * d)])
+        counts = self.n + np.arange(len(x) + 1)
+        prior_sum = self.n * (self.mean - c)
+        a = prior_sum + s1
+        b = self.m2 + self.n * (self.mean - c) ** 2 + s2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = c + a / counts
+            m2 = np.maximum(b - a * a / counts, 0.0)
+            std = np.sqrt(m2 / (counts - 1))
+            z = (x - means[:-1]) / std[:-1]
+        z[(counts[:-1] < self.warmup) | (m2[:-1] <= 0)] = np.nan
+
+        self.n = int(counts[-1])
+        self.mean = float(means[-1])
+        self.m2 = float(m2[-1])
+        return z
+
+
+class EwmaDetector:
+    """ממוצע ושונות נעים אקספוננציאלית - ציון z ביחס למגמה האחרונה"""
+    name = 'ewma'
+    warning, critical = Z_WARNING, Z_CRITICAL
+
+    def __init__(self, alpha=0.1, warmup=WARMUP_SAMPLES):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def score(self, x):
+        if self.n < self.warmup or self.var <= 0:
+            return math.nan
+        return (x - self.mean) / math.sqrt(self.var)
+
+    def update(self, x):
+        z = self.score(x)
+        if self.n == 0:
+            self.mean = x
+        else:
+            delta = x - self.mean
+            self.mean += self.alpha * delta
+            self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+        self.n += 1
+        return z
+
+    def update_batch(self, x):
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return np.empty(0)
+        if self.n == 0:
+            # הדגימה הראשונה רק מאתחלת את הממוצע
+            first = np.array([self.update(x[0])])
+            return np.concatenate([first, self.update_batch(x[1:])])
+
+        a = self.alpha
+        means = _linear_recurrence(1 - a, a * x, self.mean)
+        prior_means = np.concatenate([[self.mean], means[:-1]])
+        delta = x - prior_means
+        variances = _linear_recurrence(1 - a, (1 - a) * a * delta * delta, self.var)
+        prior_vars = np.concatenate([[self.var], variances[:-1]])
+
+        counts = self.n + np.arange(len(x))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = delta / np.sqrt(prior_vars)
+        z[(counts < self.warmup) | (prior_vars <= 0)] = np.nan
+
+        self.n += len(x)
+        self.mean = float(means[-1])
+        self.var = float(variances[-1])
+        return z
+
+
+class CusumDetector:
+    """CUSUM דו-כיווני על ציוני z של EWMA - מזהה סחף קטן ומתמשך; מתאפס לאחר כל התראה"""
+    name = 'cusum'
+
+    def __init__(self, k=0.5, h=5.0):
+        self.k = k
+        self.h = h
+        self.high = 0.0
+        self.low = 0.0
+
+    def update(self, z):
+        """מקבל ציון z (NaN בזמן חימום) ומחזיר את ערך ה-CUSUM אם הייתה התראה, אחרת NaN"""
+        if z != z:
+            return math.nan
+        self.high = max(0.0, self.high + z - self.k)
+        self.low = max(0.0, self.low - z - self.k)
+        if self.high > self.h or self.low > self.h:
+            score = self.high if self.high >= self.low else -self.low
+            self.high = self.low = 0.0
+            return score
+        return math.nan
+
+    def update_batch(self, z, min_block=64, max_block=8192):
+        z = np.asarray(z, dtype=float)
+        scores = np.full(len(z), np.nan)
+        warm = ~np.isnan(z)
+        start = 0
+        block = min_block
+        while start < len(z):
+            # רקורסיית לינדלי בפתרון סגור: S[t] = C[t] - min(0, min C[..t]),
+            # על בלוק אדפטיבי כך שכל התראה (ואיפוס) עולה כמרחק להתראה הבאה ולא כיתרת האצווה
+            end = min(start + block, len(z))
+            seg = np.where(warm[start:end], z[start:end], 0.0)
+            seg_warm = warm[start:end]
+            high_c = self.high + np.cumsum(np.where(seg_warm, seg - self.k, 0.0))
+            low_c = self.low + np.cumsum(np.where(seg_warm, -seg - self.k, 0.0))
+            high = high_c - np.minimum(0.0, np.minimum.accumulate(high_c))
+            low = low_c - np.minimum(0.0, np.minimum.accumulate(low_c))
+            alarms = np.flatnonzero(((high > self.h) | (low > self.h)) & seg_warm)
+            if len(alarms) == 0:
+                self.high, self.low = float(high[-1]), float(low[-1])
+                start = end
+                block = min(2 * block, max_block)
+                continue
+            t = alarms[0]
+            scores[start + t] = high[t] if high[t] >= low[t] else -low[t]
+            self.high = self.low = 0.0
+            start += t + 1
+            block = max(min_block, 2 * (t + 1))
+        return scores
+
+
+class RobustZDetector:
+    """ציון z חסין על חלון הזזה: מרחק מהחציון ביחידות MAD"""
+    name = 'robust_z'
+    # ל-MAD על חלון קצר זנבות כבדים יותר - ספים גבוהים יותר שומרים על שיעור התראות שווא דומה
+    warning, critical = 3.5, 5.0
+
+    def __init__(self, window=21):
+        self.window = window
+        self.history = deque(maxlen=window)
+        self._sorted = []  # אותו חלון, ממוין - החציון הוא איבר באמצע בלי מיון בכל דגימה
+
+    def _median(self, ordered):
+        middle = self.window // 2
+        if self.window % 2:
+            return ordered[middle]
+        return (ordered[middle - 1] + ordered[middle]) / 2
+
+    def update(self, x):
+        """דגימה בודדת בפייתון סקלרי: החלון נשמר ממוין (bisect), כך שהחציון זמין מיד
+        וה-MAD הוא מיון של window סטיות בלבד - אותם ערכים כמו ב-update_batch
+        """
+        z = math.nan
+        ordered = self._sorted
+        if len(ordered) == self.window:
+            median = self._median(ordered)
+            mad = self._median(sorted([abs(value - median) for value in ordered]))
+            if mad > 0:
+                z = MAD_SCALE * (x - median) / mad
+            del ordered[bisect_left(ordered, self.history[0])]
+        self.history.append(x)
+        insort(ordered, x)
+        return z
+
+    def update_batch(self, x):
+        x = np.asarray(x, dtype=float)
+        tail = np.fromiter(self.history, dtype=float, count=len(self.history))
+        extended = np.concatenate([tail, x])
+        z = np.full(len(x), np.nan)
+
+        # חלון s מכסה את extended[s:s+w] ומנבא את הדגימה extended[s+w]
+        first = max(0, self.window - len(tail))
+        if len(extended) > self.window and first < len(x):
+            windows = sliding_window_view(extended[:-1], self.window)[len(tail) + first - self.window:]
+            medians = _median_rows(windows)
+            mads = _mad_rows(windows, medians)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                scores = MAD_SCALE * (x[first:] - medians) / mads
+            scores[mads <= 0] = np.nan
+            z[first:] = scores
+
+        self.history.extend(x[-self.window:].tolist())
+        self._sorted = sorted(self.history)
+        return z
+
+
+class SensorAnomalyDetector:
+    """כל הגלאים של חיישן אחד; מעבד דגימות אחת-אחת או באצוות ומפיק אירועי אנומליה"""
+
+    def __init__(self, sensor, robust_window=21, ewma_alpha=0.1, warmup=WARMUP_SAMPLES):
+        self.sensor = sensor
+        self.welford = WelfordDetector(warmup)
+        self.ewma = EwmaDetector(ewma_alpha, warmup)
+        self.cusum = CusumDetector()
+        self.robust = RobustZDetector(robust_window)
+        self.by_name = {d.name: d for d in (self.welford, self.ewma, self.cusum, self.robust)}
+
+    def update(self, timestamp, value):
+        """מעבד דגימה אחת ומחזיר רשימת אירועים (ריקה ברוב הדגימות)
+
+        אירוע נבנה רק לציון שעבר את סף האזהרה (או להתראת CUSUM) - ברוב הדגימות אין
+        בכלל קריאה נוספת מעבר לעדכון ארבעת הגלאים.
+        """
+        value = float(value)
+        ewma_z = self.ewma.update(value)
+        welford_z = self.welford.update(value)
+        cusum_score = self.cusum.update(ewma_z)
+        robust_z = self.robust.update(value)
+        events = []
+        if abs(welford_z) >= Z_WARNING:
+            events.append(self._event('welford', timestamp, value, welford_z))
+        if abs(ewma_z) >= Z_WARNING:
+            events.append(self._event('ewma', timestamp, value, ewma_z))
+        if cusum_score == cusum_score:
+            events.append(self._event('cusum', timestamp, value, cusum_score))
+        if abs(robust_z) >= self.robust.warning:
+            events.append(self._event('robust_z', timestamp, value, robust_z))
+        return events
+
+    def update_batch(self, timestamps, values):
+        """מעבד אצווה שלמה בפעולות וקטוריות; מחזיר את אותם אירועים כמו update על כל דגימה"""
+        values = np.asarray(values, dtype=float)
+        ewma_z = self.ewma.update_batch(values)
+        scores = (
+            ('welford', self.welford.update_batch(values)),
+            ('ewma', ewma_z),
+            ('cusum', self.cusum.update_batch(ewma_z)),
+            ('robust_z', self.robust.update_batch(values)),
+        )
+
+        # איסוף האינדקסים המסומנים בלבד - רוב הדגימות אינן מייצרות אירוע
+        flagged = []
+        for order, (name, z) in enumerate(scores):
+            if name == 'cusum':
+                hits = np.flatnonzero(~np.isnan(z))
+            else:
+                with np.errstate(invalid='ignore'):
+                    hits = np.flatnonzero(np.abs(z) >= self.by_name[name].warning)
+            flagged.extend((i, order, name, z[i]) for i in hits)
+        flagged.sort(key=lambda item: (item[0], item[1]))
+
+        events = []
+        for i, _, name, score in flagged:
+            event = self._event(name, timestamps[i], values[i], score)
+            if event:
+                events.append(event)
+        return events
+
+    def _event(self, detector, timestamp, value, score):
+        if np.isnan(score):
+            return None
+        if detector == 'cusum':
+            # התראת CUSUM היא תמיד אזהרה; קריטית כשהסחף כפול מסף ההתראה
+            severity = 'critical' if abs(score) >= 2 * self.cusum.h else 'warning'
+        else:
+            limits = self.by_name[detector]
+            severity = severity_for(score, limits.warning, limits.critical)
+        if severity is None:
+            return None
+        return AnomalyEvent(self.sensor, timestamp, float(value), detector, float(score), severity)
+
+
+class StreamingAnomalyEngine:
+    """מנוע זיהוי אנומליות רציף: גלאי לכל חיישן ותור חסום של האירועים האחרונים לכל חיישן"""
+
+    def __init__(self, sensor_names, max_events=500, **detector_options):
+        self.detectors = {name: SensorAnomalyDetector(name, **detector_options) for name in sensor_names}
+        self.events = {name: deque(maxlen=max_events) for name in sensor_names}
+        # חותמת הזמן של הדגימה האחרונה שעובדה לכל חיישן
+        self.processed_until = dict.fromkeys(sensor_names)
+
+    def process(self, sensor, timestamps, values):
+        """מעבד אצווה של דגימות חדשות לחיישן ומחזיר את האירועים שזוהו בה"""
+        if len(timestamps) == 0:
+            return []
+        events = self.detectors[sensor].update_batch(timestamps, values)
+        self.events[sensor].extend(events)
+        self.processed_until[sensor] = timestamps[-1]
+        return events
+
+    def recent(self, sensor, since=None):
+        """האירועים האחרונים של חיישן, אופציונלית רק מחותמת הזמן since ואילך"""
+        return [event for event in self.events[sensor] if since is None or event.timestamp >= since]
+
+
+def summarize_events(events, top=2):
+    """מסכם אירועים לכרטיסים: לכל חיישן האירוע החמור ביותר, ממוין לפי ציון"""
+    def rank(event):
+        return event.severity == 'critical', abs(event.score)
+
+    by_sensor = {}
+    for event in events:
+        summary = by_sensor.setdefault(event.sensor, {'count': 0, 'critical': 0, 'top': event})
+        summary['count'] += 1
+        summary['critical'] += event.severity == 'critical'
+        if rank(event) > rank(summary['top']):
+            summary['top'] = event
+    ranked = sorted(by_sensor.values(), key=lambda s: (s['critical'], abs(s['top'].score)), reverse=True)
+    return ranked[:top]
+
+
+def event_markers(events):
+    """ממפה אירועים לנקודות סימון בגרף: כל דגימה מסומנת פעם אחת, בחומרה הגבוהה שזוהתה בה
+
+    מחזיר לכל חומרה (זמנים, ערכים, תיאורי התבניות שזוהו).
+    """
+    samples = {}
+    for event in events:
+        sample = samples.setdefault(event.timestamp, {'value': event.value, 'severity': 'warning', 'patterns': []})
+        sample['patterns'].append(DETECTOR_PATTERNS[event.detector])
+        if event.severity == 'critical':
+            sample['severity'] = 'critical'
+    markers = {}
+    for severity in ('warning', 'critical'):
+        chosen = [(t, sample) for t, sample in samples.items() if sample['severity'] == severity]
+        markers[severity] = ([t for t, _ in chosen],
+                             [sample['value'] for _, sample in chosen],
+                             [', '.join(sample['patterns']) for _, sample in chosen])
+    return markers
+
+
+def mask_markers(timestamps, values, warning_mask, critical_mask, text=None):
+    """נקודות סימון בגרף ממסכות אזהרה/קריטי - באותו מבנה ש-event_markers מחזירה"""
+    return {
+        'warning': (timestamps[warning_mask], values[warning_mask], text),
+        'critical': (timestamps[critical_mask], values[critical_mask], text),
+    }
+
+
+def rolling_zscores(values, window=ROLLING_WINDOW, robust=False):
+    """ציוני z מתגלגלים לכל החיישנים יחד על מטריצה (חיישנים × זמן)
+
+    כל דגימה מנוקדת מול window הדגימות שלפניה: ממוצע וסטיית תקן מסכומים מצטברים,
+    או חציון ו-MAD מחלונות sliding_window_view כש-robust. לפני שהחלון מתמלא - NaN.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n = values.shape[1]
+    z = np.full(values.shape, np.nan)
+    if n <= window:
+        return z
+
+    if robust:
+        # חלון t מכסה את הדגימות [t, t+window) ומנקד את הדגימה t+window
+        windows = sliding_window_view(values[:, :-1], window, axis=1)
+        chunk = max(1, SCORE_CHUNK_ELEMENTS // (window * len(values)))
+        for start in range(0, n - window, chunk):
+            block = windows[:, start:start + chunk]
+            rows = block.reshape(-1, window)
+            medians = _median_rows(rows)
+            mads = _mad_rows(rows, medians)
+            target = values[:, window + start:window + start + block.shape[1]]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                scores = MAD_SCALE * (target - medians.reshape(target.shape)) / mads.reshape(target.shape)
+            scores[mads.reshape(target.shape) <= 0] = np.nan
+            z[:, window + start:window + start + block.shape[1]] = scores
+        return z
+
+    # סכומים מצטברים של הסדרה (מוזזת לערך הראשון לשמירה על דיוק) ושל ריבועיה
+    shifted = values - values[:, :1]
+    sums = np.zeros((len(values), n + 1))
+    squares = np.zeros((len(values), n + 1))
+    np.cumsum(shifted, axis=1, out=sums[:, 1:])
+    np.cumsum(shifted * shifted, axis=1, out=squares[:, 1:])
+    window_sum = sums[:, window:n] - sums[:, :n - window]
+    window_squares = squares[:, window:n] - squares[:, :n - window]
+    means = window_sum / window
+    variances = np.maximum(window_squares - window_sum * means, 0.0) / (window - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z[:, window:] = (shifted[:, window:] - means) / np.sqrt(variances)
+    z[:, window:][variances <= 0] = np.nan
+    return z
+
+
+def score_masks(values, window=ROLLING_WINDOW, warning=Z_WARNING, critical=Z_CRITICAL, robust=False):
+    """מסכות בוליאניות של נקודות אזהרה ונקודות קריטיות לפי ציוני z מתגלגלים
+
+    values היא מטריצה (חיישנים × זמן) או סדרה חד-ממדית, כמו ב-threshold_masks, והמסכות
+    בצורה זהה. המטריצה מנוקדת בבלוקים רציפים של שורות, וסדרות ארוכות מהתקציב
+    בנתחי זמן חופפים (window דגימות) - כך הזיכרון הזמני חסום בכל גודל קלט.
+    """
+    values = np.asarray(values)
+    matrix = np.atleast_2d(values)
+    n_sensors, n = matrix.shape
+    warning_mask = np.zeros(matrix.shape, dtype=bool)
+    critical_mask = np.zeros(matrix.shape, dtype=bool)
+
+    rows = max(1, SCORE_CHUNK_ELEMENTS // max(n, 1))
+    chunk = max(4 * window, SCORE_CHUNK_ELEMENTS // rows)
+    for first in range(0, n_sensors, rows):
+        block = slice(first, first + rows)
+        for start in range(0, n, chunk):
+            head = max(0, start - window)
+            z = np.abs(rolling_zscores(matrix[block, head:start + chunk], window, robust)[:, start - head:])
+            with np.errstate(invalid='ignore'):
+                critical_mask[block, start:start + chunk] = z >= critical
+                warning_mask[block, start:start + chunk] = (z >= warning) & (z < critical)
+
+    if values.ndim == 1:
+        return warning_mask[0], critical_mask[0]
+    return warning_mask, critical_mask
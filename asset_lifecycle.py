@@ -0,0 +1,217 @@
+"""מחזור חיים של צי הנכסים: טבלה עמודתית וחישובים מוקטרים על כל הצי
+
+כל נכס הוא שורה בטבלת pandas, וכל חישובי מחזור החיים - גיל דיגיטלי, תחזית
+התדרדרות, חציית סף ההחלפה ועלות ההחלפה בערך נוכחי - הם פעולות על עמודות שלמות.
+התחזיות הן מטריצות נכסים × חודשים בכל אופק: חודש החציה הוא argmax על מסכת הסף,
+והתחזוקה המצטברת היא cumsum לאורך החודשים. מסך הנכס הבודד הוא אצווה של נכס אחד.
+"""
+import numpy as np
+import pandas as pd
+
+# הגדרות בסיס לכל קטגוריה: אורך חיים (שנים), עלות רכישה ($) ומקדם תחזוקה שנתי
+CATEGORY_PARAMS = {
+    "מכונות ייצור": {"base_lifetime": 15, "base_cost": 250000, "maintenance_factor": 0.08},
+    "ציוד בקרה ומדידה": {"base_lifetime": 8, "base_cost": 120000, "maintenance_factor": 0.1},
+    "תשתיות": {"base_lifetime": 20, "base_cost": 500000, "maintenance_factor": 0.05},
+    "רובוטים וכלי שינוע": {"base_lifetime": 10, "base_cost": 180000, "maintenance_factor": 0.12},
+}
+CATEGORIES = list(CATEGORY_PARAMS)
+
+ASSET_MODELS = {
+    "מכונות ייצור": [
+        "מכונת כרסום CNC מודל XJ-5000",
+        "מכונת הזרקת פלסטיק KY-200",
+        "רובוט ריתוך אוטומטי WB-400",
+        "מערך הרכבה אוטומטי A-Series",
+        "מכבש הידראולי H-900"
+    ],
+    "ציוד בקרה ומדידה": [
+        "מערכת בקרת איכות אופטית QC-Vision",
+        "סורק תלת-ממד Measure-3D",
+        "מערכת לייזר למדידת דיוק L-500",
+        "מערכת בקרת תהליך מרכזית CPC-2000",
+        "מערך חיישנים היקפי SmartSense"
+    ],
+    "תשתיות": [
+        "מערכת אספקת חשמל ראשית PS-1000",
+        "מערכת קירור מרכזית CL-2000",
+        "מערך מדחסי אוויר AC-Series",
+        "מערכת טיפול בשפכים WT-500",
+        "מערכת גיבוי UPS מרכזית"
+    ],
+    "רובוטים וכלי שינוע": [
+        "רובוט הרכבה מדויק Assembly-Bot-5",
+        "מלגזה אוטונומית AGV-300",
+        "זרוע רובוטית Multi-Axis-7",
+        "מערכת הזנה אוטומטית Feed-100",
+        "רובוט פריקה וטעינה LogiBot-X"
+    ]
+}
+
+FLEET_SIZE = 20_000
+HISTORY_MONTHS = 24
+FORECAST_MONTHS = 24
+DAYS_PER_MONTH = 30
+MAINTENANCE_THRESHOLD = 70
+REPLACEMENT_THRESHOLD = 40
+DISCOUNT_RATE = 0.08             # שיעור היוון שנתי
+MAINTENANCE_GROWTH = 0.05        # עלייה חודשית בעלות התחזוקה
+REPLACEMENT_INFLATION = 0.01     # התייקרות חודשית של ההחלפה
+RISK_BANDS = ("נמוך", "בינוני", "גבוה")
+
+
+def _category_table(categories, key):
+    """מקדם הקטגוריה לכל נכס - מערך מקודי הקטגוריות"""
+    return np.array([CATEGORY_PARAMS[name][key] for name in CATEGORIES], dtype=float)[categories]
+
+
+def generate_fleet(n_assets=FLEET_SIZE, seed=0):
+    """טבלת צי סינתטית: הנתונים הקבועים של כל נכס (במערכת אמיתית - ממערכת ניהול הנכסים)
+
+    אלה אותן התפלגויות שמסך הנכס הבודד מגריל בכל הרצה, מוגרלות פעם אחת לכל הצי.
+    """
+    rng = np.random.default_rng(seed)
+    categories = rng.integers(0, len(CATEGORIES), n_assets)
+    model = rng.integers(0, 5, n_assets)
+    names = [f"{ASSET_MODELS[CATEGORIES[c]][m]} #{i + 1:05d}" for i, (c, m) in enumerate(zip(categories, model))]
+    lifetime = _category_table(categories, "base_lifetime")
+    return pd.DataFrame({
+        "name": names,
+        "category": pd.Categorical.from_codes(categories, CATEGORIES),
+        "chronological_age": np.round(rng.uniform(3, lifetime * 0.8), 1),
+        "age_factor": rng.uniform(0.8, 1.4, n_assets),           # תנאי שימוש ותחזוקה
+        "cost_factor": rng.uniform(0.9, 1.1, n_assets),
+        "replacement_factor": rng.uniform(1.1, 1.3, n_assets),   # עלות החלפה ביחס לרכישה
+        "performance_noise": rng.uniform(-5, 5, n_assets),       # סטיית המדידה האחרונה
+        "degradation_noise": rng.uniform(0.8, 1.2, n_assets),
+    })
+
+
+def digital_age_years(chronological_age, age_factor):
+    """הגיל הדיגיטלי - הגיל הכרונולוגי מוכפל במקדם תנאי השימוש והתחזוקה"""
+    return np.round(np.asarray(chronological_age) * np.asarray(age_factor), 1)
+
+
+def end_performance(digital_age, lifetime):
+    """הביצועים הצפויים היום לפי שלב מחזור החיים - בין 100 ל-50"""
+    return np.maximum(50, 100 - np.asarray(digital_age) / lifetime * 70)
+
+
+def history_curves(digital_age, lifetime, noise):
+    """היסטוריית ביצועים חודשית: ירידה לינארית מ-100 לביצועי היום, ועליה סטיית המדידות
+
+    noise בצורה (..., HISTORY_MONTHS + 1); העמודה האחרונה היא המדידה של היום.
+    """
+    fraction = np.arange(HISTORY_MONTHS + 1) / HISTORY_MONTHS
+    end = end_performance(digital_age, lifetime)[..., None]
+    return np.clip(100 - (100 - end) * fraction + noise, 1, 100)
+
+
+def degradation_rate(digital_age, lifetime, noise):
+    """קצב ההתדרדרות היחסי - נכס בתחילת דרכו מתדרדר לאט יותר"""
+    return np.maximum(0.1, (lifetime - np.asarray(digital_age)) / lifetime) * noise
+
+
+def forecast_curves(last_value, rate, horizon=FORECAST_MONTHS):
+    """תחזית הביצועים לחודשים 1..horizon - מטריצה (..., horizon)"""
+    months = np.arange(1, horizon + 1)
+    step = 0.1 / np.asarray(rate, dtype=float)
+    return np.maximum(5, np.asarray(last_value, dtype=float)[..., None] - months * step[..., None])
+
+
+def months_to_threshold(curves, threshold=REPLACEMENT_THRESHOLD):
+    """החודש הראשון שבו התחזית יורדת מתחת לסף, או אורך האופק אם אינה יורדת בו"""
+    below = curves < threshold
+    return np.where(below.any(axis=-1), below.argmax(axis=-1) + 1, curves.shape[-1])
+
+
+def rul_threshold_months(rul_months, horizon=FORECAST_MONTHS):
+    """חודש חציית הסף מאחוזון RUL (חודשים, לא בהכרח שלם) - בחודשים שלמים וחסום לאופק"""
+    return np.clip(np.floor(np.asarray(rul_months, dtype=float)), 1, horizon).astype(np.int64)
+
+
+def optimal_replacement_months(threshold_months):
+    """נקודת ההחלפה: מרווח ביטחון לפני חציית הסף - שני חודשים או 30% מהזמן שנותר"""
+    threshold_months = np.asarray(threshold_months)
+    return np.maximum(1, np.minimum(threshold_months - 2, np.trunc(threshold_months * 0.7))).astype(np.int64)
+
+
+def cumulative_maintenance(maintenance_cost, months, horizon=FORECAST_MONTHS):
+    """עלות התחזוקה המצטברת עד החודש months (לא כולל), כשהעלות החודשית עולה ב-5% לחודש"""
+    monthly = np.asarray(maintenance_cost, dtype=float)[..., None] * (1 + MAINTENANCE_GROWTH * np.arange(horizon))
+    totals = np.cumsum(monthly, axis=-1)
+    totals = np.concatenate([np.zeros_like(totals[..., :1]), totals], axis=-1)
+    return np.take_along_axis(totals, np.asarray(months)[..., None], axis=-1)[..., 0]
+
+
+def replacement_npv(replacement_cost, months):
+    """עלות החלפה בעוד months חודשים, מהוונת לערך נוכחי"""
+    months = np.asarray(months, dtype=float)
+    return replacement_cost * (1 + months * REPLACEMENT_INFLATION) / (1 + DISCOUNT_RATE) ** (months / 12)
+
+
+def operational_risk(lifecycle_percent):
+    return np.clip(np.round(10 + (np.asarray(lifecycle_percent) - 50) * 1.2, 1), 5, 95)
+
+
+def risk_band(risk):
+    """רצועת הסיכון - באותם ספים של המלצת התאום (40 / 70)"""
+    return pd.Categorical.from_codes(np.searchsorted([40, 70], risk, side="left"), RISK_BANDS)
+
+
+def fleet_lifecycle(fleet, horizon=FORECAST_MONTHS, rul_months=None):
+    """מחשב את מדדי מחזור החיים של כל הצי במעבר אחד - DataFrame באותו אינדקס
+
+    rul_months - אחוזון ה-RUL של כל נכס (חודשים; NaN לנכס שלא הותאם). כשהוא נתון, חציית
+    הסף נלקחת ממנו במקום מהתחזית הליניארית, כך שמועד ההחלפה זהה לזה של מסך הנכס.
+    """
+    categories = fleet["category"].cat.codes.to_numpy()
+    lifetime = _category_table(categories, "base_lifetime")
+    base_cost = _category_table(categories, "base_cost")
+    maintenance_factor = _category_table(categories, "maintenance_factor")
+
+    digital_age = digital_age_years(fleet["chronological_age"].to_numpy(), fleet["age_factor"].to_numpy())
+    purchase_cost = np.trunc(base_cost * fleet["cost_factor"].to_numpy())
+    replacement_cost = np.trunc(purchase_cost * fleet["replacement_factor"].to_numpy())
+    maintenance_cost = np.trunc(purchase_cost * maintenance_factor * (1 + digital_age / lifetime))
+    lifecycle_percent = np.round(digital_age / lifetime * 100, 1)
+
+    # הביצועים היום (סוף ההיסטוריה) וקצב ההתדרדרות של התחזית
+    last_performance = np.clip(end_performance(digital_age, lifetime) + fleet["performance_noise"].to_numpy(), 1, 100)
+    rate = degradation_rate(digital_age, lifetime, fleet["degradation_noise"].to_numpy())
+    threshold_months = months_to_threshold(forecast_curves(last_performance, rate, horizon))
+    if rul_months is not None:
+        rul_months = np.asarray(rul_months, dtype=float)
+        fitted = np.isfinite(rul_months)
+        threshold_months = np.where(fitted, rul_threshold_months(np.where(fitted, rul_months, 1), horizon),
+                                    threshold_months)
+    optimal_months = optimal_replacement_months(threshold_months)
+
+    optimal_cost = (cumulative_maintenance(maintenance_cost, optimal_months, horizon)
+                    + replacement_npv(replacement_cost, optimal_months))
+    expected_savings = replacement_cost - optimal_cost
+    risk = operational_risk(lifecycle_percent)
+    return pd.DataFrame({
+        "name": fleet["name"],
+        "category": fleet["category"],
+        "digital_age": digital_age,
+        "lifecycle_percent": lifecycle_percent,
+        "purchase_cost": purchase_cost.astype(np.int64),
+        "replacement_cost": replacement_cost.astype(np.int64),
+        "maintenance_cost": maintenance_cost.astype(np.int64),
+        "last_performance": last_performance,
+        "degradation_rate": rate,
+        "months_to_threshold": threshold_months,
+        "optimal_months": optimal_months,
+        "optimal_cost": optimal_cost,
+        "expected_savings": np.trunc(expected_savings).astype(np.int64),
+        "savings_percent": np.round(expected_savings / replacement_cost * 100, 1),
+        "operational_risk": risk,
+        "risk_band": risk_band(risk),
+    }, index=fleet.index)
+
+
+def rank_fleet(lifecycle):
+    """דירוג הצי: הסיכון התפעולי הגבוה ביותר קודם, ובסיכון שווה - ההחלפה הקרובה קודם"""
+    order = np.lexsort((lifecycle["optimal_months"].to_numpy(), -lifecycle["operational_risk"].to_numpy()))
+    return lifecycle.iloc[order]
@@ -0,0 +1,251 @@
+"""מרשם נכסים מתמשך (SQLite)
+
+לכל נכס שורה אחת: נתוני הקלט שלו (גיל, מקדמי עלות ושימוש, סטיות המדידה) ולצידם
+מדדי מחזור החיים שחושבו מהם - רצועת סיכון, מועד ההחלפה הבא ועלויות. המדדים
+מחושבים מחדש רק לנכסים שהקלט שלהם השתנה, באותה טרנזקציה של העדכון, ולכל הצי
+פעם ביום (refresh_if_stale) - הגיל מתקדם ומועדי ההחלפה נגזרים מתאריך החישוב.
+הבחירה במסך הנכסים היא שאילתה על אינדקס (קטגוריה, רצועת סיכון, מועד החלפה)
+ומחזירה עמוד קבוע של נכסים, בלי קשר לגודל הצי. הערכת ה-RUL מההיסטוריה נשמרת
+בטבלה נפרדת - מותאמת לכל נכס כשהוא נוסף או כשהקלט שלו משתנה, ולכל הצי כשמגיעות
+מדידות חדשות (refit_rul) - ואחוזון ה-P10 שלה, בניכוי הזמן שעבר מאז ההתאמה, קובע את
+חציית הסף ממנה נגזרים מועד ההחלפה ומדדי העלות.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from asset_lifecycle import (CATEGORIES, CATEGORY_PARAMS, DAYS_PER_MONTH, FLEET_SIZE, FORECAST_MONTHS,
+                             HISTORY_MONTHS, digital_age_years, fleet_lifecycle, generate_fleet, history_curves)
+from rul_estimation import MODELS, RUL_PERCENTILES, estimate_rul
+
+DEFAULT_REGISTRY_PATH = Path(__file__).resolve().parent / "asset_registry.sqlite"
+SELECTOR_PAGE = 200  # נכסים שמוצגים בבורר - העמוד הראשון לפי מועד ההחלפה
+RUL_HORIZON_MONTHS = 120  # אופק ההתאמה - RUL ארוך ממנו נשמר כאורך האופק
+PLANNING_PERCENTILE = RUL_PERCENTILES[0]  # ההחלפה מתוכננת לפני החציה גם בתרחיש הפסימי
+
+
+def _rul_remaining(percentile):
+    """ביטוי SQL: אחוזון ה-RUL השמור פחות החודשים שעברו מאז ההתאמה (לא פחות מ-0), נכון לתאריך שבפרמטר"""
+    return f"MAX(asset_rul.rul_p{percentile} - (julianday(?) - julianday(asset_rul.fitted_at)) / {DAYS_PER_MONTH}, 0)"
+
+INPUT_COLUMNS = ("chronological_age", "age_factor", "cost_factor", "replacement_factor",
+                 "performance_noise", "degradation_noise")
+METRIC_COLUMNS = {
+    "digital_age": "REAL", "lifecycle_percent": "REAL", "purchase_cost": "INTEGER", "replacement_cost": "INTEGER",
+    "maintenance_cost": "INTEGER", "last_performance": "REAL", "degradation_rate": "REAL",
+    "months_to_threshold": "INTEGER", "optimal_months": "INTEGER", "optimal_cost": "REAL",
+    "expected_savings": "INTEGER", "savings_percent": "REAL", "operational_risk": "REAL", "risk_band": "TEXT",
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS assets (
+    asset_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    {", ".join(f"{column} REAL NOT NULL" for column in INPUT_COLUMNS)},
+    history_noise BLOB NOT NULL,       -- סטיות המדידות החודשיות (float64, HISTORY_MONTHS + 1)
+    impact_factors TEXT NOT NULL,      -- JSON: גורם -> השפעה על הגיל הדיגיטלי (%)
+    {", ".join(f"{column} {sql_type}" for column, sql_type in METRIC_COLUMNS.items())},
+    next_replacement TEXT,             -- תאריך ISO: מועד החישוב + optimal_months
+    computed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS assets_category_risk_next ON assets (category, risk_band, next_replacement);
+CREATE INDEX IF NOT EXISTS assets_category_next ON assets (category, next_replacement);
+CREATE INDEX IF NOT EXISTS assets_risk_next ON assets (risk_band, next_replacement);
+CREATE INDEX IF NOT EXISTS assets_next_replacement ON assets (next_replacement);
+CREATE TABLE IF NOT EXISTS asset_rul (
+    asset_id INTEGER PRIMARY KEY REFERENCES assets (asset_id),
+    model TEXT NOT NULL,
+    {", ".join(f"rul_p{p} REAL NOT NULL" for p in RUL_PERCENTILES)},   -- אחוזוני החודשים עד סף ההחלפה
+    fitted_at TEXT
+);
+"""
+
+IMPACT_FACTOR_RANGES = {
+    "תדירות שימוש": (5, 30),
+    "עומס עבודה": (10, 40),
+    "איכות תחזוקה": (-30, 10),
+    "תנאי סביבה": (5, 25),
+    "איכות חומרים": (-20, 5),
+}
+
+
+class AssetRegistry:
+    """מרשם הנכסים - חיבור SQLite יחיד, משותף להרצות תחת נעילה"""
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, n_assets=FLEET_SIZE, seed=0):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        if self._db.execute("SELECT COUNT(*) FROM assets").fetchone()[0] == 0:
+            self._seed(n_assets, seed)
+        self._fit_missing()
+        self.refresh_if_stale()
+
+    def __len__(self):
+        with self.lock:
+            return self._db.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+
+    def _seed(self, n_assets, seed):
+        """מרשם ריק מאותחל מהצי הסינתטי - במערכת אמיתית, ייבוא ממערכת ניהול הנכסים"""
+        fleet = generate_fleet(n_assets, seed)
+        rng = np.random.default_rng([seed, 1])
+        history = rng.uniform(-5, 5, (n_assets, HISTORY_MONTHS + 1))
+        history[:, -1] = fleet["performance_noise"]  # המדידה האחרונה היא ביצועי היום של הצי
+        factors = {name: rng.integers(low, high, n_assets) for name, (low, high) in IMPACT_FACTOR_RANGES.items()}
+        rows = fleet[["name", "category", *INPUT_COLUMNS]].astype({"category": str})
+        rows["history_noise"] = [row.tobytes() for row in history]
+        rows["impact_factors"] = [json.dumps(dict(zip(factors, values)), ensure_ascii=False)
+                                  for values in zip(*(v.tolist() for v in factors.values()))]
+        columns = list(rows.columns)
+        with self.lock, self._db:
+            self._db.executemany(
+                f"INSERT INTO assets ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows.itertuples(index=False, name=None))
+
+    def _fit_missing(self):
+        """נכסים בלי הערכת RUL (מרשם חדש, או מרשם שקדם לטבלה) - מתאים ומחשב את מדדיהם"""
+        with self.lock, self._db:
+            missing = [row[0] for row in self._db.execute(
+                "SELECT asset_id FROM assets WHERE asset_id NOT IN (SELECT asset_id FROM asset_rul)")]
+            if missing:
+                everything = len(missing) == self._db.execute("SELECT COUNT(*) FROM assets").fetchone()[0]
+                self._refit_rul(None if everything else missing)
+                self._recompute(None if everything else missing)
+
+    def _inputs(self, where="", params=(), today=None):
+        """נתוני הקלט, ולצידם rul_months - אחוזון התכנון של ה-RUL נכון להיום (NaN אם לא הותאם)"""
+        today = str(np.datetime64(today or pd.Timestamp.now().date(), "D"))
+        frame = pd.read_sql_query(
+            f"SELECT asset_id, name, category, {', '.join(INPUT_COLUMNS)}, "
+            f"{_rul_remaining(PLANNING_PERCENTILE)} AS rul_months "
+            f"FROM assets LEFT JOIN asset_rul USING (asset_id) {where}",
+            self._db, params=(today, *params), index_col="asset_id")
+        frame["category"] = pd.Categorical(frame["category"], categories=CATEGORIES)
+        frame["rul_months"] = frame["rul_months"].astype(float)
+        return frame
+
+    def _recompute(self, asset_ids, today=None):
+        """מחשב מחדש ושומר את מדדי מחזור החיים - לכל הצי (None) או לנכסים שהקלט שלהם השתנה"""
+        today = np.datetime64(today or pd.Timestamp.now().date(), "D")
+        if asset_ids is None:
+            inputs = self._inputs(today=today)
+        else:
+            ids = list(map(int, asset_ids))
+            inputs = self._inputs(f"WHERE asset_id IN ({', '.join('?' * len(ids))})", ids, today)
+        metrics = fleet_lifecycle(inputs, FORECAST_MONTHS, inputs["rul_months"])
+        next_replacement = np.datetime_as_string(today + metrics["optimal_months"].to_numpy() * DAYS_PER_MONTH)
+        # עמודה שלמה בכל פעם ל-tolist - ערכי פייתון מקוריים ל-sqlite בלי המרה לכל תא
+        values = [metrics[column].astype(str if column == "risk_band" else None).tolist() for column in METRIC_COLUMNS]
+        values += [next_replacement.tolist(), [str(today)] * len(metrics), metrics.index.tolist()]
+        columns = [*METRIC_COLUMNS, "next_replacement", "computed_at"]
+        self._db.executemany(
+            f"UPDATE assets SET {', '.join(f'{column} = ?' for column in columns)} WHERE asset_id = ?", zip(*values))
+        return len(metrics)
+
+    def _refit_rul(self, asset_ids, today=None):
+        """מתאים מחדש את מודלי ההתדרדרות ושומר את אחוזוני ה-RUL - לכל הצי (None) או לנכסים נבחרים"""
+        query = "SELECT asset_id, category, chronological_age, age_factor, history_noise FROM assets"
+        params = ()
+        if asset_ids is not None:
+            params = list(map(int, asset_ids))
+            query += f" WHERE asset_id IN ({', '.join('?' * len(params))})"
+        ids, categories, chronological_age, age_factor, noise = zip(*self._db.execute(query, params).fetchall())
+        lifetime = np.array([CATEGORY_PARAMS[name]["base_lifetime"] for name in categories], dtype=float)
+        digital_age = digital_age_years(chronological_age, age_factor)
+        noise = np.frombuffer(b"".join(noise), dtype=np.float64).reshape(len(ids), HISTORY_MONTHS + 1)
+        rul = estimate_rul(history_curves(digital_age, lifetime, noise), digital_age * 12, RUL_HORIZON_MONTHS)
+        today = str(np.datetime64(today or pd.Timestamp.now().date(), "D"))
+        values = [ids, np.array(MODELS)[rul.model].tolist(), *rul.months.tolist(), [today] * len(ids)]
+        columns = ["asset_id", "model", *(f"rul_p{p}" for p in RUL_PERCENTILES), "fitted_at"]
+        self._db.executemany(
+            f"INSERT OR REPLACE INTO asset_rul ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            zip(*values))
+        return len(ids)
+
+    def update_inputs(self, asset_id, **inputs):
+        """מעדכן נתוני קלט של נכס ומחשב מחדש את מדדיו באותה טרנזקציה"""
+        unknown = set(inputs) - set(INPUT_COLUMNS)
+        if unknown:
+            raise ValueError(f"עמודות קלט לא מוכרות: {sorted(unknown)}")
+        with self.lock, self._db:
+            self._db.execute(f"UPDATE assets SET {', '.join(f'{column} = ?' for column in inputs)} WHERE asset_id = ?",
+                             (*inputs.values(), int(asset_id)))
+            self._refit_rul([asset_id])
+            self._recompute([asset_id])
+
+    def refresh(self, today=None):
+        """מחשב מחדש את כל הצי - למשל פעם ביום, כשמועדי ההחלפה זזים"""
+        with self.lock, self._db:
+            return self._recompute(None, today)
+
+    def refresh_if_stale(self, today=None):
+        """מקדם את הגיל ומחשב מחדש את הצי אם המדדים חושבו לפני היום - אחרת לא עושה דבר
+
+        הגיל הכרונולוגי שמור כפי שהיה במועד החישוב של כל נכס, ולכן מתקדם בזמן שעבר מאז.
+        הבדיקה היא שאילתה אחת, כך שאפשר לקרוא לה בכל פתיחה של מסך הנכסים.
+        """
+        today = str(np.datetime64(today or pd.Timestamp.now().date(), "D"))
+        with self.lock, self._db:
+            oldest = self._db.execute("SELECT MIN(computed_at) FROM assets").fetchone()[0]
+            if oldest is None or oldest >= today:
+                return 0
+            self._db.execute("UPDATE assets SET chronological_age = chronological_age"
+                             " + (julianday(?) - julianday(computed_at)) / 365.25 WHERE computed_at < ?", (today, today))
+            return self._recompute(None, today)
+
+    def refit_rul(self, today=None):
+        """מתאים מחדש את הערכות ה-RUL של כל הצי מההיסטוריה ומחשב את המדדים מהן - עבודה לילית"""
+        with self.lock, self._db:
+            self._refit_rul(None, today)
+            return self._recompute(None, today)
+
+    def select(self, category, risk_band=None, limit=SELECTOR_PAGE):
+        """הנכסים הבאים להחלפה בקטגוריה (ובתוך רצועת סיכון) - סריקה של האינדקס המורכב"""
+        query = "SELECT asset_id, name FROM assets WHERE category = ?"
+        params = [category]
+        if risk_band is not None:
+            query += " AND risk_band = ?"
+            params.append(risk_band)
+        query += " ORDER BY next_replacement, asset_id LIMIT ?"
+        with self.lock:
+            return self._db.execute(query, (*params, limit)).fetchall()
+
+    def asset(self, asset_id):
+        """שורת הנכס המלאה: קלט, סטיות המדידה, גורמי ההשפעה ומדדים שמורים"""
+        with self.lock:
+            cursor = self._db.execute("SELECT * FROM assets WHERE asset_id = ?", (int(asset_id),))
+            row = cursor.fetchone()
+            if row is None:
+                raise KeyError(asset_id)
+            record = dict(zip((column[0] for column in cursor.description), row))
+        record["history_noise"] = np.frombuffer(record["history_noise"], dtype=np.float64)
+        record["impact_factors"] = json.loads(record["impact_factors"])
+        return record
+
+    def rul(self, asset_id, today=None):
+        """הערכת ה-RUL של הנכס מההתאמה האחרונה, או None אם טרם הותאם
+
+        האחוזונים (rul_p10 ...) הם החודשים שנותרו נכון להיום - אותם ערכים שמדדי הנכס חושבו מהם.
+        """
+        today = str(np.datetime64(today or pd.Timestamp.now().date(), "D"))
+        percentiles = ", ".join(f"{_rul_remaining(p)} AS rul_p{p}" for p in RUL_PERCENTILES)
+        with self.lock:
+            cursor = self._db.execute(f"SELECT asset_id, model, {percentiles}, fitted_at FROM asset_rul "
+                                      "WHERE asset_id = ?", (today,) * len(RUL_PERCENTILES) + (int(asset_id),))
+            row = cursor.fetchone()
+        return None if row is None else dict(zip((column[0] for column in cursor.description), row))
+
+    def fleet(self):
+        """נתוני הקלט של כל הצי (ו-rul_months) כטבלה עמודתית - לחישוב מחדש באופק אחר"""
+        with self.lock:
+            return self._inputs()
+
+    def close(self):
+        with self.lock:
+            self._db.close()
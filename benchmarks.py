@@ -0,0 +1,820 @@
+"""מדידות ביצועים למנועי החישוב של התאום הדיגיטלי
+
+הרצה: python benchmarks.py [שם מדידה ...] [--quick]
+ללא שמות - מורצות כל המדידות.
+"""
+import argparse
+import contextlib
+import functools
+import inspect
+import os
+import random
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from sensor_series import (SENSOR_NAMES, BASE_VALUES, THRESHOLDS,
+                           generate_sensor_series, threshold_masks)
+from downsampling import CHART_WIDTH_PX, downsample
+from factory_layout import SENSOR_STATUSES, batched_box_mesh, build_plant_layout, factory_geometry, sample_sensor_status
+from spatial_lod import SpatialGrid, lod_machine_boxes, lod_markers
+from figure_patches import FigureStream, figure_json, message_size
+from anomaly_detection import SensorAnomalyDetector, score_masks
+from ingestion import IngestionServer, decode_frames, ingest_records, publish, synthetic_frames
+from sensor_store import SensorStore
+from history_store import NS_PER_DAY, HistoryStore
+from rollups import RollupStore, aggregate
+from asset_lifecycle import CATEGORY_PARAMS, fleet_lifecycle, generate_fleet, history_curves, rank_fleet
+from asset_registry import RUL_HORIZON_MONTHS, AssetRegistry
+from rul_estimation import estimate_rul, fit_models
+from replacement_portfolio import BUDGET_SHARE, CREW_DAYS_PER_YEAR, DEFAULT_CREWS, plan_replacements
+from production_sim import CYCLE_MINUTES, run_replications, simulate_equipment_failure, simulate_line
+from cascade_graph import DependencyGraph, plant_graph, simulate_cascade, synthetic_plant_graph
+from scenario_engine import (SCENARIO_AXES, evaluate_grid, monte_carlo, parameter_sweep, scenario_kernel,
+                             sweep_index, tornado_ranges)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """רושם פונקציית מדידה תחת שם"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def best_time(func, repeat=3):
+    """מחזיר את זמן הריצה הטוב ביותר (שניות) מתוך כמה הרצות"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, seconds, items=None, unit="נקודות"):
+    """מדפיס שורת תוצאה אחידה"""
+    line = f"  {label:<40} {seconds * 1000:10.2f} ms"
+    if items:
+        line += f"  ({items / seconds:,.0f} {unit}/s)"
+    print(line)
+
+
+# ----------------------------------------
+# סדרות חיישנים: לולאות מול מערכים
+# ----------------------------------------
+
+def legacy_sensor_series(timestamps, with_anomalies, optimized):
+    """העתק של מסלול הלולאות המקורי של create_data_flow - לצורך השוואה בלבד"""
+    timepoints = len(timestamps)
+    result = {}
+    for sensor in SENSOR_NAMES:
+        base = BASE_VALUES[sensor]
+        noise_level = 0.05 * base
+        trend = np.sin(np.linspace(0, 4*np.pi, timepoints)) * 0.1 * base
+        values = base + trend + np.random.normal(0, noise_level, timepoints)
+
+        if with_anomalies:
+            for _ in range(random.randint(2, 3)):
+                anomaly_start = random.randint(10, timepoints - 20)
+                anomaly_length = random.randint(3, 8)
+                if random.random() > 0.5:
+                    for i in range(anomaly_length):
+                        if anomaly_start + i < timepoints:
+                            values[anomaly_start + i] = base + base * 0.2 + np.random.normal(0, noise_level/2)
+                else:
+                    for i in range(anomaly_length):
+                        if anomaly_start + i < timepoints:
+                            values[anomaly_start + i] = base - base * 0.15 + np.random.normal(0, noise_level/2)
+
+        if optimized:
+            optimization_point = int(timepoints * 0.7)
+            for i in range(optimization_point, timepoints):
+                values[i] = base + (values[i] - base) * 0.6
+
+        anomalies_warning = []
+        anomalies_critical = []
+        for i, val in enumerate(values):
+            if val >= THRESHOLDS[sensor]['critical']:
+                anomalies_critical.append((timestamps[i], val))
+            elif val >= THRESHOLDS[sensor]['warning']:
+                anomalies_warning.append((timestamps[i], val))
+
+        result[sensor] = (values, anomalies_warning, anomalies_critical)
+    return result
+
+
+def vectorized_sensor_series(timestamps, with_anomalies, optimized):
+    """המסלול החדש - מטריצה אחת ומסכות בוליאניות"""
+    values = generate_sensor_series(len(timestamps), with_anomalies, optimized)
+    warning_mask, critical_mask = threshold_masks(values)
+    return {
+        sensor: (values[i], timestamps[warning_mask[i]], timestamps[critical_mask[i]])
+        for i, sensor in enumerate(SENSOR_NAMES)
+    }
+
+
+@benchmark("series")
+def bench_series(args):
+    """יצירת סדרות חיישנים וסימון חריגות - לולאות מול מערכים"""
+    sizes = [100, 10_000, 100_000] if args.quick else [100, 10_000, 100_000, 1_000_000, 5_000_000]
+    legacy_limit = 100_000 if args.quick else 1_000_000
+    for timepoints in sizes:
+        timestamps = pd.date_range(end=pd.Timestamp.now(), periods=timepoints, freq="s")
+        print(f"timepoints={timepoints:,} x {len(SENSOR_NAMES)} חיישנים")
+        points = timepoints * len(SENSOR_NAMES)
+        repeat = 1 if timepoints >= 100_000 else 3
+        vec = best_time(lambda: vectorized_sensor_series(timestamps, True, True), repeat)
+        report("מערכים (generate_sensor_series)", vec, points)
+        if timepoints <= legacy_limit:
+            legacy = best_time(lambda: legacy_sensor_series(timestamps, True, True), repeat)
+            report("לולאות (המסלול המקורי)", legacy, points)
+            print(f"  האצה: x{legacy / vec:,.1f}")
+
+
+# ----------------------------------------
+# הקטנת סדרות לגרף: LTTB ומינימום/מקסימום
+# ----------------------------------------
+
+@benchmark("downsample")
+def bench_downsample(args):
+    """הקטנת סדרת חודש לרוחב הגרף ובדיקת שמירת חציות הסף"""
+    rng = np.random.default_rng(0)
+    base, warning, critical = BASE_VALUES[SENSOR_NAMES[0]], 80, 85
+    sizes = [43_200, 259_200] if args.quick else [43_200, 259_200, 2_592_000]
+    for n in sizes:
+        timestamps = np.arange(n, dtype=np.int64) * 10 * 10**9
+        values = (base + 0.1 * base * np.sin(np.linspace(0, 60 * np.pi, n))
+                  + rng.standard_normal(n) * 0.05 * base).astype(np.float32)
+        bucket = np.arange(n) // -(-n // CHART_WIDTH_PX)
+        print(f"n={n:,} נקודות, רוחב {CHART_WIDTH_PX}px")
+        for method in ("lttb", "minmax"):
+            keep = downsample(timestamps, values, (warning, critical), method)
+            seconds = best_time(lambda: downsample(timestamps, values, (warning, critical), method))
+            report(f"{method}: {len(keep):,} נקודות", seconds, n)
+            # כל פיקסל שיש בו נקודה מעל סף חייב לשמור נקודה מעל אותו סף
+            for level in (warning, critical):
+                expected = np.unique(bucket[values >= level])
+                kept = np.unique(bucket[keep][values[keep] >= level])
+                assert np.array_equal(expected, kept), f"חציית סף {level} אבדה ב-{method}"
+        print("  כל חציות הסף נשמרו")
+
+
+# ----------------------------------------
+# זיהוי אנומליות רציף: דגימה-דגימה מול אצוות
+# ----------------------------------------
+
+@benchmark("anomaly")
+def bench_anomaly(args):
+    """קצב גלאי האנומליות (Welford, EWMA, CUSUM, z חסין) ובדיקת זהות בין אצווה לדגימה בודדת"""
+    sizes = [10_000, 100_000] if args.quick else [10_000, 100_000, 1_000_000]
+    scalar_limit = 10_000 if args.quick else 50_000
+    for n in sizes:
+        values = generate_sensor_series(n, with_anomalies=True, optimized=False,
+                                        rng=np.random.default_rng(0))[0]
+        timestamps = np.arange(n, dtype=np.int64)
+        print(f"n={n:,} דגימות לחיישן")
+
+        events = SensorAnomalyDetector(SENSOR_NAMES[0]).update_batch(timestamps, values)
+        batch = best_time(lambda: SensorAnomalyDetector(SENSOR_NAMES[0]).update_batch(timestamps, values))
+        report(f"אצווה: {len(events):,} אירועים", batch, n, "דגימות")
+
+        if n <= scalar_limit:
+            detector = SensorAnomalyDetector(SENSOR_NAMES[0])
+            start = time.perf_counter()
+            scalar_events = [event for t, x in zip(timestamps, values) for event in detector.update(t, x)]
+            report("דגימה בודדת (update)", time.perf_counter() - start, n, "דגימות")
+            # שני המסלולים חייבים להפיק אותם אירועים, באותו סדר
+            assert [(e.timestamp, e.detector, e.severity) for e in scalar_events] == \
+                   [(e.timestamp, e.detector, e.severity) for e in events], "אי-התאמה בין אצווה לדגימה בודדת"
+    print("  אצווה ודגימה בודדת מפיקות אירועים זהים")
+
+
+# ----------------------------------------
+# ניקוד היסטורי באצווה: מטריצת חיישנים × זמן
+# ----------------------------------------
+
+@benchmark("batch_score")
+def bench_batch_score(args):
+    """ניקוד z מתגלגל לכל החיישנים יחד - עד 1,000 חיישנים × מיליון דגימות"""
+    rng = np.random.default_rng(0)
+    sizes = [(5, 259_200), (1_000, 10_000), (100, 100_000)]
+    if not args.quick:
+        sizes += [(100, 1_000_000), (1_000, 1_000_000)]
+    sensor_block = 50  # בלוקים של חיישנים - מטריצה של מיליארד דגימות אינה נכנסת לזיכרון
+    for n_sensors, n in sizes:
+        print(f"{n_sensors:,} חיישנים × {n:,} דגימות")
+        seconds = 0.0
+        flagged = 0
+        for first in range(0, n_sensors, sensor_block):
+            rows = min(sensor_block, n_sensors - first)
+            values = (50 + rng.standard_normal((rows, n), dtype=np.float32) * 2)
+            start = time.perf_counter()
+            warning_mask, critical_mask = score_masks(values)
+            seconds += time.perf_counter() - start
+            flagged += int(warning_mask.sum() + critical_mask.sum())
+        report(f"מטריצה (score_masks): {flagged:,} מסומנות", seconds, n_sensors * n, "דגימות")
+
+        if n_sensors * n <= 10_000_000:
+            values = 50 + rng.standard_normal((n_sensors, n)) * 2
+            loop = best_time(lambda: [score_masks(row) for row in values], 1)
+            report("לולאה על החיישנים", loop, n_sensors * n, "דגימות")
+            robust = best_time(lambda: score_masks(values[:, :n // 10], robust=True), 1)
+            report("חציון ו-MAD (robust, עשירית מהסדרה)", robust, n_sensors * n // 10, "דגימות")
+
+
+# ----------------------------------------
+# קליטת נתוני חיישנים: פענוח מסגרות ושרת מקומי
+# ----------------------------------------
+
+@benchmark("ingest")
+def bench_ingest(args):
+    """פענוח מסגרות בינאריות וכתיבה למאגר, וקליטה מקצה לקצה בשרת TCP מקומי (יעד: 500k נקודות/s)"""
+    points = 1_000_000 if args.quick else 5_000_000
+    rng = np.random.default_rng(0)
+    for batch in (100, 1_000, 10_000):
+        frames = synthetic_frames(batch, 1_000_000, rng=rng)
+        data = b"".join(next(frames) for _ in range(points // batch))
+
+        def decode_and_write():
+            chunks, _ = decode_frames(data)
+            ingest_records(SensorStore(), np.concatenate(chunks))
+
+        report(f"פענוח וכתיבה, {batch:,} נקודות למסגרת", best_time(decode_and_write), points)
+
+    server = IngestionServer(SensorStore(), tcp_port=0, udp_port=0)
+    if not server.start():
+        print(f"  פתיחת השרת נכשלה: {server.error}")
+        return
+    start = time.perf_counter()
+    sent = publish(port=server.tcp_port, rate=0, duration=2 if args.quick else 5, batch_size=5_000)
+    while server.stats.points + server.stats.dropped < sent and time.perf_counter() - start < 60:
+        time.sleep(0.01)
+    report(f"שרת TCP מקצה לקצה: {server.stats.points:,} התקבלו", time.perf_counter() - start,
+           server.stats.points)
+    server.stop()
+
+
+# ----------------------------------------
+# היסטוריה על דיסק: כתיבה, קריאה ממופה ושחזור אחרי קריסה
+# ----------------------------------------
+
+def check_history_recovery(root):
+    """מדמה קריסות באמצע כתיבה ומוודא שהפתיחה מחדש משחזרת מצב עקבי"""
+    sensor = SENSOR_NAMES[0]
+    timestamps = 20_000 * NS_PER_DAY + np.arange(2_000, dtype=np.int64) * 10**10
+    values = np.arange(2_000, dtype=np.float32)
+    history = HistoryStore(root)
+    history.append(sensor, timestamps, values)
+    history.close()
+    segment = history._segments[sensor][20_000]
+
+    # זנב חלקי בשתי העמודות (האינדקס לא עודכן) - נחתך, ושום רשומה מאושרת לא אובדת
+    with open(segment.ts_path, "ab") as f:
+        f.write(b"\x01" * 13)
+    with open(segment.val_path, "ab") as f:
+        f.write(b"\x02" * 6)
+    history = HistoryStore(root)
+    stored_timestamps, stored_values = history.read(sensor, timestamps[0], timestamps[-1] + 1)
+    assert history.recovered == 1 and np.array_equal(stored_timestamps, timestamps)
+    assert np.array_equal(stored_values, values)
+    assert segment.ts_path.stat().st_size == len(timestamps) * 8
+    history.close()
+
+    # אינדקס שמאשר יותר ממה שנשמר בעמודה - מתוקן לאורך העמודה הקצרה
+    with open(segment.ts_path, "r+b") as f:
+        f.truncate((len(timestamps) - 3) * 8)
+    history = HistoryStore(root)
+    assert history.last_timestamp(sensor) == timestamps[-4]
+    assert history.append(sensor, timestamps[-3:], values[-3:]) == 3
+    stored_timestamps, _ = history.read(sensor, timestamps[0], timestamps[-1] + 1)
+    assert np.array_equal(stored_timestamps, timestamps)
+    history.close()
+
+
+@benchmark("history")
+def bench_history(args):
+    """היסטוריה עמודתית על דיסק: קצב כתיבה, קריאת חודש ממופה לזיכרון ושחזור אחרי קריסה"""
+    n = 30 * 24 * 360  # חודש של דגימות כל 10 שניות
+    batch = 1_000
+    rng = np.random.default_rng(0)
+    start_ns = 20_000 * NS_PER_DAY
+    timestamps = start_ns + np.arange(n, dtype=np.int64) * 10**10
+    values = rng.standard_normal(n).astype(np.float32)
+    sensors = SENSOR_NAMES[:1] if args.quick else SENSOR_NAMES
+
+    with tempfile.TemporaryDirectory() as root:
+        history = HistoryStore(root)
+        start = time.perf_counter()
+        for sensor in sensors:
+            for first in range(0, n, batch):
+                history.append(sensor, timestamps[first:first + batch], values[first:first + batch])
+        report(f"כתיבה באצוות של {batch:,} ({len(sensors)} חיישנים)", time.perf_counter() - start,
+               n * len(sensors))
+
+        end_ns = int(timestamps[-1]) + 1
+        segments = best_time(lambda: history.read_segments(sensors[0], start_ns, end_ns))
+        report("חודש כ-views ממופים (read_segments)", segments, n)
+        concatenated = best_time(lambda: history.read(sensors[0], start_ns, end_ns))
+        report("חודש כמערך רציף (read)", concatenated, n)
+        day = best_time(lambda: history.read(sensors[0], end_ns - NS_PER_DAY // 2, end_ns))
+        report("חצי יום (view ממופה יחיד)", day, n // 60)
+        history.close()
+
+    with tempfile.TemporaryDirectory() as root:
+        check_history_recovery(root)
+    print("  השחזור אחרי קריסה תקין")
+
+
+@benchmark("rollup")
+def bench_rollup(args):
+    """שכבות צבירה 1s/1m/1h: קצב עדכון, ושאילתת חודש במילישניות בכל קצב קליטה"""
+    sensor = SENSOR_NAMES[0]
+    start_ns = 20_000 * NS_PER_DAY
+    batch = 7_777  # לא מיושר לגבולות הדליים - בודק את מיזוג הדלי הפתוח
+    for rate in (0.1, 1) if args.quick else (0.1, 1, 10):
+        rollups = RollupStore([sensor])
+        period_ns = int(1e9 / rate)
+        n = int(30 * 24 * 3600 * rate)
+        rng = np.random.default_rng(0)
+        check = None
+        elapsed = 0.0
+        for first in range(0, n, batch):
+            timestamps = start_ns + np.arange(first, min(first + batch, n), dtype=np.int64) * period_ns
+            values = rng.standard_normal(len(timestamps)).astype(np.float32)
+            started = time.perf_counter()
+            rollups.update(sensor, timestamps, values)
+            elapsed += time.perf_counter() - started
+            if first == 0:
+                check = (timestamps, values)
+        report(f"עדכון בקצב {rate:g}Hz (חודש)", elapsed, n)
+
+        end_ns = start_ns + n * period_ns
+        tier, rows = rollups.query(sensor, start_ns, end_ns, CHART_WIDTH_PX)
+        query = best_time(lambda: rollups.query(sensor, start_ns, end_ns, CHART_WIDTH_PX))
+        print(f"  שאילתת חודש: שכבה {tier}, {len(rows):,} דליים, {query * 1e3:.3f}ms")
+
+        # הדליים שנבנו בהדרגה זהים לצבירה ישירה של האצווה הראשונה
+        expected = aggregate(*check, rows["start"][1] - rows["start"][0])
+        stored = rows[:len(expected) - 1]
+        assert np.array_equal(stored["count"], expected["count"][:-1])
+        assert np.allclose(stored["sum"], expected["sum"][:-1])
+        assert np.array_equal(stored["max"], expected["max"][:-1])
+
+
+SCENARIO_PARAMS = {
+    "כשל חיישנים": {"sensor_failure": 30, "pattern": "חיישנים קריטיים", "redundancy": "בינונית"},
+    "הפסקת חשמל/מים": {"utility": "חשמל", "duration": 30, "backup": ["גנרטור חירום"]},
+    "תקלת ציוד קריטי": {"equipment": "מכונה M4 (אמצע קו ייצור)", "failure_type": "כשל מלא", "response_time": 30},
+    "שרשרת תגובה": {"initial_point": "משאבה ראשית", "cascade_depth": 3, "safety": "סטנדרטית"},
+    "תנאי קיצון סביבתיים": {"condition": "רעידת אדמה", "intensity": 85, "duration": 12},
+}
+
+
+# ----------------------------------------
+# גרפים חיים: גרף מלא בכל רענון מול תיקונים
+# ----------------------------------------
+
+def _patch_ticks(ticks, build, update):
+    """מריץ רענונים כמו בתצוגה: גרף מלא בכל פעם (st.plotly_chart) מול FigureStream שהדפדפן אישר
+
+    מחזיר (בתים וזמן לרענון בגרף מלא, בתים וזמן לרענון בתיקונים) - ממוצע על הרענונים שאחרי הראשון.
+    """
+    stream = FigureStream()
+    full_bytes = patch_bytes = full_time = patch_time = 0
+    for tick in range(ticks):
+        start = time.perf_counter()
+        full = len(figure_json(build(tick)))
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        stream.sync("view", None if tick == 0 else stream.figure_id)
+        update(stream, tick)
+        message = stream.message(build(tick) if stream.full else None)
+        patch_elapsed = time.perf_counter() - start
+        if tick:
+            full_bytes += full
+            full_time += elapsed
+            patch_bytes += message_size(message)
+            patch_time += patch_elapsed
+    n = ticks - 1
+    return full_bytes / n, full_time / n, patch_bytes / n, patch_time / n
+
+
+def _report_patches(label, full_bytes, full_time, patch_bytes, patch_time):
+    print(f"  {label}: גרף מלא {full_bytes / 1024:,.1f} KB / {full_time * 1000:.1f} ms, "
+          f"תיקונים {patch_bytes / 1024:,.2f} KB / {patch_time * 1000:.1f} ms לרענון "
+          f"(פי {full_bytes / patch_bytes:,.0f} פחות נתונים)")
+
+
+@benchmark("figure_patches")
+def bench_figure_patches(args):
+    """מטען רשת לרענון: גרף זרימת הנתונים החי ומודל המפעל - גרף מלא מול extendTraces/restyle"""
+    ticks = 5 if args.quick else 20
+    # גרף חי: חלון של שעה בדגימה לשנייה, מוקטן ב-LTTB, ומתקדם 2 שניות בכל רענון
+    window, step = 3600, 2
+    timestamps = pd.date_range(end=pd.Timestamp.now(), periods=window + ticks * step, freq="s").values
+    values = generate_sensor_series(len(timestamps))
+
+    def live_window(tick):
+        span = slice(tick * step, tick * step + window)
+        series = []
+        for i, sensor in enumerate(SENSOR_NAMES):
+            keep = downsample(timestamps[span], values[i, span])
+            series.append((timestamps[span][keep], values[i, span][keep]))
+        return series
+
+    windows = [live_window(tick) for tick in range(ticks)]
+
+    def build_live(tick):
+        return go.Figure([go.Scatter(x=x, y=y, mode="lines", name=sensor)
+                          for sensor, (x, y) in zip(SENSOR_NAMES, windows[tick])])
+
+    def update_live(stream, tick):
+        for k, (x, y) in enumerate(windows[tick]):
+            stream.append(k, x, y)
+
+    result = _patch_ticks(ticks, build_live, update_live)
+    _report_patches(f"זרימת נתונים ({len(SENSOR_NAMES)} חיישנים, שעה)", *result)
+    assert result[0] > 10 * result[2], "התיקונים אינם קטנים פי 10 מהגרף המלא"
+
+    # מודל המפעל: רשת מאוחדת לכל צד, ומצבי החיישנים מתחלפים בכל רענון
+    for scale in ("קו ייצור",) if args.quick else ("קו ייצור", "מפעל מלא"):
+        geometry = factory_geometry(build_plant_layout(scale, np.random.default_rng(0)))
+        layout = geometry["layout"]
+        grid = SpatialGrid(geometry["sensor_x"], geometry["sensor_y"])
+        boxes = lod_machine_boxes(layout)
+        vertex_x, vertex_y, vertex_z, i, j, k, _ = batched_box_mesh(
+            boxes["x"], boxes["y"], boxes["z"], boxes["half_x"], boxes["half_y"], boxes["height"])
+        rng = np.random.default_rng(1)
+        markers = [lod_markers(layout, grid, geometry["sensor_x"], geometry["sensor_y"], geometry["sensor_z"],
+                               sample_sensor_status(layout.n_sensors, rng), "בינונית", SENSOR_STATUSES, None)
+                   for _ in range(ticks)]
+
+        def status_traces(tick):
+            for code in range(len(SENSOR_STATUSES)):
+                indices = np.flatnonzero(markers[tick]["status"] == code)
+                yield code, dict(x=markers[tick]["x"][indices], y=markers[tick]["y"][indices],
+                                 z=markers[tick]["z"][indices], marker_size=markers[tick]["size"][indices])
+
+        def build_factory(tick):
+            fig = go.Figure([go.Mesh3d(x=vertex_x + offset, y=vertex_y, z=vertex_z, i=i, j=j, k=k)
+                             for offset in (0, geometry["digital_offset"])])
+            for _, attributes in status_traces(tick):
+                fig.add_trace(go.Scatter3d(mode="markers", **attributes))
+            return fig
+
+        def update_factory(stream, tick):
+            for code, attributes in status_traces(tick):
+                stream.restyle(2 + code, **attributes)
+
+        result = _patch_ticks(ticks, build_factory, update_factory)
+        _report_patches(f"מודל המפעל ({scale}, {layout.n_sensors:,} חיישנים)", *result)
+
+
+# ----------------------------------------
+# אינטראקציות באפליקציה: הרצה מלאה של הסקריפט מול fragment
+#
+# המדידה נשענת על פנימיות של Streamlit (נבדקה מול 1.65): מאגר ה-fragments של AppTest
+# (app._fragment_storage._fragments), שם המשתנה non_optional_func בסגור של כל fragment,
+# והחלפת RerunData / exec_func_with_error_handling / parse_tree_from_messages במודולים
+# של ה-script runner. שדרוג של Streamlit עלול לשבור אותה - _fragment_id ו-_app_runs
+# נכשלים אז במפורש (KeyError / AttributeError) ולא מחזירים מדידה שגויה.
+# ----------------------------------------
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "digital_twin.py")
+
+
+def _fragment_id(app, name):
+    """מזהה ה-fragment שנרשם בהרצה האחרונה עבור הפונקציה name (פנימיות AppTest - ראו למעלה)"""
+    for fragment_id, fragment in app._fragment_storage._fragments.items():
+        if inspect.getclosurevars(fragment).nonlocals["non_optional_func"].__name__ == name:
+            return fragment_id
+    raise KeyError(name)
+
+
+@contextlib.contextmanager
+def _app_runs(fragment_id=None):
+    """רושם לכל הרצה של AppTest את זמן ביצוע הסקריפט ואת גודל ההודעות לדפדפן
+
+    הזמן הוא ביצוע הקוד בלבד - בלי קומפילציית הסקריפט, ש-AppTest חוזר עליה בכל הרצה
+    ושרת Streamlit שומר במטמון. עם fragment_id ההרצות מוגבלות ל-fragment, כמו שהשרת
+    מריץ לחיצה שמגיעה מתוכו (AppTest לבדו מריץ תמיד את הסקריפט כולו). כל השמות
+    שמוחלפים כאן פנימיים ל-Streamlit - mock.patch.object נכשל אם אחד מהם נעלם.
+    """
+    from streamlit.runtime.scriptrunner import RerunData, script_runner
+    from streamlit.testing.v1 import local_script_runner
+
+    runs = []
+    execute = script_runner.exec_func_with_error_handling
+    parse = local_script_runner.parse_tree_from_messages
+
+    def timed_execute(func, ctx):
+        start = time.perf_counter()
+        try:
+            return execute(func, ctx)
+        finally:
+            runs.append([time.perf_counter() - start, 0])
+
+    def measured_parse(messages):
+        runs[-1][1] = sum(message.ByteSize() for message in messages)
+        return parse(messages)
+
+    rerun_data = functools.partial(RerunData, fragment_id_queue=[fragment_id]) if fragment_id else RerunData
+    with mock.patch.object(script_runner, "exec_func_with_error_handling", timed_execute), \
+            mock.patch.object(local_script_runner, "parse_tree_from_messages", measured_parse), \
+            mock.patch.object(local_script_runner, "RerunData", rerun_data):
+        yield runs
+
+
+@benchmark("fragments")
+def bench_fragments(args):
+    """זמן האינטראקציה: לחיצה על "הוסף אירוע חדש" ורענון הגרף החי - הרצה מלאה מול fragment"""
+    from streamlit.testing.v1 import AppTest
+
+    repeat = 3 if args.quick else 5
+    modes = (("מודל המפעל והתאום", "זרימת נתונים בזמן אמת") if args.quick else
+             ("מודל המפעל והתאום", "זרימת נתונים בזמן אמת", "השוואת ביצועים", "סימולטור תרחישים"))
+
+    def interaction(mode, fragment, action):
+        """זמן וגודל הטובים ביותר מתוך repeat פעולות: הרצה מלאה, ואחריה מוגבלת ל-fragment
+
+        אחרי הרצה של fragment עץ התצוגה של AppTest מכיל רק אותו - לכן כל מדידה על אפליקציה חדשה.
+        """
+        app = AppTest.from_file(APP_PATH, default_timeout=120)
+        app.run()
+        app.selectbox[0].set_value(mode).run()
+        results = []
+        for fragment_id in (None, _fragment_id(app, fragment)):
+            with _app_runs(fragment_id) as runs:
+                for _ in range(repeat):
+                    action(app)
+            assert not app.exception, app.exception
+            results.append(min(runs))
+        (full_time, full_bytes), (fragment_time, fragment_bytes) = results
+        return full_time, full_bytes, fragment_time, fragment_bytes
+
+    def add_event(app):
+        [button for button in app.button if button.label == "הוסף אירוע חדש"][0].click().run()
+
+    def live_tick(app):
+        # הדפדפן מאשר את הגרף המלא שקיבל (ערך הרכיב) - מכאן הרענונים שולחים תיקונים בלבד
+        app.session_state["live_data_flow"] = app.session_state["live_data_flow_stream"].figure_id
+        app.run()
+
+    def report_interaction(label, full_time, full_bytes, fragment_time, fragment_bytes):
+        print(f"  {label}: הרצה מלאה {full_time * 1000:,.1f} ms / {full_bytes / 1024:,.1f} KB, "
+              f"fragment {fragment_time * 1000:,.1f} ms / {fragment_bytes / 1024:,.1f} KB "
+              f"(פי {full_time / fragment_time:,.0f} מהר יותר)")
+
+    for mode in modes:
+        result = interaction(mode, "event_log_panel", add_event)
+        report_interaction(f"אירוע חדש ({mode})", *result)
+        assert result[0] > 5 * result[2], "לחיצה ביומן האירועים עדיין מריצה את האפליקציה כולה"
+    result = interaction("זרימת נתונים בזמן אמת", "render_live_data_flow", live_tick)
+    report_interaction("רענון הגרף החי", *result)
+
+
+@benchmark("monte_carlo")
+def bench_monte_carlo(args):
+    """מונטה קרלו לתרחישי הקיצון: הגרלות לשנייה לליבה, ופיזור על כל הליבות"""
+    n = 100_000 if args.quick else 1_000_000
+    cores = os.cpu_count() or 1
+    for scenario_type, params in SCENARIO_PARAMS.items():
+        elapsed = best_time(lambda: monte_carlo(scenario_type, params, n, seed=1, workers=1), repeat=1)
+        report(f"{scenario_type}, ליבה אחת", elapsed, n, "הגרלות")
+        single = monte_carlo(scenario_type, params, n, seed=1, workers=1)
+        if cores > 1:
+            elapsed = best_time(lambda: monte_carlo(scenario_type, params, n, seed=1, workers=cores), repeat=1)
+            report(f"{scenario_type}, {cores} ליבות", elapsed, n / cores, "הגרלות לליבה")
+            parallel = monte_carlo(scenario_type, params, n, seed=1, workers=cores)
+            # אותו זרע נותן אותם אחוזונים בכל מספר תהליכים
+            assert all(np.array_equal(single[key], parallel[key]) for key in single)
+
+        # החציון קרוב לערך הנקודתי של החישוב הדטרמיניסטי
+        point = scenario_kernel(scenario_type, params)
+        print(f"    P5/P50/P95 זמן השבתה: {np.round(single['downtime'], 1)} (נקודתי: {float(point[1]):.1f})")
+
+
+@benchmark("scenario_grid")
+def bench_scenario_grid(args):
+    """גרעין ההשפעות על רשת כל צירופי הפרמטרים, ובדיקת זהות מול קריאה בודדת לכל נקודה"""
+    rng = np.random.default_rng(0)
+    for scenario_type, axes in SCENARIO_AXES.items():
+        names = list(axes)
+        n = int(np.prod([len(values) for values in axes.values()]))
+        grid = evaluate_grid(scenario_type, SCENARIO_PARAMS[scenario_type], names)
+        elapsed = best_time(lambda: evaluate_grid(scenario_type, SCENARIO_PARAMS[scenario_type], names))
+        report(f"{scenario_type} ({n:,} צירופים)", elapsed, n, "צירופים")
+
+        for _ in range(50 if args.quick else 500):
+            index = tuple(rng.integers(len(values)) for values in axes.values())
+            params = {name: np.asarray(axes[name])[i].item() for name, i in zip(names, index)}
+            if scenario_type == "הפסקת חשמל/מים":
+                params["backup"] = ["גנרטור חירום"] * params["backup"]
+            point = tuple(int(value) for value in scenario_kernel(scenario_type, params, integer=True))
+            assert point == tuple(int(result[index]) for result in grid), (scenario_type, params)
+
+
+@benchmark("sweep")
+def bench_sweep(args):
+    """סריקת רגישות: טנזור כל הצירופים לכל תרחיש (יעד לשרשרת תגובה: פחות משנייה) וחיפוש בו"""
+    for scenario_type, params in SCENARIO_PARAMS.items():
+        elapsed = best_time(lambda: parameter_sweep(scenario_type), repeat=1 if args.quick else 3)
+        sweep = parameter_sweep(scenario_type)
+        report(f"סריקה מלאה - {scenario_type} {sweep['downtime'].shape}", elapsed, sweep["downtime"].size, "צירופים")
+        if scenario_type == "שרשרת תגובה":
+            assert elapsed < 1.0, f"הסריקה של שרשרת תגובה ארכה {elapsed:.2f}s"
+
+        # הזזת מחוון: חיפוש בטנזור וטווחי הטורנדו, במקום חישוב מחדש
+        lookup = best_time(lambda: tornado_ranges(sweep["downtime"], sweep_index(scenario_type, params)))
+        report("  חיפוש + טווחי טורנדו", lookup)
+        expected = scenario_kernel(scenario_type, params, integer=True)
+        index = sweep_index(scenario_type, params)
+        assert all(sweep[metric][index] == value
+                   for metric, value in zip(("productivity", "downtime", "cost"), expected))
+
+
+@benchmark("cascade")
+def bench_cascade(args):
+    """התפשטות כשל בגרף תלויות (CSR) - תא ההדגמה וגרף בגודל מפעל, ובדיקה מול פתרון אנליטי"""
+    # שרשרת פשוטה: הצומת ה-i כושל בהסתברות p^i (ובעומק מוגבל - רק עד העומק)
+    chain = DependencyGraph(range(10), np.ones(10), np.arange(9), np.arange(1, 10), np.full(9, 0.5))
+    result = simulate_cascade(chain, 0, n_trials=100_000, max_depth=6, seed=1)
+    expected = np.where(np.arange(10) <= 6, 0.5 ** np.arange(10), 0)
+    assert np.allclose(result.failure_probability, expected, atol=0.01), result.failure_probability
+
+    graph = plant_graph()
+    elapsed = best_time(lambda: simulate_cascade(graph, "משאבה ראשית", max_depth=3))
+    report(f"תא ההדגמה ({len(graph)} צמתים), 4,096 ניסויים", elapsed, 4096, "ניסויים")
+
+    trials = 1024 if args.quick else 4096
+    for n_machines in (1_000, 10_000):
+        graph = synthetic_plant_graph(n_machines, np.random.default_rng(0))
+        start = time.perf_counter()
+        result = simulate_cascade(graph, "חשמל", n_trials=trials)
+        report(f"{len(graph):,} צמתים, {graph.n_edges:,} קשתות", time.perf_counter() - start, trials, "ניסויים")
+        print(f"    צמתים שכשלו בממוצע: {result.failure_probability.sum():,.0f}, "
+              f"זמן תיקון מצטבר ממוצע: {result.plant_downtime.mean():,.0f} דקות")
+
+
+@benchmark("production_sim")
+def bench_production_sim(args):
+    """סימולציית אירועים של קו M1-M8: חודש מסומלץ צריך לרוץ בשניות בודדות"""
+    # בלי כשלים הקו מוגבל רק בצוואר הבקבוק
+    ideal = simulate_line(7 * 24 * 60, seed=1, mtbf=np.inf)
+    bound = ideal.horizon / max(CYCLE_MINUTES)
+    assert 0.97 * bound <= ideal.throughput <= bound * 1.01, (ideal.throughput, bound)
+
+    horizon = (7 if args.quick else 30) * 24 * 60
+    start = time.perf_counter()
+    result = simulate_line(horizon, seed=1)
+    elapsed = time.perf_counter() - start
+    report(f"{horizon // (24 * 60)} ימים מסומלצים ({result.throughput:,} יחידות)", elapsed, result.events, "אירועים")
+    print(f"    מהיר מזמן אמת פי {horizon * 60 / elapsed:,.0f}")
+    assert elapsed < 5.0, f"סימולציה של {horizon // (24 * 60)} ימים ארכה {elapsed:.2f}s"
+    assert simulate_line(horizon, seed=1).throughput == result.throughput  # אותו זרע - אותה ריצה
+
+    elapsed = best_time(lambda: simulate_equipment_failure("מכונה M4 (אמצע קו ייצור)", "כשל מלא", 30))
+    report("תרחיש תקלת ציוד (משמרת עם התקלה ובלעדיה)", elapsed)
+
+    # גרעין התרחיש (מונטה קרלו, סריקה, משטח) מכויל לסימולציה - נבדק מול חזרות בזרע אחר,
+    # גם בזמני תגובה שבין נקודות הכיול
+    n_replications = 40 if args.quick else 160
+    for equipment, failure_type, response_time in (("מכונה M1 (תחילת קו ייצור)", "כשל מלא", 30),
+                                                   ("מכונה M4 (אמצע קו ייצור)", "ירידה בביצועים (50%)", 45),
+                                                   ("מכונה M7 (סוף קו ייצור)", "אי-יציבות", 100)):
+        params = {"equipment": equipment, "failure_type": failure_type, "response_time": response_time}
+        productivity, downtime, _ = scenario_kernel("תקלת ציוד קריטי", params)
+        for summary in run_replications(equipment, failure_type, response_time, n_replications, seed=1, workers=1):
+            pass
+        print(f"    {equipment}, {failure_type}, {response_time} דקות: גרעין {productivity:.1f}% / {downtime:.0f} דקות, "
+              f"סימולציה {summary.mean['productivity']:.1f}% ± {summary.half_width['productivity']:.1f} / "
+              f"{summary.mean['downtime']:.0f} דקות")
+        assert abs(productivity - summary.mean["productivity"]) <= summary.half_width["productivity"] + 1.0
+
+
+@benchmark("replications")
+def bench_replications(args):
+    """חזרות של סימולציית הקו על מאגר תהליכים - סקיילינג ב-1/2/4/N עובדים ועצירה מוקדמת"""
+    n_replications = 64 if args.quick else 256
+    scenario = ("מכונה M4 (אמצע קו ייצור)", "כשל מלא", 30)
+    baseline = None
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        for summary in run_replications(*scenario, n_replications, workers=workers):
+            pass
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline, first = elapsed, summary
+        report(f"{n_replications} חזרות, {workers} עובדים (האצה x{baseline / elapsed:.2f})",
+               elapsed, n_replications, "חזרות")
+        # הצבירה לפי סדר השליחה - אותה תוצאה בכל מספר עובדים
+        assert summary.mean == first.mean, (workers, summary.mean, first.mean)
+    print(f"    תפוקה: {first.mean['productivity']:.1f}% ± {first.half_width['productivity']:.2f}")
+
+    start = time.perf_counter()
+    for summary in run_replications(*scenario, 1000, target_half_width=1.0):
+        pass
+    report(f"עצירה מוקדמת ב-±1.0: {summary.n} חזרות", time.perf_counter() - start, summary.n, "חזרות")
+    assert summary.converged and summary.half_width["productivity"] <= 1.0
+
+
+@benchmark("fleet")
+def bench_fleet(args):
+    """מחזור חיים של כל הצי: גיל דיגיטלי, חציית סף, NPV ודירוג - חישוב מחדש מלא מתחת לשנייה"""
+    for n_assets in (20_000,) if args.quick else (20_000, 200_000):
+        fleet = generate_fleet(n_assets)
+        # תחזית לשנתיים (כמו מסך הנכס) ולעשר שנים - מטריצה נכסים × חודשים
+        for horizon in (24, 120):
+            elapsed = best_time(lambda: rank_fleet(fleet_lifecycle(fleet, horizon)))
+            report(f"חישוב מחדש של {n_assets:,} נכסים, אופק {horizon} חודשים", elapsed, n_assets, "נכסים")
+            if n_assets == 20_000:
+                assert elapsed < 1.0, f"חישוב הצי ארך {elapsed:.2f}s"
+
+
+@benchmark("registry")
+def bench_registry(args):
+    """מרשם הנכסים: אתחול, בורר הנכסים על האינדקס, עדכון נכס בודד וחישוב מחדש של כל הצי"""
+    sizes = (20_000,) if args.quick else (20_000, 100_000)
+    with tempfile.TemporaryDirectory() as root:
+        for n_assets in sizes:
+            start = time.perf_counter()
+            registry = AssetRegistry(os.path.join(root, f"assets_{n_assets}.sqlite"), n_assets)
+            report(f"אתחול מרשם של {n_assets:,} נכסים (כולל התאמת RUL)", time.perf_counter() - start, n_assets, "נכסים")
+
+            elapsed = best_time(lambda: registry.select("תשתיות", "גבוה"), repeat=20)
+            report("  בורר: קטגוריה + רמת סיכון, לפי מועד החלפה", elapsed)
+            asset_id = registry.select("תשתיות")[0][0]
+            report("  קריאת נכס", best_time(lambda: registry.asset(asset_id), repeat=20))
+            report("  עדכון נכס וחישוב מדדיו", best_time(lambda: registry.update_inputs(asset_id, age_factor=1.0)))
+            report("  חישוב מחדש של כל הצי", best_time(registry.refresh, repeat=1), n_assets, "נכסים")
+            registry.close()
+
+
+@benchmark("rul")
+def bench_rul(args):
+    """הערכת RUL: התאמה מחדש של כל הצי מההיסטוריה (לילית), ונכס בודד במסך הנכס"""
+    # נכונות: עקומה מדויקת של כל מודל משוחזרת במודל שלה
+    t = np.arange(-24, 1.0)
+    age = np.full(3, 120.0)
+    truth = np.stack([60 - 0.8 * t, 60 * np.exp(-0.02 * t), 100 * np.exp(-((age[2] + t) / 200) ** 2.5)])
+    assert (fit_models(truth, age)[1] == [0, 1, 2]).all()
+
+    with tempfile.TemporaryDirectory() as root:
+        registry = AssetRegistry(os.path.join(root, "assets.sqlite"), 2_000 if args.quick else 20_000)
+        n_assets = len(registry)
+        elapsed = best_time(registry.refit_rul, repeat=1)
+        report(f"התאמה לילית של {n_assets:,} נכסים (אופק {RUL_HORIZON_MONTHS} חודשים)", elapsed, n_assets, "נכסים")
+        asset_id = registry.select("תשתיות")[0][0]
+        rul = registry.rul(asset_id)
+        assert rul["rul_p10"] <= rul["rul_p50"] <= rul["rul_p90"]
+        if n_assets == 20_000:
+            assert elapsed < 180, f"ההתאמה ארכה {elapsed:.1f}s"
+
+        record = registry.asset(asset_id)
+        lifetime = CATEGORY_PARAMS[record["category"]]["base_lifetime"]
+        history = history_curves(record["digital_age"], lifetime, record["history_noise"])
+        elapsed = best_time(lambda: estimate_rul(history, record["digital_age"] * 12, seed=asset_id), repeat=5)
+        report("  נכס בודד, 200 דגימות bootstrap", elapsed)
+        registry.close()
+
+
+@benchmark("portfolio")
+def bench_portfolio(args):
+    """תכנון תיק החלפות ל-10 שנים תחת תקציב וצוותים - תכנית אפשרית, והפער מהחסם התחתון"""
+    for n_assets in (20_000,) if args.quick else (20_000, 100_000):
+        fleet = generate_fleet(n_assets)
+        lifecycle = fleet_lifecycle(fleet)
+        budget = BUDGET_SHARE * lifecycle["replacement_cost"].sum()
+        crews = DEFAULT_CREWS * n_assets // 20_000
+        start = time.perf_counter()
+        plan = plan_replacements(fleet, lifecycle, annual_budget=budget, crews=crews)
+        elapsed = time.perf_counter() - start
+        report(f"{n_assets:,} נכסים × 10 שנים ({plan.iterations} איטרציות, פער {plan.gap:.2%})",
+               elapsed, n_assets, "נכסים")
+        assert (plan.capex <= budget * (1 + 1e-9)).all() and (plan.crew_days <= crews * CREW_DAYS_PER_YEAR).all()
+        assert plan.lower_bound <= plan.total_cost
+        if n_assets == 20_000:
+            assert elapsed < 5.0, f"התכנון ארך {elapsed:.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="מדידות ביצועים לתאום הדיגיטלי")
+    parser.add_argument("names", nargs="*", help="שמות המדידות להרצה: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="גדלים מוקטנים להרצה מהירה")
+    args = parser.parse_args()
+
+    for name in args.names or BENCHMARKS:
+        func = BENCHMARKS[name]
+        print(f"== {name}: {func.__doc__}")
+        func(args)
+
+
+if __name__ == "__main__":
+    main()
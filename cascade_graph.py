@@ -0,0 +1,187 @@
+"""מנוע התפשטות כשלים בגרף התלויות של המפעל
+
+הגרף מכוון: קשת u -> v פירושה שכשל ב-u מפיל את v בהסתברות p. הקשתות נשמרות
+בייצוג CSR (indptr, indices, probabilities), והתפשטות הכשל מנקודת ההתחלה מורצת
+כ-BFS על אלפי ניסויי מונטה קרלו יחד: בכל רמה כל זוגות (ניסוי, צומת) של החזית
+מורחבים לכל הקשתות היוצאות שלהם במערך אחד, וכל קשת מוגרלת פעם אחת לכל ניסוי.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from factory_layout import LINES_PER_ZONE, MACHINES_PER_LINE
+
+DEFAULT_TRIALS = 4096
+
+# צמתי המפעל: זמן תיקון (דקות) לכל רכיב
+PLANT_NODES = {
+    # תשתיות
+    "חשמל": 120, "מים": 60, "קיטור": 90, "אוויר דחוס": 45,
+    # מערכות (כמו במטריצת הפגיעות)
+    "מערכת חשמל": 120, "הידראוליקה": 90, "בקרת איכות": 45, "ניטור": 30, "לוגיסטיקה": 60, "תקשורת": 40,
+    # נקודות כשל התחלתיות של שרשרת התגובה
+    "ספק מתח 24V": 30, "משאבה ראשית": 90, "חיישן לחץ M2": 20, "חיישן טמפרטורה M5": 20,
+    # מכונות הקו
+    "M1": 90, "M2": 60, "M3": 60, "M4": 75, "M5": 60, "M6": 60, "M7": 60, "M8": 45,
+}
+
+# תלויות: (מקור, יעד, הסתברות שכשל במקור מפיל את היעד)
+PLANT_DEPENDENCIES = [
+    ("חשמל", "מערכת חשמל", 0.9),
+    ("מערכת חשמל", "ספק מתח 24V", 0.6),
+    ("מערכת חשמל", "משאבה ראשית", 0.7),
+    ("מערכת חשמל", "תקשורת", 0.4),
+    ("מערכת חשמל", "אוויר דחוס", 0.5),
+    ("ספק מתח 24V", "ניטור", 0.6),
+    ("ספק מתח 24V", "תקשורת", 0.5),
+    ("ספק מתח 24V", "חיישן לחץ M2", 0.5),
+    ("ספק מתח 24V", "חיישן טמפרטורה M5", 0.5),
+    ("משאבה ראשית", "הידראוליקה", 0.8),
+    ("משאבה ראשית", "מים", 0.5),
+    ("מים", "קיטור", 0.5),
+    ("משאבה ראשית", "קיטור", 0.4),
+    ("הידראוליקה", "M2", 0.6),
+    ("הידראוליקה", "M3", 0.5),
+    ("הידראוליקה", "M5", 0.5),
+    ("הידראוליקה", "M6", 0.4),
+    ("אוויר דחוס", "M4", 0.4),
+    ("אוויר דחוס", "M7", 0.4),
+    ("קיטור", "M3", 0.3),
+    ("קיטור", "M6", 0.3),
+    ("חיישן לחץ M2", "M2", 0.5),
+    ("חיישן לחץ M2", "ניטור", 0.3),
+    ("חיישן טמפרטורה M5", "M5", 0.5),
+    ("חיישן טמפרטורה M5", "ניטור", 0.3),
+    ("ניטור", "בקרת איכות", 0.5),
+    ("תקשורת", "ניטור", 0.4),
+    ("תקשורת", "לוגיסטיקה", 0.3),
+    ("בקרת איכות", "לוגיסטיקה", 0.2),
+    ("M8", "לוגיסטיקה", 0.5),
+] + [
+    # עצירת מכונה מרעיבה את המכונה שאחריה בקו
+    (f"M{i}", f"M{i + 1}", 0.35) for i in range(1, 8)
+] + [
+    (name, f"M{i}", 0.3) for name in ("מערכת חשמל",) for i in range(1, 9)
+]
+
+
+class CascadeResult(NamedTuple):
+    failure_probability: np.ndarray  # לכל צומת
+    expected_downtime: np.ndarray    # לכל צומת: הסתברות הכשל × זמן התיקון (דקות)
+    plant_downtime: np.ndarray       # לכל ניסוי: סך זמני התיקון של הרכיבים שכשלו (צוות תיקון אחד)
+
+
+class DependencyGraph:
+    """גרף תלויות מכוון בייצוג CSR - הקשתות היוצאות של צומת u הן indices[indptr[u]:indptr[u + 1]]"""
+
+    def __init__(self, names, repair_minutes, sources, targets, probabilities):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.repair_minutes = np.asarray(repair_minutes, dtype=float)
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind="stable")
+        self.indices = np.asarray(targets, dtype=np.int64)[order]
+        self.probabilities = np.asarray(probabilities, dtype=float)[order]
+        self.indptr = np.zeros(len(self.names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.names)), out=self.indptr[1:])
+
+    @classmethod
+    def from_edges(cls, nodes, edges):
+        """בונה גרף ממילון צמתים (שם -> זמן תיקון) ורשימת קשתות (מקור, יעד, הסתברות)"""
+        index = {name: i for i, name in enumerate(nodes)}
+        sources, targets, probabilities = zip(*edges)
+        return cls(nodes, list(nodes.values()), [index[name] for name in sources],
+                   [index[name] for name in targets], probabilities)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+
+def plant_graph():
+    """גרף התלויות של תא ההדגמה: מכונות M1-M8, תשתיות, מערכות ונקודות הכשל"""
+    return DependencyGraph.from_edges(PLANT_NODES, PLANT_DEPENDENCIES)
+
+
+def synthetic_plant_graph(n_machines, rng=None):
+    """גרף בגודל מפעל: קווים של MACHINES_PER_LINE מכונות, ולכל אזור צמתי חשמל, הידראוליקה וניטור
+
+    מכונה מרעיבה את הבאה בקו, צמתי האזור מזינים את כל מכונות האזור, ותשתיות המפעל
+    מזינות את צמתי האזורים - כמו בתא ההדגמה, בקנה מידה של אלפי צמתים.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    per_zone = MACHINES_PER_LINE * LINES_PER_ZONE
+    n_zones = -(-n_machines // per_zone)
+    plant = ["חשמל", "משאבה ראשית", "תקשורת"]
+    zone_kinds = ["חשמל", "הידראוליקה", "ניטור"]
+    names = plant + [f"אזור {z} - {kind}" for z in range(n_zones) for kind in zone_kinds]
+    names += [f"M{i + 1}" for i in range(n_machines)]
+    repair = np.r_[[120, 90, 40], np.tile([90, 75, 30], n_zones), rng.uniform(30, 120, n_machines)]
+
+    machines = len(plant) + 3 * n_zones + np.arange(n_machines)
+    machine_zone = np.arange(n_machines) // per_zone
+    zone_power = len(plant) + 3 * np.arange(n_zones)
+    in_line = np.arange(n_machines) % MACHINES_PER_LINE != MACHINES_PER_LINE - 1
+    edges = [
+        # תשתיות המפעל -> צמתי האזורים
+        (np.zeros(n_zones, dtype=np.int64), zone_power, np.full(n_zones, 0.6)),
+        (np.ones(n_zones, dtype=np.int64), zone_power + 1, np.full(n_zones, 0.5)),
+        (np.full(n_zones, 2), zone_power + 2, np.full(n_zones, 0.4)),
+        # צמתי האזור -> מכונות האזור
+        (zone_power[machine_zone], machines, rng.uniform(0.05, 0.25, n_machines)),
+        (zone_power[machine_zone] + 1, machines, rng.uniform(0.05, 0.2, n_machines)),
+        # מכונה -> המכונה שאחריה בקו
+        (machines[:-1][in_line[:-1]], machines[1:][in_line[:-1]], np.full(in_line[:-1].sum(), 0.35)),
+    ]
+    sources, targets, probabilities = (np.concatenate(parts) for parts in zip(*edges))
+    return DependencyGraph(names, repair, sources, targets, probabilities)
+
+
+def simulate_cascade(graph, initial, n_trials=DEFAULT_TRIALS, max_depth=None, probability_scale=1.0, seed=0):
+    """מריץ n_trials ניסויים של התפשטות כשל מהצומת initial ומחזיר CascadeResult
+
+    מודל מפל בלתי תלוי: כל צומת שכשל מנסה להפיל כל שכן פעם אחת, ברמה שאחרי כשלו.
+    max_depth מגביל את מספר הרמות (עומק שרשרת התגובה); probability_scale מכפיל את
+    הסתברויות הקשתות (מערכות בטיחות), עד 1. הזיכרון: מטריצה בוליאנית ניסויים × צמתים.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(graph)
+    initial = graph.index[initial] if isinstance(initial, str) else int(initial)
+    probabilities = np.minimum(1.0, graph.probabilities * probability_scale)
+
+    failed = np.zeros((n_trials, n), dtype=bool)
+    trials = np.arange(n_trials)
+    nodes = np.full(n_trials, initial)
+    failed[trials, nodes] = True
+    failures = np.bincount(nodes, minlength=n)
+    plant_downtime = np.full(n_trials, graph.repair_minutes[initial])
+
+    depth = 0
+    while len(trials) and (max_depth is None or depth < max_depth):
+        # הרחבת כל זוג (ניסוי, צומת) בחזית לכל הקשתות היוצאות מהצומת
+        starts = graph.indptr[nodes]
+        counts = graph.indptr[nodes + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+        first = np.cumsum(counts) - counts
+        edges = np.repeat(starts - first, counts) + np.arange(total)
+        edge_trials = np.repeat(trials, counts)
+
+        hit = rng.random(total) < probabilities[edges]
+        trials, nodes = edge_trials[hit], graph.indices[edges[hit]]
+        # רק צמתים שלא כשלו עדיין מצטרפים לחזית - וכל אחד פעם אחת לכל ניסוי
+        fresh = ~failed[trials, nodes]
+        keys = np.sort(trials[fresh] * n + nodes[fresh])
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]][:len(keys)]]
+        trials, nodes = keys // n, keys % n
+        failed[trials, nodes] = True
+        failures += np.bincount(nodes, minlength=n)
+        plant_downtime += np.bincount(trials, graph.repair_minutes[nodes], minlength=n_trials)
+        depth += 1
+
+    failure_probability = failures / n_trials
+    return CascadeResult(failure_probability, failure_probability * graph.repair_minutes, plant_downtime)
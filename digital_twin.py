@@ -1,11 +1,47 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
+import json
 import time
 from datetime import datetime, timedelta
+from pathlib import Path
 import random
+from collections import deque
+
+from sensor_series import (SENSOR_NAMES, SENSOR_COLORS, THRESHOLDS, OPTIMIZATION_FRACTION,
+                           generate_sensor_series, threshold_masks)
+from sensor_store import NS_PER_SECOND, SensorStore, local_now_ns
+from ingestion import DEFAULT_HOST, DEFAULT_TCP_PORT, DEFAULT_UDP_PORT, IngestionServer
+from history_store import HistoryStore
+from rollups import rollup_series
+from anomaly_detection import (DETECTOR_PATTERNS, SensorAnomalyDetector, StreamingAnomalyEngine,
+                               event_markers, mask_markers, score_masks, summarize_events)
+from downsampling import CHART_WIDTH_PX, downsample, mask_bucket_indices, target_points, threshold_bucket_indices
+from figure_patches import PLOTLY_UNAVAILABLE, FigureStream, bundle_plotly_js, figure_json
+from factory_layout import (PLANT_SCALES, BOX_I, BOX_J, BOX_K, SENSOR_STATUSES, STATUS_COLORS,
+                            MAX_CONNECTION_LINES, BATCHED_MESH_MIN_MACHINES, batched_box_mesh,
+                            box_vertices, build_plant_layout, factory_geometry, polyline_segments,
+                            sample_sensor_status)
+from spatial_lod import SpatialGrid, lod_machine_boxes, lod_markers
+from cascade_graph import plant_graph, simulate_cascade
+from asset_lifecycle import (CATEGORIES, CATEGORY_PARAMS, DAYS_PER_MONTH, FORECAST_MONTHS, HISTORY_MONTHS,
+                             MAINTENANCE_THRESHOLD, REPLACEMENT_THRESHOLD, RISK_BANDS, cumulative_maintenance,
+                             fleet_lifecycle, history_curves, optimal_replacement_months,
+                             rank_fleet, replacement_npv, rul_threshold_months)
+from asset_registry import RUL_HORIZON_MONTHS, AssetRegistry
+from rul_estimation import MODEL_LABELS, RUL_PERCENTILES, estimate_rul
+from replacement_portfolio import BUDGET_SHARE, DEFAULT_CREWS, PLANNING_YEARS, plan_replacements
+from production_sim import (CYCLE_MINUTES, DEFAULT_REPLICATIONS, STATIONS, run_replications,
+                            simulate_equipment_failure, simulate_line)
+from scenario_engine import (PERCENTILES, PROCESSES, SYSTEMS, SCENARIO_AXES, SURFACE_AXES, PARAMETER_LABELS,
+                             DOWNTIME_COST_PER_HOUR, EQUIPMENT_IMPACT, FAILURE_IMPACT, REPAIR_COST,
+                             SIMULATED_REPLICATIONS,
+                             IMPACT_MODIFIER_RANGE, RECOVERY_MODIFIER_RANGE, VULNERABILITY_MODIFIER_RANGE,
+                             evaluate_grid, monte_carlo, parameter_sweep, process_kernel, scenario_kernel,
+                             SAFETY_FACTOR, sweep_index, sweep_slice, tornado_ranges, vulnerability_kernel)
 
 # הגדרת עמוד רחב
 st.set_page_config(layout="wide", page_title="Digital Twin Simulation", page_icon="🏭")
@@ -141,6 +177,10 @@ with col1:
 with col2:
     simulation_speed = st.slider("מהירות הדמיה", min_value=0.5, max_value=3.0, value=1.0, step=0.1)
     sensors_active = st.checkbox("חיישנים פעילים", value=True)
+    patch_figures = st.checkbox(
+        "עדכון גרפים בשינויים בלבד", value=True, key="patch_figures",
+        help="הגרפים החיים נשלחים לדפדפן פעם אחת, ובכל רענון רק הנקודות והסמנים שהשתנו"
+    )
 
 with col3:
     time_range = st.select_slider(
@@ -152,123 +192,159 @@ with col3:
 # חלוקת המסך לחלק מרכזי ויומן אירועים
 col_main, col_events = st.columns([3, 1])
 
-# יצירת מודל מפעל ותאום דיגיטלי
-def create_factory_model():
-    # יצירת נתונים בסיסיים למודל המפעל
-    machines = ['M1', 'M2', 'M3', 'M4', 'M5', 'M6', 'M7', 'M8']
-    x_physical = [0, 10, 20, 30, 5, 15, 25, 35]
-    y_physical = [0, 0, 0, 0, 10, 10, 10, 10]
-    z_physical = [0, 0, 0, 0, 0, 0, 0, 0]
-    
-    # העתקת הנתונים לתאום הדיגיטלי עם הזזה
-    x_digital = [x + 50 for x in x_physical]
-    y_digital = y_physical.copy()
-    z_digital = z_physical.copy()
-    
-    # יצירת נתוני חיישנים
-    n_sensors = 40 if detail_level == "גבוהה" else (25 if detail_level == "בינונית" else 15)
-    
-    sensor_x_physical = []
-    sensor_y_physical = []
-    sensor_z_physical = []
-    sensor_status = []
-    
-    for i in range(n_sensors):
-        machine_idx = i % len(machines)
-        sensor_x_physical.append(x_physical[machine_idx] + np.random.uniform(-2, 2))
-        sensor_y_physical.append(y_physical[machine_idx] + np.random.uniform(-2, 2))
-        sensor_z_physical.append(z_physical[machine_idx] + np.random.uniform(1, 3))
-        
-        # מצבי חיישנים - רוב החיישנים תקינים, מעט באזהרה ומעט במצב קריטי
-        status = np.random.choice(['תקין', 'אזהרה', 'קריטי'], p=[0.7, 0.2, 0.1])
-        sensor_status.append(status)
-    
-    # העתקת נתוני החיישנים לתאום הדיגיטלי
-    sensor_x_digital = [x + 50 for x in sensor_x_physical]
-    sensor_y_digital = sensor_y_physical.copy()
-    sensor_z_digital = sensor_z_physical.copy()
+# רכיב הגרפים: מציג גרף מלא פעם אחת ומחיל עליו תיקונים (extendTraces / restyle) בכל רענון
+FIGURE_PATCH_DIR = Path(__file__).resolve().parent / "figure_patch"
+FIGURE_PATCH_COMPONENT = components.declare_component("figure_patch", path=str(FIGURE_PATCH_DIR))
+
+# plotly.js מוגש מתיקיית הרכיב עצמה - בלי תלות ב-CDN
+@st.cache_resource
+def plotly_js_url():
+    return bundle_plotly_js(FIGURE_PATCH_DIR)
+
+def render_figure(key, figure_id, build, update=None):
+    """מציג גרף דרך רכיב התיקונים - build נקרא רק כשהדפדפן צריך את הגרף המלא
+    
+    figure_id מזהה את מבנה הגרף (הקלטים שלו); כל עוד הוא והאישור מהדפדפן לא השתנו,
+    update(stream) רושם את השינויים והם בלבד נשלחים. כשהאפשרות כבויה, או כשהדפדפן דיווח
+    שלא הצליח לטעון את plotly.js - st.plotly_chart רגיל.
+    """
+    if st.session_state.get(key) == PLOTLY_UNAVAILABLE:
+        st.session_state.plotly_js_unavailable = True
+    if not patch_figures or st.session_state.get("plotly_js_unavailable"):
+        figure = build()
+        st.plotly_chart(json.loads(figure) if isinstance(figure, str) else figure, use_container_width=True)
+        return
+    stream = st.session_state.setdefault(f"{key}_stream", FigureStream())
+    stream.sync(figure_id, st.session_state.get(key))
+    if update is not None:
+        update(stream)
+    FIGURE_PATCH_COMPONENT(message=stream.message(build() if stream.full else None),
+                           plotly_js=plotly_js_url(), key=key, default=None)
+
+# פריסת המפעל (מכונות, קווים, אזורים וחיישנים) - נבנית פעם אחת לתהליך עבור כל היקף
+@st.cache_resource
+def get_plant_layout(plant_scale):
+    return build_plant_layout(plant_scale)
+
+# גיאומטריה סטטית ואינדקס מרחבי על החיישנים - מחושבים פעם אחת לתהליך עבור כל פריסה
+@st.cache_resource
+def compute_factory_geometry(plant_scale):
+    geometry = factory_geometry(get_plant_layout(plant_scale))
+    geometry['sensor_grid'] = SpatialGrid(geometry['sensor_x'], geometry['sensor_y'])
+    return geometry
+
+def build_static_factory_figure(geometry, batched=False, focus_zone=None):
+    """בונה את הגרף התלת-ממדי הסטטי; עקבות החיישנים נוצרים ריקים ומתמלאים בכל הרצה
+    
+    במצב batched כל התיבות של כל צד מאוחדות לעקבת Mesh3d אחת וכל קווי החיבור לעקבה אחת,
+    כך שמספר העקבות קבוע ואינו גדל עם מספר המכונות. במפעל גדול אזורים שלמים משורטטים
+    כתיבה אחת, ומכונות בודדות רק באזור הנבחר.
+    """
+    offset = geometry['digital_offset']
+    sensor_x_physical = geometry['sensor_x']
+    sensor_y_physical = geometry['sensor_y']
+    sensor_z_physical = geometry['sensor_z']
+    sensor_x_digital = sensor_x_physical + offset
     
     # יצירת המודל התלת-ממדי
     fig = go.Figure()
     
-    # יצירת המכונות במודל הפיזי
-    for i, (x, y, z, machine) in enumerate(zip(x_physical, y_physical, z_physical, machines)):
-        fig.add_trace(go.Mesh3d(
-            x=[x-2, x+2, x+2, x-2, x-2, x+2, x+2, x-2],
-            y=[y-2, y-2, y+2, y+2, y-2, y-2, y+2, y+2],
-            z=[z, z, z, z, z+4, z+4, z+4, z+4],
-            i=[0, 0, 0, 0, 4, 4, 4, 4],
-            j=[1, 2, 4, 3, 5, 6, 2, 1],
-            k=[2, 6, 6, 7, 6, 7, 3, 5],
-            color=px.colors.qualitative.Plotly[i % len(px.colors.qualitative.Plotly)],
-            opacity=0.7,
-            name=f'מכונה {machine} (פיזית)'
-        ))
-    
-    # יצירת המכונות במודל הדיגיטלי
-    for i, (x, y, z, machine) in enumerate(zip(x_digital, y_digital, z_digital, machines)):
-        fig.add_trace(go.Mesh3d(
-            x=[x-2, x+2, x+2, x-2, x-2, x+2, x+2, x-2],
-            y=[y-2, y-2, y+2, y+2, y-2, y-2, y+2, y+2],
-            z=[z, z, z, z, z+4, z+4, z+4, z+4],
-            i=[0, 0, 0, 0, 4, 4, 4, 4],
-            j=[1, 2, 4, 3, 5, 6, 2, 1],
-            k=[2, 6, 6, 7, 6, 7, 3, 5],
-            color=px.colors.qualitative.Plotly[i % len(px.colors.qualitative.Plotly)],
-            opacity=0.3,
-            name=f'תאום דיגיטלי {machine}'
-        ))
-    
-    # הוספת חיישנים לפי סטטוס
-    colors = {'תקין': 'green', 'אזהרה': 'orange', 'קריטי': 'red'}
-    
-    for status in colors.keys():
-        indices = [i for i, s in enumerate(sensor_status) if s == status]
-        
-        if indices:
-            x_status = [sensor_x_physical[i] for i in indices]
-            y_status = [sensor_y_physical[i] for i in indices]
-            z_status = [sensor_z_physical[i] for i in indices]
-            
-            fig.add_trace(go.Scatter3d(
-                x=x_status,
-                y=y_status,
-                z=z_status,
-                mode='markers',
-                marker=dict(
-                    size=8,
-                    color=colors[status],
-                    symbol='circle',
-                    opacity=0.9
-                ),
-                name=f'חיישנים: {status}'
+    machine_coords = list(zip(geometry['machine_x'], geometry['machine_y'], geometry['machine_z'], geometry['machines']))
+    palette = px.colors.qualitative.Plotly
+    
+    # יצירת המכונות במודל הפיזי ובמודל הדיגיטלי
+    sides = [(0, 0.7, 'מכונה {} (פיזית)', 'מכונות (פיזי)'), (offset, 0.3, 'תאום דיגיטלי {}', 'מכונות (תאום דיגיטלי)')]
+    if batched:
+        boxes = lod_machine_boxes(geometry['layout'], focus_zone)
+        vertex_x, vertex_y, vertex_z, i, j, k, vertex_box = batched_box_mesh(
+            boxes['x'], boxes['y'], boxes['z'], boxes['half_x'], boxes['half_y'], boxes['height'])
+        # צבע לכל קודקוד לפי זהות המכונה (או האזור), ושמה לריחוף
+        vertex_colors = np.array(palette)[boxes['color'][vertex_box] % len(palette)]
+        vertex_names = boxes['label'][vertex_box]
+        for side_offset, opacity, _, trace_name in sides:
+            fig.add_trace(go.Mesh3d(
+                x=vertex_x + side_offset,
+                y=vertex_y,
+                z=vertex_z,
+                i=i,
+                j=j,
+                k=k,
+                vertexcolor=vertex_colors,
+                text=vertex_names,
+                hoverinfo='text',
+                opacity=opacity,
+                name=trace_name,
+                showlegend=True
             ))
-            
-            # הוספת החיישנים גם לתאום הדיגיטלי
-            x_digital_status = [sensor_x_digital[i] for i in indices]
-            y_digital_status = [sensor_y_digital[i] for i in indices]
-            z_digital_status = [sensor_z_digital[i] for i in indices]
-            
-            fig.add_trace(go.Scatter3d(
-                x=x_digital_status,
-                y=y_digital_status,
-                z=z_digital_status,
-                mode='markers',
-                marker=dict(
-                    size=8,
-                    color=colors[status],
-                    symbol='diamond',
-                    opacity=0.5
-                ),
-                name=f'חיישנים דיגיטליים: {status}'
+    
+    for side_offset, opacity, label, _ in ([] if batched else sides):
+        for i, (x, y, z, machine) in enumerate(machine_coords):
+            box_x, box_y, box_z = box_vertices(x + side_offset, y, z)
+            fig.add_trace(go.Mesh3d(
+                x=box_x,
+                y=box_y,
+                z=box_z,
+                i=BOX_I,
+                j=BOX_J,
+                k=BOX_K,
+                color=px.colors.qualitative.Plotly[i % len(px.colors.qualitative.Plotly)],
+                opacity=opacity,
+                name=label.format(machine)
             ))
     
+    # עקבות חיישנים לפי סטטוס - פיזי ודיגיטלי
+    status_traces = {}
+    for status in SENSOR_STATUSES:
+        fig.add_trace(go.Scatter3d(
+            x=[], y=[], z=[],
+            mode='markers',
+            marker=dict(
+                size=8,
+                color=STATUS_COLORS[status],
+                symbol='circle',
+                opacity=0.9
+            ),
+            hoverinfo='text',
+            name=f'חיישנים: {status}'
+        ))
+        fig.add_trace(go.Scatter3d(
+            x=[], y=[], z=[],
+            mode='markers',
+            marker=dict(
+                size=8,
+                color=STATUS_COLORS[status],
+                symbol='diamond',
+                opacity=0.5
+            ),
+            hoverinfo='text',
+            name=f'חיישנים דיגיטליים: {status}'
+        ))
+        status_traces[status] = (len(fig.data) - 2, len(fig.data) - 1)
+    
     # הוספת קווי חיבור בין העולם הפיזי לדיגיטלי
-    for i in range(min(10, n_sensors)):
+    n_lines = min(MAX_CONNECTION_LINES, len(sensor_x_physical))
+    if batched:
+        line_x, line_y, line_z = polyline_segments(
+            sensor_x_physical[:n_lines], sensor_y_physical[:n_lines], sensor_z_physical[:n_lines],
+            sensor_x_digital[:n_lines], sensor_y_physical[:n_lines], sensor_z_physical[:n_lines])
+        fig.add_trace(go.Scatter3d(
+            x=line_x,
+            y=line_y,
+            z=line_z,
+            mode='lines',
+            line=dict(
+                color='blue',
+                width=2,
+                dash='dash'
+            ),
+            showlegend=False
+        ))
+    
+    for i in ([] if batched else range(n_lines)):
         fig.add_trace(go.Scatter3d(
             x=[sensor_x_physical[i], sensor_x_digital[i], None],
-            y=[sensor_y_physical[i], sensor_y_digital[i], None],
-            z=[sensor_z_physical[i], sensor_z_digital[i], None],
+            y=[sensor_y_physical[i], sensor_y_physical[i], None],
+            z=[sensor_z_physical[i], sensor_z_physical[i], None],
             mode='lines',
             line=dict(
                 color='blue',
@@ -297,10 +373,177 @@ def create_factory_model():
         height=600
     )
     
-    return fig
+    return fig, status_traces
 
-# יצירת הדמיית זרימת נתונים
-def create_data_flow():
+def invalidate_factory_model():
+    """מנקה את מטמון הגיאומטריה ואת הגרף הסטטי של הסשן (למשל לאחר שינוי פריסה)"""
+    compute_factory_geometry.clear()
+    get_plant_layout.clear()
+    st.session_state.pop('factory_figure', None)
+
+# יצירת מודל מפעל ותאום דיגיטלי
+def create_factory_model(plant_scale="תא הדגמה", batched=None, focus_zone=None):
+    """מחזיר (מפתח הגרף הסטטי, הגרף, ומאפייני עקבות הסטטוס בהרצה הזו לפי אינדקס עקבה)"""
+    geometry = compute_factory_geometry(plant_scale)
+    layout = geometry['layout']
+    if batched is None:
+        batched = layout.n_machines >= BATCHED_MESH_MIN_MACHINES
+    cache_key = (plant_scale, batched, focus_zone)
+    
+    # הגרף הסטטי נשמר בסשן ונבנה מחדש רק כשהפריסה, מצב האיחוד או האזור הנבחר משתנים
+    cached = st.session_state.get('factory_figure')
+    if cached is None or cached[0] != cache_key:
+        cached = (cache_key, *build_static_factory_figure(geometry, batched, focus_zone))
+        st.session_state['factory_figure'] = cached
+    _, fig, status_traces = cached
+    
+    # רענון מצבי החיישנים ובחירת הסמנים לפי שכבת הפירוט - רק עקבות הסטטוס משתנות
+    sensor_status = sample_sensor_status(layout.n_sensors)
+    markers = lod_markers(
+        layout, geometry['sensor_grid'], geometry['sensor_x'], geometry['sensor_y'], geometry['sensor_z'],
+        sensor_status, detail_level, SENSOR_STATUSES, focus_zone
+    )
+    offset = geometry['digital_offset']
+    text = np.asarray(markers['text'], dtype=object)
+    updates = {}
+    for code, status in enumerate(SENSOR_STATUSES):
+        indices = np.flatnonzero(markers['status'] == code)
+        physical_idx, digital_idx = status_traces[status]
+        x_status = markers['x'][indices]
+        y_status = markers['y'][indices]
+        z_status = markers['z'][indices]
+        for trace_idx, side_offset in [(physical_idx, 0), (digital_idx, offset)]:
+            updates[trace_idx] = dict(
+                x=x_status + side_offset, y=y_status, z=z_status,
+                text=text[indices], marker_size=markers['size'][indices],
+                visible=bool(len(indices))
+            )
+    
+    return cache_key, fig, updates
+
+def render_factory_model(plant_scale, batched=None, focus_zone=None):
+    """המודל התלת-ממדי דרך רכיב התיקונים - הרשתות נשלחות פעם אחת, ובכל רענון רק עקבות הסטטוס"""
+    cache_key, fig, updates = create_factory_model(plant_scale, batched, focus_zone)
+    
+    def build():
+        for trace_idx, attributes in updates.items():
+            fig.data[trace_idx].update(**attributes)
+        return fig
+    
+    def update(stream):
+        for trace_idx, attributes in updates.items():
+            stream.restyle(trace_idx, **attributes)
+    
+    render_figure("factory_model", cache_key, build, update)
+
+# היסטוריית החיישנים על הדיסק - מקטעים שנקטעו בקריסה משוחזרים בפתיחה
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+# מאגר חיישנים מתמשך - משותף לכל ההרצות של התהליך, בנפח זיכרון קבוע; מתחיל מההיסטוריה שנשמרה
+@st.cache_resource
+def get_sensor_store():
+    store = SensorStore()
+    store.load_history(get_history_store(), local_now_ns())
+    return store
+
+# מנוע זיהוי אנומליות רציף - מעבד כל דגימה חדשה במאגר פעם אחת בלבד
+@st.cache_resource
+def get_anomaly_engine():
+    return StreamingAnomalyEngine(SENSOR_NAMES)
+
+def score_live_window(windows):
+    """מנקד מחדש את כל חלון הזמן (ציוני z מתגלגלים וספים) ומחזיר מסכות אזהרה/קריטי לכל חיישן
+
+    ציוני z מחושבים על הערכים והספים נבדקים על השיאים (מקסימום הדלי בשכבת צבירה).
+    סימוני האזהרה נקבעים מהספים בלבד - ציון z של אזהרה (|z|≥3) מופיע מאות פעמים ביממה
+    ברעש רגיל; ציון z קריטי נדיר ומסומן כקריטי יחד עם חציות הסף הקריטי.
+    כשלכל החיישנים אותה רשת זמנים החלון כולו מנוקד כמטריצה אחת (חיישנים × זמן).
+    """
+    if len({len(values) for _, values, _ in windows}) == 1:
+        _, score_critical = score_masks(np.vstack([values for _, values, _ in windows]))
+        threshold_warning, threshold_critical = threshold_masks(np.vstack([peaks for _, _, peaks in windows]),
+                                                                SENSOR_NAMES)
+    else:
+        score_critical = [score_masks(values)[1] for _, values, _ in windows]
+        thresholds = [threshold_masks(peaks, [sensor]) for sensor, (_, _, peaks) in zip(SENSOR_NAMES, windows)]
+        threshold_warning, threshold_critical = [mask for mask, _ in thresholds], [mask for _, mask in thresholds]
+    
+    masks = []
+    for i in range(len(windows)):
+        critical = score_critical[i] | threshold_critical[i]
+        warning = threshold_warning[i] & ~critical
+        masks.append((warning, critical, score_critical[i]))
+    return masks
+
+# שרת קליטה מקומי (TCP/UDP) שכותב לאותו מאגר חיישנים - מופעל פעם אחת לתהליך
+@st.cache_resource
+def get_ingestion_server():
+    server = IngestionServer(get_sensor_store(), history=get_history_store())
+    server.start()
+    return server
+
+def read_window(sensor, window_seconds, now_ns, min_points):
+    """חלון הזמן של חיישן כ-(זמנים, ערכים, שיאים)
+
+    טווח ארוך נקרא משכבת הצבירה הגסה ביותר שעדיין נותנת לפחות min_points נקודות -
+    ממוצע הדלי הוא הערך ומקסימום הדלי הוא השיא. אחרת נקראות הדגימות הגולמיות מהמאגר
+    בזיכרון, או מההיסטוריה שעל הדיסק (memmap) כשהמאגר כבר דרס חלק מהחלון.
+    """
+    store = get_sensor_store()
+    tier, rows = store.rollup_window(sensor, window_seconds, now_ns, min_points)
+    if tier is not None:
+        means, peaks = rollup_series(rows)
+        return (rows['start'], means, peaks)
+    
+    start_ns = now_ns - int(window_seconds * NS_PER_SECOND)
+    window = store.since(sensor, start_ns)
+    if not store.covers(sensor, start_ns):
+        stored = get_history_store().read(sensor, start_ns, now_ns + 1)
+        if len(stored[0]) > len(window[0]):
+            window = stored
+    return (*window, window[1])
+
+def read_live_series(window_seconds, method="lttb", synthetic=True):
+    """מחזיר חלון (זמנים, ערכים, סימוני אנומליה) מוקטן לכל חיישן
+
+    במצב synthetic המאגר מושלם בדגימות מדומות עד לרגע הנוכחי; אחרת הוא מוזן משרת הקליטה.
+    """
+    store = get_sensor_store()
+    engine = get_anomaly_engine()
+    now_ns = local_now_ns()
+    if synthetic:
+        store.advance_synthetic(now_ns)
+    
+    # כל דגימה חדשה במאגר עוברת בגלאים הרציפים פעם אחת - בהרצה הראשונה רק היממה האחרונה
+    for sensor in SENSOR_NAMES:
+        last = engine.processed_until[sensor]
+        start_ns = now_ns - 24 * 3600 * NS_PER_SECOND if last is None else int(last.astype('int64')) + 1
+        new_timestamps, new_values = store.since(sensor, start_ns)
+        engine.process(sensor, new_timestamps.view('datetime64[ns]'), new_values)
+    
+    # ניקוד מחדש של כל החלון - משתנה עם time_range ולכן לא נשען על מצב הגלאים הרציפים
+    windows = [read_window(sensor, window_seconds, now_ns, target_points(method)) for sensor in SENSOR_NAMES]
+    masks = score_live_window(windows)
+    
+    series = []
+    for sensor, (timestamps, values, peaks), (warning, critical, scored) in zip(SENSOR_NAMES, windows, masks):
+        # הקטנה לפי רוחב הגרף - חציות ספי האזהרה והקריטי נשמרות, וציוני z קריטיים עד אחד לפיקסל
+        levels = (THRESHOLDS[sensor]['warning'], THRESHOLDS[sensor]['critical'])
+        keep = np.union1d(downsample(timestamps, values, levels, method),
+                          mask_bucket_indices(scored, CHART_WIDTH_PX))
+        if peaks is not values:
+            # בשכבת צבירה גם הדליים שהשיא שלהם חצה סף נשמרים (עד שניים לפיקסל)
+            keep = np.union1d(keep, threshold_bucket_indices(peaks, levels, CHART_WIDTH_PX))
+        kept_timestamps = timestamps[keep].view('datetime64[ns]')
+        # סימוני החריגה בשיא הדלי - חריגה קצרה בתוך דלי נראית גם כשהממוצע מתחת לסף
+        series.append((kept_timestamps, values[keep],
+                       mask_markers(kept_timestamps, peaks[keep], warning[keep], critical[keep])))
+    return series
+
+def data_flow_series():
+    """הסדרות של גרף זרימת הנתונים - (זמנים, ערכים, סימוני אנומליה) לכל חיישן"""
     timepoints = 100
     if time_range == "שעה אחרונה":
         time_delta = 1  # שעה
@@ -311,89 +554,48 @@ def create_data_flow():
     else:
         time_delta = 24 * 30  # חודש
     
-    end_time = datetime.now()
-    start_time = end_time - timedelta(hours=time_delta)
-    timestamps = pd.date_range(start=start_time, end=end_time, periods=timepoints)
-    
-    # יצירת נתונים לחיישנים שונים
-    sensor_names = ['טמפרטורה (°C)', 'לחץ (bar)', 'רעידות (mm/s)', 'זרם חשמלי (A)', 'מהירות (RPM)']
-    
-    # ערכי בסיס וספים
-    base_values = {
-        'טמפרטורה (°C)': 75,
-        'לחץ (bar)': 120,
-        'רעידות (mm/s)': 2.5,
-        'זרם חשמלי (A)': 80,
-        'מהירות (RPM)': 1750
-    }
-    
-    thresholds = {
-        'טמפרטורה (°C)': {'warning': 80, 'critical': 85},
-        'לחץ (bar)': {'warning': 130, 'critical': 140},
-        'רעידות (mm/s)': {'warning': 3.0, 'critical': 3.5},
-        'זרם חשמלי (A)': {'warning': 90, 'critical': 95},
-        'מהירות (RPM)': {'warning': 1800, 'critical': 1850}
-    }
+    if mode == "זרימת נתונים בזמן אמת":
+        # קריאת חלון הזמן מהמאגר הטבעתי המתמשך - views ללא העתקה
+        series = read_live_series(time_delta * 3600, synthetic=not st.session_state.get('live_ingestion', False))
+    else:
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=time_delta)
+        timestamps = pd.date_range(start=start_time, end=end_time, periods=timepoints)
+        
+        # יצירת נתונים לחיישנים שונים - כל הסדרות נוצרות יחד כמטריצה (חיישנים × זמן)
+        values_matrix = generate_sensor_series(
+            timepoints,
+            with_anomalies=mode in ["זיהוי אנומליות", "אופטימיזציה אוטומטית"],
+            optimized=mode == "אופטימיזציה אוטומטית"
+        )
+        if mode == "זיהוי אנומליות":
+            # גלאים חדשים לכל סדרה - הסדרות המדומות נוצרות מחדש בכל הרצה
+            events = [SensorAnomalyDetector(sensor).update_batch(timestamps, values_matrix[i])
+                      for i, sensor in enumerate(SENSOR_NAMES)]
+            st.session_state.anomaly_events = [event for sensor_events in events for event in sensor_events]
+            series = [(timestamps, values_matrix[i], event_markers(events[i])) for i in range(len(SENSOR_NAMES))]
+        else:
+            series = [(timestamps, values_matrix[i], None) for i in range(len(SENSOR_NAMES))]
+    
+    for i, (sensor, (timestamps, values, markers)) in enumerate(zip(SENSOR_NAMES, series)):
+        if markers is None:
+            # סימון אנומליות (חריגות מהספים) באמצעות מסכות בוליאניות
+            warning_mask, critical_mask = threshold_masks(values, [sensor])
+            series[i] = (timestamps, values, mask_markers(timestamps, values, warning_mask, critical_mask))
+    return series
+
+def data_flow_figure(series):
+    """גרף זרימת הנתונים מהסדרות
     
-    # יצירת גרף עבור כל חיישן
+    לכל חיישן עם דגימות בחלון שלוש עקבות קבועות - קו, אזהרה וקריטי (מוסתרות כשאין
+    חריגות) - כך שעקבה k * 3 היא הקו של החיישן ה-k עם נתונים, ותיקונים חלים על מבנה קבוע.
+    """
     fig = go.Figure()
     
-    colors = {
-        'טמפרטורה (°C)': 'red',
-        'לחץ (bar)': 'blue',
-        'רעידות (mm/s)': 'orange',
-        'זרם חשמלי (A)': 'purple',
-        'מהירות (RPM)': 'green'
-    }
-    
-    # יצירת נתונים עם אנומליות
-    for sensor in sensor_names:
-        base = base_values[sensor]
-        
-        # יצירת תנודתיות טבעית
-        noise_level = 0.05 * base  # 5% רעש
-        trend = np.sin(np.linspace(0, 4*np.pi, timepoints)) * 0.1 * base
-        
-        # ערכי חיישן בסיסיים
-        values = base + trend + np.random.normal(0, noise_level, timepoints)
-        
-        # הוספת אנומליות בהתאם למצב ההדמיה
-        if mode in ["זיהוי אנומליות", "אופטימיזציה אוטומטית"]:
-            # יצירת 2-3 אנומליות
-            for _ in range(random.randint(2, 3)):
-                anomaly_start = random.randint(10, timepoints - 20)
-                anomaly_length = random.randint(3, 8)
-                
-                # סוג האנומליה - פיק כלפי מעלה או מטה
-                if random.random() > 0.5:
-                    # פיק כלפי מעלה
-                    for i in range(anomaly_length):
-                        if anomaly_start + i < timepoints:
-                            values[anomaly_start + i] = base + base * 0.2 + np.random.normal(0, noise_level/2)
-                else:
-                    # פיק כלפי מטה
-                    for i in range(anomaly_length):
-                        if anomaly_start + i < timepoints:
-                            values[anomaly_start + i] = base - base * 0.15 + np.random.normal(0, noise_level/2)
-        
-        # אם במצב אופטימיזציה, נראה שיפור לאחר התערבות
-        if mode == "אופטימיזציה אוטומטית":
-            optimization_point = int(timepoints * 0.7)
-            
-            # שיפור בנתונים אחרי האופטימיזציה
-            for i in range(optimization_point, timepoints):
-                # יצירת מגמת שיפור
-                values[i] = base + (values[i] - base) * 0.6  # מקטין את החריגה מהבסיס
-        
-        # סימון אנומליות (חריגות מהספים)
-        anomalies_warning = []
-        anomalies_critical = []
-        
-        for i, val in enumerate(values):
-            if val >= thresholds[sensor]['critical']:
-                anomalies_critical.append((timestamps[i], val))
-            elif val >= thresholds[sensor]['warning']:
-                anomalies_warning.append((timestamps[i], val))
+    for sensor, (timestamps, values, markers) in zip(SENSOR_NAMES, series):
+        if len(timestamps) == 0:
+            # אין עדיין דגימות לחיישן בחלון (למשל לפני שהמפרסם התחיל לשלוח)
+            continue
         
         # הוספת קו עבור ערכי החיישן
         fig.add_trace(go.Scatter(
@@ -402,18 +604,19 @@ def create_data_flow():
             mode='lines',
             name=sensor,
             line=dict(
-                color=colors[sensor],
+                color=SENSOR_COLORS[sensor],
                 width=2
             )
         ))
         
-        # הוספת קווי סף
+        # הוספת קווי סף - לרוחב כל הגרף, כך שאינם זזים כשהחלון מתקדם
         fig.add_shape(
             type="line",
-            x0=timestamps[0],
-            y0=thresholds[sensor]['warning'],
-            x1=timestamps[-1],
-            y1=thresholds[sensor]['warning'],
+            xref="paper",
+            x0=0,
+            y0=THRESHOLDS[sensor]['warning'],
+            x1=1,
+            y1=THRESHOLDS[sensor]['warning'],
             line=dict(
                 color="orange",
                 width=1,
@@ -423,10 +626,11 @@ def create_data_flow():
         
         fig.add_shape(
             type="line",
-            x0=timestamps[0],
-            y0=thresholds[sensor]['critical'],
-            x1=timestamps[-1],
-            y1=thresholds[sensor]['critical'],
+            xref="paper",
+            x0=0,
+            y0=THRESHOLDS[sensor]['critical'],
+            x1=1,
+            y1=THRESHOLDS[sensor]['critical'],
             line=dict(
                 color="red",
                 width=1,
@@ -435,43 +639,47 @@ def create_data_flow():
         )
         
         # הוספת סימון לאנומליות
-        if anomalies_warning:
-            fig.add_trace(go.Scatter(
-                x=[x[0] for x in anomalies_warning],
-                y=[x[1] for x in anomalies_warning],
-                mode='markers',
-                marker=dict(
-                    size=8,
-                    color='orange',
-                    symbol='circle',
-                    line=dict(
-                        color='white',
-                        width=1
-                    )
-                ),
-                name=f'אזהרה - {sensor}'
-            ))
+        warning_x, warning_y, warning_text = markers['warning']
+        fig.add_trace(go.Scatter(
+            x=warning_x,
+            y=warning_y,
+            text=warning_text,
+            mode='markers',
+            marker=dict(
+                size=8,
+                color='orange',
+                symbol='circle',
+                line=dict(
+                    color='white',
+                    width=1
+                )
+            ),
+            name=f'אזהרה - {sensor}',
+            visible=bool(len(warning_x))
+        ))
         
-        if anomalies_critical:
-            fig.add_trace(go.Scatter(
-                x=[x[0] for x in anomalies_critical],
-                y=[x[1] for x in anomalies_critical],
-                mode='markers',
-                marker=dict(
-                    size=10,
-                    color='red',
-                    symbol='x',
-                    line=dict(
-                        color='white',
-                        width=1
-                    )
-                ),
-                name=f'קריטי - {sensor}'
-            ))
+        critical_x, critical_y, critical_text = markers['critical']
+        fig.add_trace(go.Scatter(
+            x=critical_x,
+            y=critical_y,
+            text=critical_text,
+            mode='markers',
+            marker=dict(
+                size=10,
+                color='red',
+                symbol='x',
+                line=dict(
+                    color='white',
+                    width=1
+                )
+            ),
+            name=f'קריטי - {sensor}',
+            visible=bool(len(critical_x))
+        ))
     
     # אם במצב אופטימיזציה, נוסיף קו אנכי והתראה בנקודת ההתערבות
     if mode == "אופטימיזציה אוטומטית":
-        optimization_point = timestamps[int(timepoints * 0.7)]
+        optimization_point = timestamps[int(len(timestamps) * OPTIMIZATION_FRACTION)]
         
         fig.add_shape(
             type="line",
@@ -519,6 +727,34 @@ def create_data_flow():
     
     return fig
 
+# יצירת הדמיית זרימת נתונים
+def create_data_flow():
+    return data_flow_figure(data_flow_series())
+
+# קצב הרענון של הגרף החי במהירות הדמיה 1 (שניות); מהירות גבוהה יותר מרעננת מהר יותר
+LIVE_REFRESH_SECONDS = 2.0
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS / simulation_speed)
+def render_live_data_flow():
+    """זרימת הנתונים החיה דרך רכיב התיקונים - בכל רענון רק הנקודות החדשות וסמני החריגה
+    
+    הגרף הוא fragment: הוא מתרענן לבד בקצב ההדמיה, ורענון שלו אינו מריץ את שאר האפליקציה.
+    """
+    series = data_flow_series()
+    # לכל חיישן עם נתונים שלוש עקבות בגרף (ראו data_flow_figure)
+    present = [(sensor, entry) for sensor, entry in zip(SENSOR_NAMES, series) if len(entry[0])]
+    
+    def update(stream):
+        for k, (_, (timestamps, values, markers)) in enumerate(present):
+            stream.append(3 * k, timestamps, values)
+            for offset, level in ((1, 'warning'), (2, 'critical')):
+                x, y, text = markers[level]
+                stream.restyle(3 * k + offset, x=np.asarray(x), y=np.asarray(y), text=np.asarray(text, dtype=object),
+                               visible=bool(len(x)))
+    
+    figure_id = (time_range, st.session_state.get('live_ingestion', False), tuple(sensor for sensor, _ in present))
+    render_figure("live_data_flow", figure_id, lambda: data_flow_figure(series), update)
+
 # יצירת דאשבורד השוואה
 def create_comparison_dashboard():
     # יצירת גרף השוואת ביצועים
@@ -627,6 +863,11 @@ def create_comparison_dashboard():
     
     return fig, roi_fig, cost_fig
 
+@st.cache_data
+def comparison_dashboard_json():
+    """הגרפים הקבועים של דאשבורד ההשוואה - מסודרים ל-JSON פעם אחת לתהליך"""
+    return tuple(figure_json(fig) for fig in create_comparison_dashboard())
+
 # פונקציה להוספת אירועים ליומן
 def add_event(container):
     event_types = {
@@ -707,6 +948,8 @@ def create_extreme_scenario_simulator():
         "בחר סוג תרחיש",
         ["כשל חיישנים", "הפסקת חשמל/מים", "תקלת ציוד קריטי", "שרשרת תגובה", "תנאי קיצון סביבתיים"]
     )
+    simulation_mode = st.radio("אופן הסימולציה", ["הרצה בודדת", "סריקת רגישות"], horizontal=True,
+                               key="scenario_simulation_mode")
     
     # פרמטרים נוספים לפי סוג התרחיש
     if scenario_type == "כשל חיישנים":
@@ -789,6 +1032,23 @@ def create_extreme_scenario_simulator():
             "duration": exposure_time
         }
     
+    if simulation_mode == "סריקת רגישות":
+        # כל צירופי הפרמטרים מחושבים פעם אחת לתרחיש - הזזת מחוון היא חיפוש בטנזור השמור
+        render_parameter_sweep(scenario_type, simulation_params)
+        return
+    
+    # הערכת אי-ודאות: הגרלות של כל הפרמטרים וגורמי אי-הוודאות במקום נקודה בודדת
+    monte_carlo_draws = 0
+    if st.checkbox("הערכת אי-ודאות (מונטה קרלו)", key="scenario_monte_carlo"):
+        monte_carlo_draws = st.select_slider("מספר הגרלות", options=[10_000, 100_000, 1_000_000], value=100_000,
+                                             format_func=lambda n: f"{n:,}")
+    
+    # חזרות מרובות של סימולציית הקו - ממוצע עם רווח סמך במקום משמרת אקראית אחת
+    replication_target = None
+    if scenario_type == "תקלת ציוד קריטי" and st.checkbox("חזרות מרובות של סימולציית הקו",
+                                                          key="scenario_replications"):
+        replication_target = st.slider("רוחב יעד לרווח הסמך (± נקודות תפוקה)", 0.25, 3.0, 1.0, 0.25)
+    
     # כפתור להפעלת הסימולציה
     if st.button("הפעל סימולציה", key="extreme_scenario_btn"):
         st.markdown("### תוצאות סימולציית תרחיש הקיצון")
@@ -808,24 +1068,60 @@ def create_extreme_scenario_simulator():
         
         with col3:
             st.metric("עלות כלכלית מוערכת", f"${impacts['cost']:,}")
+        scenario_source_caption(scenario_type, headline=True)
+        
+        distribution = None
+        if monte_carlo_draws:
+            distribution = run_scenario_monte_carlo(scenario_type, simulation_params, monte_carlo_draws)
+            st.markdown(f"#### התפלגות ההשפעות ({distribution['n_draws']:,} הגרלות)")
+            st.dataframe(pd.DataFrame(
+                [distribution['productivity'], distribution['downtime'], distribution['cost']],
+                index=['תפוקה (%)', 'זמן השבתה (דקות)', 'עלות ($)'],
+                columns=[f"P{p}" for p in PERCENTILES]
+            ).round(1), use_container_width=True)
+        
+        if scenario_type == "שרשרת תגובה":
+            cascade_propagation_view(simulation_params)
+        
+        if impacts['line_simulation'] is not None:
+            result, baseline = impacts['line_simulation']
+            st.markdown("#### סימולציית קו הייצור (משמרת)")
+            col1, col2 = st.columns(2)
+            col1.metric("יחידות במשמרת", result.throughput, result.throughput - baseline.throughput)
+            col2.metric("יחידות ללא התקלה", baseline.throughput)
+            st.plotly_chart(line_state_chart(result, 'מצב התחנות במשמרת עם התקלה'), use_container_width=True)
+            if replication_target is not None:
+                replication_convergence_view(simulation_params, replication_target)
         
         # הצגת השפעות מפורטות לפי תהליכים
         st.markdown("#### השפעת התרחיש על תהליכים")
         
         process_impacts = pd.DataFrame({
-            'תהליך': ['קבלת חומרי גלם', 'עיבוד ראשוני', 'הרכבה', 'בקרת איכות', 'אריזה', 'לוגיסטיקה'],
+            'תהליך': PROCESSES,
             'השפעה (%)': impacts['process_impacts'],
             'זמן התאוששות (שעות)': impacts['recovery_times']
         })
+        error_bars = {}
+        if distribution is not None:
+            # חציון ההגרלות, עם פס שגיאה מ-P5 עד P95
+            low, median, high = distribution['process_impacts']
+            process_impacts['השפעה (%)'] = median.round(1)
+            process_impacts['P95'] = high - median
+            process_impacts['P5'] = median - low
+            error_bars = {'error_y': 'P95', 'error_y_minus': 'P5'}
         
         # ויזואליזציה של השפעות התרחיש
         fig = px.bar(process_impacts, x='תהליך', y='השפעה (%)', 
                     color='השפעה (%)',
                     color_continuous_scale=[(0, 'green'), (0.5, 'orange'), (1, 'red')],
-                    range_color=[0, 100])
+                    range_color=[0, 100], **error_bars)
         
         st.plotly_chart(fig, use_container_width=True)
         
+        # משטח רגישות - כל ערכי שני פרמטרים של התרחיש, ולא רק הנקודה שנבחרה
+        st.markdown("#### משטח רגישות")
+        sensitivity_surface(scenario_type, simulation_params)
+        
         # הצגת המלצות ופעולות מתקנות
         st.markdown("#### המלצות התאום הדיגיטלי")
         
@@ -842,100 +1138,236 @@ def create_extreme_scenario_simulator():
         st.markdown("#### מפת פגיעות המערכת")
         vulnerability_heatmap(impacts['vulnerabilities'])
 
+SWEEP_METRIC_LABELS = {"productivity": "תפוקה (%)", "downtime": "זמן השבתה (דקות)", "cost": "עלות ($)"}
+
+def scenario_source_caption(scenario_type, headline=False):
+    """מציין מאיפה מגיעים המספרים: סימולציית הקו (תקלת ציוד) או נוסחת ההשפעה של התרחיש"""
+    if scenario_type != "תקלת ציוד קריטי":
+        st.caption("הערכה לפי נוסחת ההשפעה של התרחיש - תרחיש זה אינו מורץ בסימולציית הקו")
+        return
+    calibrated = (f"ממוצע {SIMULATED_REPLICATIONS} משמרות מסומלצות לכל זמן תגובה "
+                  "(אינטרפולציה בין נקודות הכיול)")
+    if headline:
+        st.caption(f"סימולציית הקו: המדדים הם משמרת מסומלצת אחת; התפלגות ההשפעות ומשטח הרגישות - {calibrated}")
+    else:
+        st.caption(f"סימולציית הקו: כל ערכי הסריקה - {calibrated}")
+
+def scenario_heatmap(scenario_type, plane, x_axis, y_axis, params, metric="downtime"):
+    """מפת חום של מדד על פני כל ערכי שני פרמטרים, עם סימון התרחיש הנוכחי"""
+    labels = PARAMETER_LABELS[scenario_type]
+    metric_label = SWEEP_METRIC_LABELS[metric]
+    
+    fig = go.Figure(go.Heatmap(
+        z=plane,
+        x=SCENARIO_AXES[scenario_type][x_axis],
+        y=SCENARIO_AXES[scenario_type][y_axis],
+        colorscale=[(0, 'green'), (0.5, 'orange'), (1, 'red')],
+        # בתפוקה ערך גבוה הוא טוב - הסולם מתהפך
+        reversescale=metric == "productivity",
+        colorbar=dict(title=metric_label),
+        hovertemplate=f"{labels[x_axis]}: %{{x}}<br>{labels[y_axis]}: %{{y}}<br>{metric_label}: %{{z}}<extra></extra>"
+    ))
+    
+    # סימון התרחיש הנוכחי על המשטח
+    current = {name: len(params[name]) if name == "backup" else params[name] for name in (x_axis, y_axis)}
+    fig.add_trace(go.Scatter(
+        x=[current[x_axis]], y=[current[y_axis]],
+        mode='markers',
+        marker=dict(symbol='x', size=14, color='black'),
+        name='התרחיש הנוכחי'
+    ))
+    
+    fig.update_layout(
+        title=metric_label,
+        xaxis_title=labels[x_axis],
+        yaxis_title=labels[y_axis],
+        showlegend=False
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+def sensitivity_surface(scenario_type, params):
+    """מפת חום של זמן ההשבתה על פני כל ערכי שני פרמטרים - רשת שלמה בקריאה אחת לגרעין המערכים"""
+    x_axis, y_axis = SURFACE_AXES[scenario_type]
+    _, downtime, _ = evaluate_grid(scenario_type, params, (y_axis, x_axis))
+    scenario_heatmap(scenario_type, downtime, x_axis, y_axis, params)
+
+@st.cache_data(show_spinner="מחשב את כל צירופי הפרמטרים...")
+def get_scenario_sweep(scenario_type):
+    """טנזור הסריקה של תרחיש (כל צירופי הפרמטרים) - מחושב פעם אחת ונשמר במטמון"""
+    return parameter_sweep(scenario_type)
+
+def render_parameter_sweep(scenario_type, params):
+    """מצב סריקת רגישות: מדדים, תרשים טורנדו ומפת חום - כולם חיפושים בטנזור הסריקה השמור"""
+    sweep = get_scenario_sweep(scenario_type)
+    index = sweep_index(scenario_type, params)
+    axes = sweep["axes"]
+    labels = PARAMETER_LABELS[scenario_type]
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        productivity = int(sweep["productivity"][index])
+        st.metric("השפעה על תפוקה", f"{productivity}%", f"{productivity-100}%", delta_color="inverse")
+    
+    with col2:
+        st.metric("זמן השבתה צפוי", f"{int(sweep['downtime'][index])} דקות")
+    
+    with col3:
+        st.metric("עלות כלכלית מוערכת", f"${int(sweep['cost'][index]):,}")
+    scenario_source_caption(scenario_type)
+    
+    metric = st.radio("מדד", list(SWEEP_METRIC_LABELS), format_func=SWEEP_METRIC_LABELS.get, index=1,
+                      horizontal=True, key="sweep_metric")
+    tensor = sweep[metric]
+    
+    # תרשים טורנדו: טווח המדד כשכל פרמטר משתנה לבדו, מהמשפיע ביותר (למעלה) לפחות משפיע
+    st.markdown("#### רגישות לכל פרמטר")
+    ranges = tornado_ranges(tensor, index)
+    order = np.argsort([high - low for low, high in ranges])
+    fig = go.Figure(go.Bar(
+        y=[labels[axes[i]] for i in order],
+        x=[ranges[i][1] - ranges[i][0] for i in order],
+        base=[ranges[i][0] for i in order],
+        orientation='h',
+        marker_color='#1f77b4',
+        hovertemplate="%{y}: %{base} עד %{x}<extra></extra>"
+    ))
+    fig.add_vline(x=float(tensor[index]), line_dash="dash", line_color="red",
+                  annotation_text="התרחיש הנוכחי")
+    fig.update_layout(xaxis_title=SWEEP_METRIC_LABELS[metric], height=300)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # מפת חום של חתך דו-ממדי בטנזור, שאר הפרמטרים קבועים בערכים שנבחרו
+    st.markdown("#### מפת חום")
+    default_x, default_y = SURFACE_AXES[scenario_type]
+    col1, col2 = st.columns(2)
+    with col1:
+        x_axis = st.selectbox("ציר x", axes, index=axes.index(default_x), format_func=labels.get, key="sweep_x_axis")
+    with col2:
+        y_axis = st.selectbox("ציר y", axes, index=axes.index(default_y), format_func=labels.get, key="sweep_y_axis")
+    if x_axis == y_axis:
+        st.warning("בחר שני פרמטרים שונים לצירי מפת החום")
+        return
+    plane = sweep_slice(tensor, index, axes.index(y_axis), axes.index(x_axis))
+    scenario_heatmap(scenario_type, plane, x_axis, y_axis, params, metric)
+
+# גרף התלויות של המפעל (CSR) - נבנה פעם אחת לתהליך
+@st.cache_resource
+def get_dependency_graph():
+    return plant_graph()
+
+@st.cache_data(show_spinner="מריץ התפשטות כשל בגרף התלויות...")
+def run_cascade(initial_point, cascade_depth, safety):
+    """הסתברות הכשל וזמן ההשבתה הצפוי לכל צומת, מאלפי ניסויי התפשטות מנקודת הכשל"""
+    graph = get_dependency_graph()
+    return simulate_cascade(graph, initial_point, max_depth=cascade_depth, probability_scale=SAFETY_FACTOR[safety])
+
+def cascade_propagation_view(params):
+    """תוצאות התפשטות הכשל בגרף: זמן השבתה מצטבר והצמתים שבסיכון הגבוה ביותר"""
+    st.markdown("#### התפשטות הכשל בגרף התלויות")
+    graph = get_dependency_graph()
+    cascade = run_cascade(params["initial_point"], params["cascade_depth"], params["safety"])
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("זמן תיקון מצטבר צפוי", f"{cascade.plant_downtime.mean():.0f} דקות")
+    with col2:
+        st.metric("זמן תיקון מצטבר (P95)", f"{np.percentile(cascade.plant_downtime, 95):.0f} דקות")
+    
+    # הצמתים שבסיכון - מלבד נקודת הכשל עצמה
+    order = np.argsort(-cascade.failure_probability)
+    order = order[(order != graph.index[params["initial_point"]]) & (cascade.failure_probability[order] > 0)][:12]
+    nodes = pd.DataFrame({
+        'רכיב': [graph.names[i] for i in order],
+        'הסתברות כשל (%)': (cascade.failure_probability[order] * 100).round(1),
+        'זמן השבתה צפוי (דקות)': cascade.expected_downtime[order].round(1)
+    })
+    fig = px.bar(nodes, x='רכיב', y='הסתברות כשל (%)', color='זמן השבתה צפוי (דקות)',
+                 color_continuous_scale=[(0, 'green'), (0.5, 'orange'), (1, 'red')],
+                 range_y=[0, 100])
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_data(show_spinner="מריץ סימולציית אירועים של קו הייצור...")
+def run_line_simulation(equipment, failure_type, response_time, seed=0):
+    return simulate_equipment_failure(equipment, failure_type, response_time, seed=seed)
+
+@st.cache_data(show_spinner="מריץ חודש של קו הייצור...")
+def run_line_month(seed=0, cycle_minutes=CYCLE_MINUTES):
+    return simulate_line(30 * 24 * 60, seed, cycle_minutes=cycle_minutes)
+
+def simulated_cycle_change(month, station, factor):
+    """שינוי התפוקה החודשית כשזמן המחזור של תחנה מוכפל ב-factor - אותו זרע כמו חודש הבסיס"""
+    cycle_minutes = list(CYCLE_MINUTES)
+    cycle_minutes[STATIONS.index(station)] *= factor
+    return run_line_month(cycle_minutes=tuple(cycle_minutes)).throughput - month.throughput
+
+LINE_STATES = {"busy": ("עיבוד", "green"), "blocked": ("חסומה", "orange"),
+               "starved": ("ממתינה לחומר", "lightgray"), "down": ("מושבתת", "red")}
+
+def line_state_chart(result, title):
+    """פילוג הזמן של כל תחנה בקו בין עיבוד, חסימה, המתנה והשבתה (% מהאופק)"""
+    fig = go.Figure()
+    for state, (label, color) in LINE_STATES.items():
+        fig.add_trace(go.Bar(x=list(STATIONS), y=getattr(result, state) / result.horizon * 100,
+                             name=label, marker_color=color))
+    fig.update_layout(barmode='stack', title=title, yaxis_title='% מהזמן', height=350)
+    return fig
+
+def convergence_chart(history):
+    """ממוצע התפוקה ורווח הסמך שלו כפונקציה של מספר החזרות"""
+    n, mean, half_width = np.array(history).T
+    fig = go.Figure([
+        go.Scatter(x=np.r_[n, n[::-1]], y=np.r_[mean + half_width, (mean - half_width)[::-1]],
+                   fill='toself', fillcolor='rgba(0, 102, 204, 0.2)', line=dict(width=0),
+                   name='רווח סמך 95%', hoverinfo='skip'),
+        go.Scatter(x=n, y=mean, mode='lines+markers', name='ממוצע', line=dict(color='royalblue')),
+    ])
+    fig.update_layout(title='התכנסות התפוקה הממוצעת', xaxis_title='חזרות', yaxis_title='תפוקה (%)', height=350)
+    return fig
+
+def replication_convergence_view(params, target_half_width):
+    """מריץ חזרות של סימולציית הקו ומעדכן את רווח הסמך תוך כדי ריצה, עד שהוא צר מהיעד"""
+    st.markdown("#### חזרות מרובות")
+    progress = st.progress(0.0, text="מריץ חזרות...")
+    chart = st.empty()
+    history = []
+    for summary in run_replications(params["equipment"], params["failure_type"], params["response_time"],
+                                    target_half_width=target_half_width):
+        history.append((summary.n, summary.mean["productivity"], summary.half_width["productivity"]))
+        progress.progress(summary.n / DEFAULT_REPLICATIONS, text=f"{summary.n} חזרות")
+        chart.plotly_chart(convergence_chart(history), use_container_width=True)
+    progress.progress(1.0, text=f"{summary.n} חזרות" + (" - הרווח הגיע ליעד" if summary.converged else ""))
+    
+    col1, col2 = st.columns(2)
+    col1.metric("תפוקה (ממוצע חזרות)",
+                f"{summary.mean['productivity']:.1f}% ± {summary.half_width['productivity']:.1f}")
+    col2.metric("זמן השבתה (ממוצע חזרות)",
+                f"{summary.mean['downtime']:.0f} ± {summary.half_width['downtime']:.0f} דקות")
+
+@st.cache_data(show_spinner="מריץ הגרלות מונטה קרלו...")
+def run_scenario_monte_carlo(scenario_type, params, n_draws, seed=0):
+    """אחוזוני ההשפעות של התרחיש - נשמרים במטמון לכל שילוב פרמטרים"""
+    return monte_carlo(scenario_type, params, n_draws, seed)
+
 def calculate_scenario_impacts(scenario_type, params):
     """מחשב את ההשפעות הצפויות של תרחיש הקיצון"""
     impacts = {}
     
-    # חישוב ערכי השפעה בסיסיים לפי סוג התרחיש
-    if scenario_type == "כשל חיישנים":
-        # חישוב פגיעה בתפוקה בהתאם לאחוז החיישנים הכושלים ורמת היתירות
-        redundancy_factor = {"נמוכה": 0.3, "בינונית": 0.6, "גבוהה": 0.9}
-        base_impact = params["sensor_failure"] / 100
-        
-        # יתירות מקטינה את ההשפעה
-        mitigated_impact = base_impact * (1 - redundancy_factor[params["redundancy"]])
-        
-        # השפעה גדולה יותר אם החיישנים הקריטיים נפגעים
-        if params["pattern"] == "חיישנים קריטיים":
-            pattern_multiplier = 1.8
-        elif params["pattern"] == "אזור ספציפי":
-            pattern_multiplier = 1.5
-        else:  # אקראי
-            pattern_multiplier = 1.0
-        
-        productivity_impact = 100 - int(mitigated_impact * pattern_multiplier * 100)
-        downtime = int(mitigated_impact * pattern_multiplier * 180)  # זמן השבתה בדקות
-        cost = int(downtime * 5000 / 60)  # עלות של 5000$ לשעת השבתה
-        
-    elif scenario_type == "הפסקת חשמל/מים":
-        # השפעה תלויה בסוג התשתית, משך ההפסקה ומערכות גיבוי
-        utility_impact = {"חשמל": 1.0, "מים": 0.8, "קיטור": 0.7, "אוויר דחוס": 0.6}
-        base_impact = utility_impact[params["utility"]] * params["duration"] / 120
-        
-        # כל מערכת גיבוי מקטינה את ההשפעה
-        backup_reduction = len(params["backup"]) * 0.2
-        
-        productivity_impact = 100 - int(min(0.95, base_impact - backup_reduction) * 100)
-        downtime = params["duration"] if backup_reduction < base_impact else int(params["duration"] * 0.2)
-        cost = int(downtime * 5000 / 60)
-        
-    elif scenario_type == "תקלת ציוד קריטי":
-        # השפעה תלויה בסוג הציוד, סוג התקלה וזמן התגובה
-        equipment_impact = {
-            "מכונה M1 (תחילת קו ייצור)": 0.9,
-            "מכונה M4 (אמצע קו ייצור)": 0.7,
-            "מכונה M7 (סוף קו ייצור)": 0.5,
-            "מערכת בקרה מרכזית": 0.8
-        }
-        
-        failure_impact = {
-            "כשל מלא": 1.0,
-            "ירידה בביצועים (50%)": 0.5,
-            "אי-יציבות": 0.7
-        }
-        
-        base_impact = equipment_impact[params["equipment"]] * failure_impact[params["failure_type"]]
-        response_factor = 1.0 + (params["response_time"] - 30) / 120
-        
-        productivity_impact = 100 - int(min(0.95, base_impact * response_factor) * 100)
-        downtime = int(base_impact * params["response_time"] * 1.5)
-        cost = int(downtime * 5000 / 60 + base_impact * 20000)  # עלות השבתה + עלות תיקון
-        
-    elif scenario_type == "שרשרת תגובה":
-        # השפעה תלויה בנקודת הכשל ההתחלתית, עומק השרשרת ומערכות בטיחות
-        initial_point_impact = {
-            "חיישן לחץ M2": 0.4,
-            "משאבה ראשית": 0.8,
-            "חיישן טמפרטורה M5": 0.5,
-            "ספק מתח 24V": 0.7
-        }
-        
-        safety_factor = {"מינימלית": 1.3, "סטנדרטית": 1.0, "מתקדמת": 0.6}
-        
-        base_impact = initial_point_impact[params["initial_point"]] * (1 + params["cascade_depth"] * 0.2)
-        mitigated_impact = base_impact * safety_factor[params["safety"]]
-        
-        productivity_impact = 100 - int(min(0.95, mitigated_impact) * 100)
-        downtime = int(mitigated_impact * params["cascade_depth"] * 60)
-        cost = int(downtime * 5000 / 60 + params["cascade_depth"] * 15000)  # עלות השבתה + נזק לציוד
-        
-    else:  # תנאי קיצון סביבתיים
-        # השפעה תלויה בסוג התנאי, עוצמה ומשך החשיפה
-        condition_impact = {
-            "טמפרטורה גבוהה": 0.6,
-            "לחות גבוהה": 0.5,
-            "קור קיצוני": 0.7,
-            "רעידת אדמה": 0.9
-        }
-        
-        intensity_factor = params["intensity"] / 100 * 1.5
-        duration_factor = params["duration"] / 24
-        
-        base_impact = condition_impact[params["condition"]] * intensity_factor * duration_factor
-        
-        productivity_impact = 100 - int(min(0.95, base_impact) * 100)
-        downtime = int(base_impact * 240)  # עד 4 שעות השבתה
-        cost = int(downtime * 5000 / 60 + base_impact * 50000)  # עלות השבתה + נזק תשתיתי
+    # חישוב ערכי השפעה בסיסיים לפי סוג התרחיש - אותו גרעין מערכים שמשמש לרשתות ולמונטה קרלו
+    productivity_impact, downtime, cost = (
+        int(value) for value in scenario_kernel(scenario_type, params, integer=True)
+    )
+    
+    line_simulation = None
+    if scenario_type == "תקלת ציוד קריטי":
+        # תפוקה והשבתה מסימולציית אירועים בדידים של הקו - המשמרת עם התקלה מול אותה משמרת בלעדיה
+        productivity, line_downtime, result, baseline = run_line_simulation(
+            params["equipment"], params["failure_type"], params["response_time"])
+        repair_cost = EQUIPMENT_IMPACT[params["equipment"]] * FAILURE_IMPACT[params["failure_type"]] * REPAIR_COST
+        productivity_impact, downtime = int(productivity), int(line_downtime)
+        cost = int(downtime * DOWNTIME_COST_PER_HOUR / 60 + repair_cost)
+        line_simulation = (result, baseline)
     
     # חישוב השפעות לפי תהליכים - ייחודי לכל תרחיש
     process_impacts, recovery_times = calculate_process_specific_impacts(scenario_type, params)
@@ -954,41 +1386,24 @@ def calculate_scenario_impacts(scenario_type, params):
         "process_impacts": process_impacts,
         "recovery_times": recovery_times,
         "recommendations": recommendations,
-        "vulnerabilities": vulnerabilities
+        "vulnerabilities": vulnerabilities,
+        "line_simulation": line_simulation
     }
     
     return impacts
 
 def calculate_process_specific_impacts(scenario_type, params):
     """מחשב את ההשפעות הספציפיות לכל תהליך והזמן להתאוששות"""
-    # התהליכים השונים במפעל
-    processes = ['קבלת חומרי גלם', 'עיבוד ראשוני', 'הרכבה', 'בקרת איכות', 'אריזה', 'לוגיסטיקה']
-    
-    # בסיס השפעה שונה לכל תרחיש
-    if scenario_type == "כשל חיישנים":
-        base_impacts = [20, 60, 50, 80, 30, 10]
-        base_recovery = [1, 4, 3, 6, 2, 1]
-    elif scenario_type == "הפסקת חשמל/מים":
-        base_impacts = [40, 90, 80, 60, 70, 50]
-        base_recovery = [2, 8, 6, 3, 4, 3]
-    elif scenario_type == "תקלת ציוד קריטי":
-        base_impacts = [30, 80, 90, 50, 40, 20]
-        base_recovery = [2, 6, 8, 4, 3, 1]
-    elif scenario_type == "שרשרת תגובה":
-        base_impacts = [50, 70, 80, 90, 60, 40]
-        base_recovery = [4, 6, 8, 10, 5, 3]
-    else:  # תנאי קיצון סביבתיים
-        base_impacts = [60, 50, 70, 40, 60, 30]
-        base_recovery = [6, 5, 7, 3, 6, 4]
-    
+    # בסיס ההשפעה של כל תרחיש מוגדר במנוע התרחישים (PROCESS_BASE_IMPACTS)
     # התאמת ההשפעות על פי הפרמטרים הספציפיים של התרחיש
     # זהו רק חישוב דמה - במערכת אמיתית זה יתבסס על מודל מורכב יותר
-    impact_modifier = random.uniform(0.8, 1.2)
-    recovery_modifier = random.uniform(0.9, 1.1)
+    impact_modifier = random.uniform(*IMPACT_MODIFIER_RANGE)
+    recovery_modifier = random.uniform(*RECOVERY_MODIFIER_RANGE)
     
     # חישוב השפעות סופיות
-    process_impacts = [min(100, int(impact * impact_modifier)) for impact in base_impacts]
-    recovery_times = [max(1, round(recovery * recovery_modifier, 1)) for recovery in base_recovery]
+    impacts, recovery = process_kernel(scenario_type, [impact_modifier], [recovery_modifier])
+    process_impacts = [int(impact) for impact in impacts[0]]
+    recovery_times = [max(1, round(float(time), 1)) for time in recovery[0]]
     
     return process_impacts, recovery_times
 
@@ -1078,32 +1493,17 @@ def generate_scenario_recommendations(scenario_type, params):
 
 def generate_vulnerability_matrix(scenario_type, params):
     """מייצר מטריצת פגיעות למערכות השונות"""
-    # המערכות העיקריות
-    systems = ['מערכת חשמל', 'הידראוליקה', 'בקרת איכות', 'ניטור', 'לוגיסטיקה', 'תקשורת']
-    
-    # יצירת מטריצת פגיעויות - לכל מערכת מוגדרת רמת פגיעות בין 0-100
+    # יצירת מטריצת פגיעויות - לכל מערכת (SYSTEMS) מוגדרת רמת פגיעות בין 0-100
     vulnerabilities = {
-        'מערכת': systems,
+        'מערכת': list(SYSTEMS),
         'פגיעות': []
     }
     
-    # חישוב רמת פגיעות ספציפית לתרחיש (במערכת אמיתית תהיה תלויה במודל מורכב)
-    if scenario_type == "כשל חיישנים":
-        base_vulnerabilities = [30, 40, 90, 95, 20, 50]
-    elif scenario_type == "הפסקת חשמל/מים":
-        base_vulnerabilities = [95, 70, 60, 80, 50, 85]
-    elif scenario_type == "תקלת ציוד קריטי":
-        base_vulnerabilities = [60, 80, 70, 50, 40, 30]
-    elif scenario_type == "שרשרת תגובה":
-        base_vulnerabilities = [70, 60, 50, 75, 65, 80]
-    else:  # תנאי קיצון סביבתיים
-        base_vulnerabilities = [50, 60, 40, 65, 55, 75]
-    
-    # התאמה לפרמטרים ספציפיים של התרחיש
-    vulnerability_modifier = random.uniform(0.9, 1.1)
+    # התאמה לפרמטרים ספציפיים של התרחיש (במערכת אמיתית תהיה תלויה במודל מורכב)
+    vulnerability_modifier = random.uniform(*VULNERABILITY_MODIFIER_RANGE)
     
     # חישוב פגיעות סופית
-    vulnerabilities['פגיעות'] = [min(100, int(vuln * vulnerability_modifier)) for vuln in base_vulnerabilities]
+    vulnerabilities['פגיעות'] = [int(vuln) for vuln in vulnerability_kernel(scenario_type, [vulnerability_modifier])[0]]
     
     return vulnerabilities
 
@@ -1174,19 +1574,45 @@ def create_asset_lifecycle_manager():
     </div>
     """, unsafe_allow_html=True)
     
-    # בחירת נכס לניתוח
-    asset_category = st.radio(
+    col1, col2 = st.columns([1, 2])
+    view = col1.radio("תצוגה", ["נכס בודד", "צי הנכסים"], horizontal=True, key="lifecycle_view")
+    horizon_months = col2.select_slider("אופק תחזית (חודשים)", options=list(range(12, 121, 12)),
+                                        value=FORECAST_MONTHS, key="lifecycle_horizon")
+    if view == "צי הנכסים":
+        render_fleet_view(horizon_months)
+        return
+    
+    # בחירת נכס לניתוח - בפתיחה הראשונה של היום המרשם מקדם את הגילים ומועדי ההחלפה
+    registry = get_asset_registry()
+    registry.refresh_if_stale()
+    col1, col2 = st.columns([2, 1])
+    asset_category = col1.radio(
         "קטגוריית נכסים",
-        ["מכונות ייצור", "ציוד בקרה ומדידה", "תשתיות", "רובוטים וכלי שינוע"],
+        CATEGORIES,
         horizontal=True
     )
-    
-    # הצגת נכסים לפי קטגוריה
-    assets = get_assets_by_category(asset_category)
-    selected_asset = st.selectbox("בחר נכס לניתוח", assets)
+    band = col2.selectbox("רמת סיכון", ["הכל", *RISK_BANDS], key="lifecycle_risk_band")
+    
+    # הנכסים הבאים להחלפה בקטגוריה - שאילתה על אינדקס המרשם
+    assets = dict(registry.select(asset_category, None if band == "הכל" else band))
+    if not assets:
+        st.info("אין נכסים ברמת הסיכון שנבחרה")
+        return
+    selected_id = st.selectbox("בחר נכס לניתוח", list(assets), format_func=assets.get)
+    selected_asset = assets[selected_id]
+    
+    # עדכון נתוני הנכס - המדדים נשמרים מחדש במרשם רק עבור הנכס הזה
+    with st.expander("עדכון נתוני הנכס"):
+        record = registry.asset(selected_id)
+        with st.form("asset_inputs"):
+            chronological_age = st.number_input("גיל כרונולוגי (שנים)", 0.0, 50.0,
+                                                float(record['chronological_age']), 0.5)
+            age_factor = st.number_input("מקדם תנאי שימוש", 0.5, 2.0, float(record['age_factor']), 0.05)
+            if st.form_submit_button("שמור וחשב מחדש"):
+                registry.update_inputs(selected_id, chronological_age=chronological_age, age_factor=age_factor)
     
     # קבלת נתונים עבור הנכס הנבחר
-    asset_data = get_asset_data(selected_asset, asset_category)
+    asset_data = get_asset_data(selected_id, horizon_months)
     
     # הצגת נתוני הנכס
     col1, col2 = st.columns(2)
@@ -1194,7 +1620,7 @@ def create_asset_lifecycle_manager():
     with col1:
         st.markdown(f"### {selected_asset}")
         st.markdown(f"""
-        **גיל כרונולוגי:** {asset_data['chronological_age']} שנים  
+        **גיל כרונולוגי:** {asset_data['chronological_age']:.1f} שנים  
         **גיל דיגיטלי:** {asset_data['digital_age']} שנים  
         **אורך חיים מתוכנן:** {asset_data['expected_lifetime']} שנים  
         **עלות רכישה:** ${asset_data['purchase_cost']:,}  
@@ -1202,30 +1628,9 @@ def create_asset_lifecycle_manager():
         **עלות תחזוקה שנתית:** ${asset_data['maintenance_cost']:,}  
         """)
         
-        # הצגת גרף התפלגות הגיל
-        fig = go.Figure()
-        
-        fig.add_trace(go.Indicator(
-            mode = "gauge+number",
-            value = asset_data['lifecycle_percent'],
-            title = {'text': "אחוז מחזור חיים שהושלם"},
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': get_lifecycle_color(asset_data['lifecycle_percent'])},
-                'steps': [
-                    {'range': [0, 50], 'color': "lightgreen"},
-                    {'range': [50, 80], 'color': "lightyellow"},
-                    {'range': [80, 100], 'color': "lightcoral"}
-                ],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': 90
-                }
-            }
-        ))
-        
-        st.plotly_chart(fig, use_container_width=True)
+        # הצגת גרף התפלגות הגיל - מסודר ל-JSON פעם אחת לכל ערך
+        render_figure("lifecycle_gauge", asset_data['lifecycle_percent'],
+                      lambda: lifecycle_gauge_json(asset_data['lifecycle_percent']))
     
     with col2:
         # הצגת גרף התדרדרות והדרדרות צפויה
@@ -1237,9 +1642,32 @@ def create_asset_lifecycle_manager():
             labels={"x": "תאריך", "y": "ביצועים (%)"}
         )
         
-        # הוספת תחזית עתידית
+        # הוספת תחזית עתידית ורצועת אי-הוודאות שלה
         future_dates = asset_data['performance_forecast']['dates']
         future_values = asset_data['performance_forecast']['values']
+        low_percentile, high_percentile = RUL_PERCENTILES[0], RUL_PERCENTILES[-1]
+        
+        fig.add_trace(
+            go.Scatter(
+                x=future_dates,
+                y=asset_data['performance_forecast']['high'],
+                mode='lines',
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo='skip'
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=future_dates,
+                y=asset_data['performance_forecast']['low'],
+                mode='lines',
+                line=dict(width=0),
+                fill='tonexty',
+                fillcolor='rgba(255, 0, 0, 0.15)',
+                name=f'רצועת תחזית P{low_percentile}-P{high_percentile}'
+            )
+        )
         
         fig.add_trace(
             go.Scatter(
@@ -1287,6 +1715,12 @@ def create_asset_lifecycle_manager():
         )
         
         st.plotly_chart(fig, use_container_width=True)
+        
+        rul_months = asset_data['rul']['months']
+        horizon_note = "+" if rul_months[-1] >= RUL_HORIZON_MONTHS else ""
+        st.caption(f"מודל התדרדרות: {asset_data['rul']['model']} | "
+                   f"חודשים עד סף ההחלפה: {rul_months[0]:.0f}-{rul_months[-1]:.0f}{horizon_note} "
+                   f"(חציון {rul_months[len(rul_months) // 2]:.0f}, P{low_percentile}-P{high_percentile})")
     
     # ניתוח כלכלי ונקודת החלפה אופטימלית
     st.markdown("### נקודת החלפה אופטימלית")
@@ -1368,132 +1802,137 @@ def create_asset_lifecycle_manager():
     
     st.plotly_chart(fig, use_container_width=True)
 
-def get_assets_by_category(category):
-    """מחזיר רשימת נכסים לפי קטגוריה"""
-    assets = {
-        "מכונות ייצור": [
-            "מכונת כרסום CNC מודל XJ-5000",
-            "מכונת הזרקת פלסטיק KY-200",
-            "רובוט ריתוך אוטומטי WB-400",
-            "מערך הרכבה אוטומטי A-Series",
-            "מכבש הידראולי H-900"
-        ],
-        "ציוד בקרה ומדידה": [
-            "מערכת בקרת איכות אופטית QC-Vision",
-            "סורק תלת-ממד Measure-3D",
-            "מערכת לייזר למדידת דיוק L-500",
-            "מערכת בקרת תהליך מרכזית CPC-2000",
-            "מערך חיישנים היקפי SmartSense"
-        ],
-        "תשתיות": [
-            "מערכת אספקת חשמל ראשית PS-1000",
-            "מערכת קירור מרכזית CL-2000",
-            "מערך מדחסי אוויר AC-Series",
-            "מערכת טיפול בשפכים WT-500",
-            "מערכת גיבוי UPS מרכזית"
-        ],
-        "רובוטים וכלי שינוע": [
-            "רובוט הרכבה מדויק Assembly-Bot-5",
-            "מלגזה אוטונומית AGV-300",
-            "זרוע רובוטית Multi-Axis-7",
-            "מערכת הזנה אוטומטית Feed-100",
-            "רובוט פריקה וטעינה LogiBot-X"
-        ]
-    }
-    
-    return assets.get(category, [])
+FLEET_COLUMNS = {
+    "name": "נכס", "category": "קטגוריה", "operational_risk": "סיכון תפעולי (%)",
+    "optimal_months": "החלפה בעוד (חודשים)", "lifecycle_percent": "מחזור חיים (%)",
+    "digital_age": "גיל דיגיטלי", "replacement_cost": "עלות החלפה ($)", "expected_savings": "חיסכון צפוי ($)",
+}
 
-def get_asset_data(asset_name, category):
-    """מחזיר נתונים מלאים על נכס ספציפי"""
-    # הגדרות בסיס לפי קטגוריה
-    base_data = {
-        "מכונות ייצור": {
-            "base_lifetime": 15,
-            "base_cost": 250000,
-            "maintenance_factor": 0.08
-        },
-        "ציוד בקרה ומדידה": {
-            "base_lifetime": 8,
-            "base_cost": 120000,
-            "maintenance_factor": 0.1
-        },
-        "תשתיות": {
-            "base_lifetime": 20,
-            "base_cost": 500000,
-            "maintenance_factor": 0.05
-        },
-        "רובוטים וכלי שינוע": {
-            "base_lifetime": 10,
-            "base_cost": 180000,
-            "maintenance_factor": 0.12
-        }
-    }[category]
-    
-    # ערכים אקראיים לסימולציה (במערכת אמיתית יהיו נתונים אמיתיים לכל נכס)
-    chronological_age = round(random.uniform(3, base_data["base_lifetime"] * 0.8), 1)
+# מרשם הנכסים - משותף לכל ההרצות; נוצר מהצי הסינתטי בהרצה הראשונה
+@st.cache_resource(show_spinner="מאתחל את מרשם הנכסים ומתאים את מודלי ה-RUL...")
+def get_asset_registry():
+    return AssetRegistry()
+
+def render_fleet_view(horizon_months=FORECAST_MONTHS):
+    """דירוג כל נכסי הצי לפי סיכון תפעולי ומועד החלפה - חישוב מחדש של כל הצי בכל הרצה"""
+    registry = get_asset_registry()
+    registry.refresh_if_stale()
+    fleet = registry.fleet()
+    start = time.perf_counter()
+    lifecycle = rank_fleet(fleet_lifecycle(fleet, horizon_months, fleet["rul_months"]))
+    elapsed = time.perf_counter() - start
+    
+    categories = st.multiselect("קטגוריות", CATEGORIES, default=CATEGORIES, key="fleet_categories")
+    lifecycle = lifecycle[lifecycle["category"].isin(categories)]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("נכסים", f"{len(lifecycle):,}")
+    col2.metric("בסיכון גבוה", f"{(lifecycle['risk_band'] == 'גבוה').sum():,}")
+    col3.metric("להחלפה בחצי השנה הקרובה", f"{(lifecycle['optimal_months'] <= 6).sum():,}")
+    col4.metric("זמן חישוב הצי", f"{elapsed * 1000:.0f} ms")
+    
+    fig = px.scatter(lifecycle, x="optimal_months", y="operational_risk", color="risk_band",
+                     color_discrete_map={"נמוך": "green", "בינוני": "orange", "גבוה": "red"},
+                     hover_name="name", render_mode="webgl", opacity=0.5,
+                     labels={"optimal_months": "החלפה אופטימלית בעוד (חודשים)",
+                             "operational_risk": "סיכון תפעולי (%)", "risk_band": "סיכון"})
+    fig.update_layout(title='סיכון תפעולי מול מועד החלפה - כל הצי', height=450)
+    st.plotly_chart(fig, use_container_width=True)
     
-    # הגיל הדיגיטלי תלוי בתנאי שימוש, תחזוקה וגורמים נוספים
-    digital_age_factor = random.uniform(0.8, 1.4)
-    digital_age = round(chronological_age * digital_age_factor, 1)
+    st.markdown("#### נכסים בעדיפות עליונה")
+    st.dataframe(lifecycle[list(FLEET_COLUMNS)].head(200).rename(columns=FLEET_COLUMNS),
+                 use_container_width=True, hide_index=True)
     
-    # פרמטרים נוספים
-    expected_lifetime = base_data["base_lifetime"]
-    purchase_cost = int(base_data["base_cost"] * random.uniform(0.9, 1.1))
-    replacement_cost = int(purchase_cost * random.uniform(1.1, 1.3))  # עלות החלפה גבוהה מהעלות המקורית
-    maintenance_cost = int(purchase_cost * base_data["maintenance_factor"] * (1 + digital_age / expected_lifetime))
+    if st.checkbox("תכנון תיק החלפות רב-שנתי", key="fleet_portfolio"):
+        # התכנון על הקטגוריות שנבחרו - התקציב הוא אחוז משווי ההחלפה שלהן
+        portfolio_plan_view(fleet.loc[lifecycle.index], lifecycle)
+
+def portfolio_plan_view(fleet, lifecycle):
+    """תכנית החלפות לכל הצי תחת תקציב שנתי וקיבולת צוותים - שנה לכל נכס, עם חסם תחתון לעלות"""
+    if lifecycle.empty:
+        st.info("לא נבחרו נכסים לתכנון - בחר לפחות קטגוריה אחת")
+        return
+    col1, col2 = st.columns(2)
+    budget_percent = col1.slider("תקציב שנתי (% משווי ההחלפה של הצי)", 2, 20, int(BUDGET_SHARE * 100))
+    crews = col2.slider("צוותי התקנה", 10, 200, DEFAULT_CREWS, 10)
+    
+    start = time.perf_counter()
+    annual_budget = budget_percent / 100 * lifecycle["replacement_cost"].sum()
+    plan = plan_replacements(fleet, lifecycle, annual_budget=annual_budget, crews=crews)
+    elapsed = time.perf_counter() - start
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("עלות התכנית (ערך נוכחי)", f"${plan.total_cost / 1e9:,.2f}B")
+    col2.metric("פער מהחסם התחתון", f"{plan.gap:.2%}")
+    col3.metric(f"מוחלפים ב-{PLANNING_YEARS} שנים", f"{(plan.year < PLANNING_YEARS).sum():,}")
+    col4.metric("זמן תכנון", f"{elapsed:.1f} s")
+    
+    years = [f"שנה {t + 1}" for t in range(PLANNING_YEARS)]
+    fig = go.Figure([
+        go.Bar(x=years, y=plan.capex / 1e6, name='הוצאה הונית ($M)', marker_color='royalblue'),
+        go.Scatter(x=years, y=np.full(PLANNING_YEARS, annual_budget / 1e6), name='תקציב', mode='lines',
+                   line=dict(color='red', dash='dash')),
+    ])
+    fig.update_layout(title='הוצאה הונית לפי שנה מול התקציב', yaxis_title='$M', height=350)
+    st.plotly_chart(fig, use_container_width=True)
     
-    # אחוז מחזור החיים שכבר הושלם
-    lifecycle_percent = round((digital_age / expected_lifetime) * 100, 1)
+    first_year = lifecycle[plan.year == 0]
+    st.markdown(f"#### החלפות בשנה הראשונה ({len(first_year):,})")
+    st.dataframe(rank_fleet(first_year)[["name", "category", "operational_risk", "replacement_cost"]]
+                 .head(200).rename(columns=FLEET_COLUMNS), use_container_width=True, hide_index=True)
+
+@st.cache_data(max_entries=256)
+def rul_forecast_band(values, age_months, horizon_months, seed):
+    """התחזית ורצועת ה-bootstrap לגרף של נכס - מחושבת פעם אחת לכל היסטוריה ואופק"""
+    rul = estimate_rul(values, age_months, horizon_months, seed=seed)
+    return rul.forecast[0], rul.band[0, 0], rul.band[-1, 0]
+
+def get_asset_data(asset_id, horizon_months=FORECAST_MONTHS):
+    """מחזיר נתונים מלאים על נכס מהמרשם - אותו נכס מחזיר תמיד אותם נתונים"""
+    registry = get_asset_registry()
+    record = registry.asset(asset_id)
     
-    # היסטוריית ביצועים
-    today = datetime.now()
-    dates = [(today - timedelta(days=30*i)).strftime('%Y-%m-%d') for i in range(24, -1, -1)]
+    # הגדרות בסיס לפי קטגוריה
+    base_data = CATEGORY_PARAMS[record['category']]
     
-    # נקודת ביצועים התחלתית - 100%, יורדת עם הזמן
-    start_performance = 100
-    end_performance = max(50, 100 - (digital_age / expected_lifetime) * 70)
+    # נתוני הנכס והמדדים שנשמרו איתם במרשם
+    chronological_age = record['chronological_age']
+    digital_age = record['digital_age']
+    expected_lifetime = base_data["base_lifetime"]
+    purchase_cost = record['purchase_cost']
+    replacement_cost = record['replacement_cost']
+    maintenance_cost = record['maintenance_cost']
+    lifecycle_percent = record['lifecycle_percent']
     
-    # יצירת היסטוריית ביצועים עם תנודתיות מעט אקראית
-    values = []
-    for i in range(25):
-        base_performance = start_performance - (start_performance - end_performance) * (i / 24)
-        values.append(min(100, max(1, base_performance + random.uniform(-5, 5))))
+    # היסטוריית ביצועים חודשית - ירידה מ-100% עם תנודתיות מעט אקראית
+    today = pd.Timestamp.now().normalize()
+    month = pd.Timedelta(days=DAYS_PER_MONTH)
+    values = history_curves(digital_age, expected_lifetime, record['history_noise'])
     
     performance_history = {
-        'dates': dates,
+        'dates': today - np.arange(HISTORY_MONTHS, -1, -1) * month,
         'values': values
     }
     
-    # תחזית ביצועים עתידית
-    future_dates = [(today + timedelta(days=30*i)).strftime('%Y-%m-%d') for i in range(1, 25)]
-    
-    # חישוב תחזית התדרדרות
-    forecast_values = []
-    last_value = values[-1]
-    degradation_rate = (expected_lifetime - digital_age) / expected_lifetime
-    degradation_rate = max(0.1, degradation_rate) * random.uniform(0.8, 1.2)
-    
-    for i in range(24):
-        degradation = (i+1) * (10 / (degradation_rate * 100))
-        forecast_values.append(max(5, last_value - degradation))
+    # תחזית ביצועים עתידית לכל האופק - המודל שהתאים להיסטוריה, ורצועת bootstrap סביבו
+    forecast, low, high = rul_forecast_band(values, digital_age * 12, horizon_months, int(asset_id))
     
     performance_forecast = {
-        'dates': future_dates,
-        'values': forecast_values
+        'dates': today + np.arange(1, horizon_months + 1) * month,
+        'values': forecast,
+        'low': low,
+        'high': high
     }
     
+    # הערכת ה-RUL השמורה במרשם - ממנה חושבו גם מועד ההחלפה והסדר בבורר
+    rul = registry.rul(asset_id)
+    
     # ספי תחזוקה והחלפה
-    maintenance_threshold = 70
-    replacement_threshold = 40
+    maintenance_threshold = MAINTENANCE_THRESHOLD
+    replacement_threshold = REPLACEMENT_THRESHOLD
     
     # פרמטרים משפיעים על הגיל הדיגיטלי
-    impact_factors = {
-        "תדירות שימוש": int(random.uniform(5, 30)),
-        "עומס עבודה": int(random.uniform(10, 40)),
-        "איכות תחזוקה": int(random.uniform(-30, 10)),
-        "תנאי סביבה": int(random.uniform(5, 25)),
-        "איכות חומרים": int(random.uniform(-20, 5))
-    }
+    impact_factors = record['impact_factors']
     
     return {
         'chronological_age': chronological_age,
@@ -1507,42 +1946,36 @@ def get_asset_data(asset_name, category):
         'performance_forecast': performance_forecast,
         'maintenance_threshold': maintenance_threshold,
         'replacement_threshold': replacement_threshold,
-        'impact_factors': impact_factors
+        'impact_factors': impact_factors,
+        'rul': {'model': MODEL_LABELS[rul['model']],
+                'months': np.array([rul[f'rul_p{p}'] for p in RUL_PERCENTILES])}
     }
 
 def calculate_optimal_replacement(asset_data):
     """מחשב את נקודת ההחלפה האופטימלית ועלויות שונות"""
     # חישוב מספר החודשים עד נקודת התדרדרות אופטימלית
-    forecast_values = asset_data['performance_forecast']['values']
-    replacement_threshold = asset_data['replacement_threshold']
+    forecast_values = np.asarray(asset_data['performance_forecast']['values'])
+    horizon_months = len(forecast_values)
     
-    # מציאת החודש בו הביצועים יורדים מתחת לסף החלפה
-    months_to_threshold = 24  # ברירת מחדל - אם לא יורד מתחת לסף
-    for i, value in enumerate(forecast_values):
-        if value < replacement_threshold:
-            months_to_threshold = i + 1
-            break
+    # החודש שבו הביצועים יורדים מתחת לסף החלפה (אורך האופק - אם לא יורדים בו), לפי
+    # אחוזון ה-RUL התחתון מהמרשם - ההחלפה מתוכננת לפני החציה גם בתרחיש הפסימי, וכמו במרשם
+    threshold_months = int(rul_threshold_months(asset_data['rul']['months'][0], horizon_months))
     
     # חישוב נקודה אופטימלית שלוקחת בחשבון שיקולים כלכליים
     # במערכת אמיתית זה יהיה חישוב מורכב יותר
-    optimal_months = max(1, min(months_to_threshold - 2, int(months_to_threshold * 0.7)))
+    optimal_months = int(optimal_replacement_months(threshold_months))
     
     # חישוב חיסכון צפוי
     immediate_replacement_cost = asset_data['replacement_cost']
     
     # עלות תחזוקה מצטברת עד ההחלפה
-    cumulative_maintenance = sum([
-        asset_data['maintenance_cost'] * (1 + i * 0.05) 
-        for i in range(optimal_months)
-    ])
+    maintenance_total = float(cumulative_maintenance(asset_data['maintenance_cost'], optimal_months, horizon_months))
     
-    # עלות החלפה בנקודה אופטימלית (מועברת לערך נוכחי)
-    future_replacement_cost = asset_data['replacement_cost'] * (1 + optimal_months * 0.01)
-    npv_factor = 1 / (1 + 0.08) ** (optimal_months / 12)  # שיעור היוון שנתי של 8%
-    npv_replacement = future_replacement_cost * npv_factor
+    # עלות החלפה בנקודה אופטימלית (מועברת לערך נוכחי, שיעור היוון שנתי של 8%)
+    npv_replacement = float(replacement_npv(asset_data['replacement_cost'], optimal_months))
     
     # סך עלות בהחלפה אופטימלית
-    optimal_total_cost = cumulative_maintenance + npv_replacement
+    optimal_total_cost = maintenance_total + npv_replacement
     
     # חיסכון צפוי
     expected_savings = immediate_replacement_cost - optimal_total_cost
@@ -1559,7 +1992,7 @@ def calculate_optimal_replacement(asset_data):
     cost_benefit_data = {
         'immediate': immediate_replacement_cost,
         'optimal': optimal_total_cost,
-        'maintenance_only': asset_data['maintenance_cost'] * 24 * 1.5  # תחזוקה לשנתיים עם פקטור התדרדרות
+        'maintenance_only': asset_data['maintenance_cost'] * horizon_months * 1.5  # תחזוקה לאורך האופק עם פקטור התדרדרות
     }
     
     # המלצה ופעולות מותאמות
@@ -1596,6 +2029,33 @@ def calculate_optimal_replacement(asset_data):
         'actions': actions
     }
 
+@st.cache_data
+def lifecycle_gauge_json(lifecycle_percent):
+    """מד אחוז מחזור החיים של נכס - נבנה ומסודר פעם אחת לכל ערך"""
+    fig = go.Figure()
+    
+    fig.add_trace(go.Indicator(
+        mode = "gauge+number",
+        value = lifecycle_percent,
+        title = {'text': "אחוז מחזור חיים שהושלם"},
+        gauge = {
+            'axis': {'range': [None, 100]},
+            'bar': {'color': get_lifecycle_color(lifecycle_percent)},
+            'steps': [
+                {'range': [0, 50], 'color': "lightgreen"},
+                {'range': [50, 80], 'color': "lightyellow"},
+                {'range': [80, 100], 'color': "lightcoral"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+    
+    return figure_json(fig)
+
 def get_lifecycle_color(percent):
     """מחזיר צבע המתאים לשלב מחזור החיים"""
     if percent < 50:
@@ -1608,7 +2068,22 @@ def get_lifecycle_color(percent):
 # תצוגת תוכן ראשי
 with col_main:
     if mode == "מודל המפעל והתאום":
-        st.plotly_chart(create_factory_model(), use_container_width=True)
+        col1, col2, col3 = st.columns([2, 2, 1])
+        
+        with col1:
+            plant_scale = st.select_slider("היקף המפעל", options=list(PLANT_SCALES.keys()))
+        
+        with col2:
+            # אזור לפירוט מלא - שאר המפעל מוצג כאשכולות לפי תקציב הסמנים
+            zone_names = get_plant_layout(plant_scale).zone_names
+            focus_choice = st.selectbox("אזור לפירוט מלא", ["כל המפעל"] + zone_names)
+            focus_zone = None if focus_choice == "כל המפעל" else zone_names.index(focus_choice)
+        
+        with col3:
+            # איחוד כל המכונות לעקבה אחת - מופעל אוטומטית בפריסות גדולות
+            batched_mesh = st.checkbox("רשת מאוחדת לכל המכונות", value=False)
+        
+        render_factory_model(plant_scale, True if batched_mesh else None, focus_zone)
         
         # הוספת תיאור למצב זה
         st.markdown("""
@@ -1620,8 +2095,25 @@ with col_main:
         </div>
         """, unsafe_allow_html=True)
         
+        # ניקוי מפורש של מטמון הגיאומטריה (הבנייה מחדש מתבצעת בהרצה הבאה)
+        st.button("טעינה מחדש של מודל המפעל", on_click=invalidate_factory_model)
+        
     elif mode == "זרימת נתונים בזמן אמת":
-        st.plotly_chart(create_data_flow(), use_container_width=True)
+        live_ingestion = st.checkbox(
+            "קליטה משרת החיישנים המקומי",
+            key="live_ingestion",
+            help="במקום נתונים מדומים, הגרף מציג את מה ששרת הקליטה (TCP/UDP) מקבל מהחיישנים"
+        )
+        if live_ingestion:
+            server = get_ingestion_server()
+            if server.error:
+                st.warning(f"הפעלת שרת הקליטה נכשלה: {server.error}")
+            else:
+                st.caption(f"מאזין ב-{DEFAULT_HOST} (TCP {DEFAULT_TCP_PORT}, UDP {DEFAULT_UDP_PORT}) - "
+                           f"התקבלו {server.stats.points:,} נקודות ב-{server.stats.frames:,} מסגרות. "
+                           "להזנת נתונים מדומים: python ingestion.py publish")
+        
+        render_live_data_flow()
         
         # הצגה של סטטיסטיקות נתונים בזמן אמת
         st.markdown("""
@@ -1632,6 +2124,10 @@ with col_main:
         </div>
         """, unsafe_allow_html=True)
         
+        engine = get_anomaly_engine()
+        st.caption(f"גלאי האנומליות הרציפים זיהו {sum(len(engine.recent(sensor)) for sensor in SENSOR_NAMES)} "
+                   "אירועים בדגימות האחרונות")
+        
         # הצגת סטטיסטיקות נוכחיות
         col1, col2, col3, col4 = st.columns(4)
         
@@ -1659,28 +2155,23 @@ with col_main:
         </div>
         """, unsafe_allow_html=True)
         
-        # מידע על אנומליות שזוהו
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("""
-            ### אנומליה #1
-            **חיישן**: טמפרטורה (M3-12)  
-            **תבנית שזוהתה**: עלייה הדרגתית  
-            **תקלה צפויה**: תקלת מנוע חשמלי  
-            **זמן התרחשות משוער**: 72 שעות  
-            **ודאות חיזוי**: 87%  
-            """)
-        
-        with col2:
-            st.markdown("""
-            ### אנומליה #2
-            **חיישן**: רעידות (M2-05)  
-            **תבנית שזוהתה**: תנודות בתדר גבוה  
-            **תקלה צפויה**: בלאי מיסב  
-            **זמן התרחשות משוער**: 120 שעות  
-            **ודאות חיזוי**: 93%  
-            """)
+        # מידע על אנומליות שזוהו - החיישנים עם האירועים החמורים ביותר שהפיקו הגלאים
+        summaries = summarize_events(st.session_state.get('anomaly_events', []), top=2)
+        if not summaries:
+            st.info("לא זוהו אנומליות בחלון הזמן הנוכחי")
+        
+        for i, (col, summary) in enumerate(zip(st.columns(2), summaries)):
+            top = summary['top']
+            with col:
+                st.markdown(f"""
+                ### אנומליה #{i + 1}
+                **חיישן**: {top.sensor}  
+                **תבנית שזוהתה**: {DETECTOR_PATTERNS[top.detector]}  
+                **חומרה**: {'קריטית' if top.severity == 'critical' else 'אזהרה'}  
+                **זמן**: {pd.Timestamp(top.timestamp):%d/%m %H:%M}  
+                **ציון חריגה**: {abs(top.score):.1f}σ  
+                **אירועים בחלון**: {summary['count']} ({summary['critical']} קריטיים)  
+                """)
         
     elif mode == "אופטימיזציה אוטומטית":
         st.plotly_chart(create_data_flow(), use_container_width=True)
@@ -1705,20 +2196,37 @@ with col_main:
             "תועלת צפויה": ["הגדלת תפוקה", "הארכת חיי רכיב", "שיפור איכות", "הגדלת תפוקה", "חיסכון אנרגטי"]
         }
         
+        # פעולות שמשנות את זמן המחזור נבדקות בחודש מסומלץ של הקו; לשאר אין ייצוג בסימולציה
+        month = run_line_month()
+        cycle_factors = [1 / 1.05, None, None, (60 - 12) / 60, None]  # M1: מחזור של דקה, פחות 12 שניות
+        optimization_data["תפוקה חודשית (סימולציה)"] = [
+            f"{simulated_cycle_change(month, station, factor):+,} יחידות" if factor else "לא ממודל בסימולציה"
+            for station, factor in zip(optimization_data["מכונה"], cycle_factors)
+        ]
+        
         st.dataframe(pd.DataFrame(optimization_data))
         
+        # צוואר הבקבוק של הקו לפי חודש מסומלץ - התחנה שכמעט אינה ממתינה ואינה חסומה
+        st.markdown("### סימולציית קו הייצור - חודש")
+        bottleneck = STATIONS[int(np.argmax(month.busy))]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("יחידות בחודש", f"{month.throughput:,}")
+        col2.metric("צוואר בקבוק", bottleneck)
+        col3.metric("זמינות ממוצעת", f"{100 - month.down.mean() / month.horizon * 100:.1f}%")
+        st.plotly_chart(line_state_chart(month, 'מצב התחנות לאורך חודש'), use_container_width=True)
+        
     elif mode == "השוואת ביצועים":
-        comparison_fig, roi_fig, cost_fig = create_comparison_dashboard()
+        comparison_json, roi_json, cost_json = comparison_dashboard_json()
         
-        st.plotly_chart(comparison_fig, use_container_width=True)
+        render_figure("comparison_figure", "comparison", lambda: comparison_json)
         
         col1, col2 = st.columns(2)
         
         with col1:
-            st.plotly_chart(roi_fig, use_container_width=True)
+            render_figure("roi_figure", "roi", lambda: roi_json)
         
         with col2:
-            st.plotly_chart(cost_fig, use_container_width=True)
+            render_figure("cost_figure", "cost", lambda: cost_json)
         
         # סיכום השוואתי
         st.markdown("""
@@ -1752,106 +2260,92 @@ with col_main:
             create_asset_lifecycle_manager()
 
 # תצוגת יומן אירועים
-with col_events:
-    st.markdown('<div class="subheader">יומן אירועים והתראות</div>', unsafe_allow_html=True)
+EVENT_LOG_SIZE = 20
+STATUS_REFRESH_SECONDS = 5.0
+
+EVENT_TYPES = {
+    "מודל המפעל והתאום": [
+        "חיישן טמפרטורה M3-12 מדווח על עלייה הדרגתית",
+        "חיישן לחץ M7-5 חזר לתפקוד תקין",
+        "בוצע עדכון לתאום הדיגיטלי של מכונה 2",
+        "התקבלה התראה על סטייה קלה בחיישן רעידות",
+        "המלצת כיוונון אוטומטית יושמה במכונה 4"
+    ],
+    "זרימת נתונים בזמן אמת": [
+        "זוהתה תנודתיות חריגה בנתוני טמפרטורה",
+        "מבוצע ניתוח השוואתי של נתוני לחץ",
+        "התקבלה התראה על שינוי מגמה בצריכת אנרגיה",
+        "סף אזהרה נחצה בחיישן זרם חשמלי",
+        "המערכת מזהה דפוס חדש בנתוני המהירות"
+    ],
+    "זיהוי אנומליות": [
+        "אנומליה קריטית זוהתה במכונה 5 - תחזית לכשל בתוך 48 שעות",
+        "התראה: סימני שחיקה מוקדמים במסוע המרכזי",
+        "המערכת איתרה דפוס תקלה מוכר - מופעל פרוטוקול מניעה",
+        "אנומליה בנתוני חיישן מהירות - תיקון נדרש",
+        "מערכת ה-AI זיהתה חריגה משמעותית בנתוני החיישנים"
+    ],
+    "אופטימיזציה אוטומטית": [
+        "הושלמה אופטימיזציה של פרמטרי ייצור - שיפור יעילות ב-12%",
+        "בוצע כוונון אוטומטי למכונה 3 - צפוי חיסכון של 8% באנרגיה",
+        "מערכת AI ממליצה על שינוי סדר העבודה לחיסכון של 15% בזמן",
+        "התאמה אוטומטית של פרמטרי ייצור בעקבות שינוי תנאי סביבה",
+        "המלצה: הזזת תחזוקה מתוכננת ב-48 שעות לפי תחזית מערכת"
+    ],
+    "השוואת ביצועים": [
+        "דוח ROI מעודכן: החזר השקעה של 215% לאחר 24 חודשים",
+        "זמן השבתה שנמנע הודות לתאום דיגיטלי: 287 שעות השנה",
+        "השוואת ביצועים: 42% פחות תקלות לעומת התקופה המקבילה אשתקד",
+        "התאום הדיגיטלי זיהה 12 הזדמנויות לשיפור תהליכים שלא זוהו קודם",
+        "הושלם ניתוח עלות-תועלת: לתאום הדיגיטלי ROI של פי 3 מהצפוי"
+    ],
+    "סימולטור תרחישים": [
+        "הושלמה סימולציית כשל חיישנים - זוהו 3 נקודות תורפה",
+        "סימולציית הפסקת חשמל חשפה צורך בשדרוג מערכת גיבוי",
+        "המערכת מזהה סיכון גבוה לכשל בשרשרת בקו ייצור 2",
+        "חיזוי החלפת ציוד אופטימלית: מכונה M4 בעוד 8 חודשים",
+        "הסתיימה סימולציית תרחיש רעידת אדמה - השפעה צפויה: 65% ירידה בתפוקה"
+    ]
+}
+
+def event_log():
+    """יומן האירועים המשותף של הסשן - נוצר (עם האירועים ההתחלתיים) פעם אחת בלבד"""
+    if "event_log" not in st.session_state:
+        started = datetime.now().strftime("%H:%M:%S")
+        st.session_state.event_log = deque(
+            [f'<div class="sensor-normal">{started} - מערכת התאום הדיגיטלי מופעלת ומקבלת נתונים</div>'] * 5,
+            maxlen=EVENT_LOG_SIZE)
+    return st.session_state.event_log
+
+def add_log_event():
+    current_time = datetime.now().strftime('%H:%M:%S')
+    event = random.choice(EVENT_TYPES.get(mode, EVENT_TYPES["מודל המפעל והתאום"]))
+    status_class = "sensor-normal"
     
-    # יצירת תיבה לתצוגת הודעות
-    event_placeholder = st.empty()
-    
-    # יצירת מכולה להודעות עם גלילה
-    with event_placeholder.container():
-        event_log = st.empty()
-        with event_log:
-            st.markdown('<div class="event-log" id="event-log"></div>', unsafe_allow_html=True)
-    
-    # יצירת פונקציה לעדכון הודעות
-    event_log_contents = []
-    
-    # הוספת כמה אירועים התחלתיים
-    for _ in range(5):
-        event_log_contents.append(f'<div class="sensor-normal">{datetime.now().strftime("%H:%M:%S")} - מערכת התאום הדיגיטלי מופעלת ומקבלת נתונים</div>')
-    
-    # תצוגת האירועים
-    event_log.markdown(f'<div class="event-log">{"".join(event_log_contents)}</div>', unsafe_allow_html=True)
-    
-    # הוספת אירועים חדשים
-    def update_event_log():
-        current_time = datetime.now().strftime('%H:%M:%S')
-        event_types = {
-            "מודל המפעל והתאום": [
-                "חיישן טמפרטורה M3-12 מדווח על עלייה הדרגתית",
-                "חיישן לחץ M7-5 חזר לתפקוד תקין",
-                "בוצע עדכון לתאום הדיגיטלי של מכונה 2",
-                "התקבלה התראה על סטייה קלה בחיישן רעידות",
-                "המלצת כיוונון אוטומטית יושמה במכונה 4"
-            ],
-            "זרימת נתונים בזמן אמת": [
-                "זוהתה תנודתיות חריגה בנתוני טמפרטורה",
-                "מבוצע ניתוח השוואתי של נתוני לחץ",
-                "התקבלה התראה על שינוי מגמה בצריכת אנרגיה",
-                "סף אזהרה נחצה בחיישן זרם חשמלי",
-                "המערכת מזהה דפוס חדש בנתוני המהירות"
-            ],
-            "זיהוי אנומליות": [
-                "אנומליה קריטית זוהתה במכונה 5 - תחזית לכשל בתוך 48 שעות",
-                "התראה: סימני שחיקה מוקדמים במסוע המרכזי",
-                "המערכת איתרה דפוס תקלה מוכר - מופעל פרוטוקול מניעה",
-                "אנומליה בנתוני חיישן מהירות - תיקון נדרש",
-                "מערכת ה-AI זיהתה חריגה משמעותית בנתוני החיישנים"
-            ],
-            "אופטימיזציה אוטומטית": [
-                "הושלמה אופטימיזציה של פרמטרי ייצור - שיפור יעילות ב-12%",
-                "בוצע כוונון אוטומטי למכונה 3 - צפוי חיסכון של 8% באנרגיה",
-                "מערכת AI ממליצה על שינוי סדר העבודה לחיסכון של 15% בזמן",
-                "התאמה אוטומטית של פרמטרי ייצור בעקבות שינוי תנאי סביבה",
-                "המלצה: הזזת תחזוקה מתוכננת ב-48 שעות לפי תחזית מערכת"
-            ],
-            "השוואת ביצועים": [
-                "דוח ROI מעודכן: החזר השקעה של 215% לאחר 24 חודשים",
-                "זמן השבתה שנמנע הודות לתאום דיגיטלי: 287 שעות השנה",
-                "השוואת ביצועים: 42% פחות תקלות לעומת התקופה המקבילה אשתקד",
-                "התאום הדיגיטלי זיהה 12 הזדמנויות לשיפור תהליכים שלא זוהו קודם",
-                "הושלם ניתוח עלות-תועלת: לתאום הדיגיטלי ROI של פי 3 מהצפוי"
-            ],
-            "סימולטור תרחישים": [
-                "הושלמה סימולציית כשל חיישנים - זוהו 3 נקודות תורפה",
-                "סימולציית הפסקת חשמל חשפה צורך בשדרוג מערכת גיבוי",
-                "המערכת מזהה סיכון גבוה לכשל בשרשרת בקו ייצור 2",
-                "חיזוי החלפת ציוד אופטימלית: מכונה M4 בעוד 8 חודשים",
-                "הסתיימה סימולציית תרחיש רעידת אדמה - השפעה צפויה: 65% ירידה בתפוקה"
-            ]
-        }
-        
-        event = random.choice(event_types.get(mode, event_types["מודל המפעל והתאום"]))
-        status_class = "sensor-normal"
-        
-        # בדיקה אם מדובר באירוע קריטי
-        if "קריטי" in event or "כשל" in event or "סיכון גבוה" in event:
-            status_class = "sensor-critical"
-        elif "התראה" in event or "אזהרה" in event or "חשפה צורך" in event:
-            status_class = "sensor-warning"
-        
-        # הוספת האירוע ליומן
-        event_log_contents.append(f'<div class="{status_class}">{current_time} - {event}</div>')
-        
-        # שמירה רק על 20 האירועים האחרונים
-        if len(event_log_contents) > 20:
-            event_log_contents.pop(0)
-        
-        # עדכון תצוגת היומן
-        event_log.markdown(f'<div class="event-log">{"".join(event_log_contents)}</div>', unsafe_allow_html=True)
+    # בדיקה אם מדובר באירוע קריטי
+    if "קריטי" in event or "כשל" in event or "סיכון גבוה" in event:
+        status_class = "sensor-critical"
+    elif "התראה" in event or "אזהרה" in event or "חשפה צורך" in event:
+        status_class = "sensor-warning"
     
-    # הוספת אירועים באופן מחזורי
+    # הוספת האירוע ליומן (נשמרים רק EVENT_LOG_SIZE האירועים האחרונים)
+    event_log().append(f'<div class="{status_class}">{current_time} - {event}</div>')
+
+@st.fragment
+def event_log_panel():
+    """היומן וכפתור האירוע החדש - לחיצה מריצה מחדש רק את הפאנל הזה, לא את המודל או הגרפים"""
+    log_view = st.empty()
     if st.button("הוסף אירוע חדש"):
-        update_event_log()
-    
-    st.markdown("---")
-    
-    # תקציר מצב מערכת
-    st.markdown("### תקציר מצב")
+        add_log_event()
+    log_view.markdown(f'<div class="event-log">{"".join(event_log())}</div>', unsafe_allow_html=True)
+
+@st.fragment(run_every=STATUS_REFRESH_SECONDS)
+def status_summary():
+    """תקציר המצב נקרא מהיומן המשותף ומתרענן בקצב משלו - אירוע חדש מופיע בו ברענון הבא"""
+    events = "".join(event_log())
     
     # נתוני מצב המשתנים לפי המצב הנבחר
-    if mode in ["זיהוי אנומליות", "סימולטור תרחישים"] or "אנומליה" in "".join(event_log_contents) or "סיכון" in "".join(event_log_contents):
+    if mode in ["זיהוי אנומליות", "סימולטור תרחישים"] or "אנומליה" in events or "סיכון" in events:
         st.markdown('<div class="sensor-warning">⚠️ התראות פעילות: 3</div>', unsafe_allow_html=True)
         st.markdown('<div class="sensor-critical">🚨 אירועים קריטיים: 1</div>', unsafe_allow_html=True)
     else:
@@ -1859,6 +2353,17 @@ with col_events:
     
     st.markdown(f'💡 חיישנים פעילים: {25 if detail_level == "בינונית" else (40 if detail_level == "גבוהה" else 15)}')
     st.markdown(f'📊 זמן ניטור: {time_range}')
+
+with col_events:
+    st.markdown('<div class="subheader">יומן אירועים והתראות</div>', unsafe_allow_html=True)
+    
+    event_log_panel()
+    
+    st.markdown("---")
+    
+    # תקציר מצב מערכת
+    st.markdown("### תקציר מצב")
+    status_summary()
     
     # הסבר על פאנל הבקרה
     with st.expander("הסבר על אפשרויות הדמיה"):
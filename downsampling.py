@@ -0,0 +1,115 @@
+import numpy as np
+
+# רוחב הגרף המשוער בפיקסלים - קובע את מספר הנקודות היעד לכל סדרה
+CHART_WIDTH_PX = 1200
+
+
+def target_points(method, chart_width=CHART_WIDTH_PX):
+    """מספר הנקודות היעד לסדרה: נקודה לפיקסל ב-LTTB, שתיים (מינימום ומקסימום) ב-minmax"""
+    return chart_width * 2 if method == "minmax" else chart_width
+
+
+def _bucket_extremes(values, n_buckets):
+    """מחזיר לכל דלי (דלי לכל פיקסל) את אינדקסי המינימום והמקסימום ואת ערך המקסימום"""
+    n = len(values)
+    # ריפוד ב-NaN לכפולה של גודל הדלי, ואז חיפוש מינימום ומקסימום לאורך כל שורה
+    bucket_size = -(-n // n_buckets)
+    n_buckets = -(-n // bucket_size)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(n_buckets, bucket_size)
+    starts = np.arange(n_buckets) * bucket_size
+    lows = starts + np.nanargmin(padded, axis=1)
+    highs = starts + np.nanargmax(padded, axis=1)
+    return lows, highs, np.nanmax(padded, axis=1)
+
+
+def minmax_indices(values, n_buckets):
+    """מחזיר את אינדקסי המינימום והמקסימום בכל דלי, ואת נקודות הקצה"""
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    lows, highs, _ = _bucket_extremes(values, n_buckets)
+    return np.unique(np.concatenate([lows, highs, [0, n - 1]]))
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: בוחר n_out נקודות ששומרות על צורת הסדרה"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # הזזת ציר x לאפס שומרת על דיוק כשמדובר בחותמות זמן בננו-שניות
+    x = np.asarray(x, dtype=np.int64 if np.asarray(x).dtype.kind == 'M' else None)
+    x = (x - x[0]).astype(float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # ממוצע הדלי הבא בכל שלב - מחושב מראש לכל הדליים בעזרת סכומים מצטברים
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    next_start = np.append(edges[1:-1], n - 1)
+    next_end = np.append(edges[2:], n)
+    counts = next_end - next_start
+    avg_x = (cum_x[next_end] - cum_x[next_start]) / counts
+    avg_y = (cum_y[next_end] - cum_y[next_start]) / counts
+
+    a = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        bx = x[start:end]
+        by = y[start:end]
+        # שטח המשולש בין הנקודה שנבחרה, נקודת המועמד וממוצע הדלי הבא
+        area = np.abs((x[a] - avg_x[bucket]) * (by - y[a]) - (x[a] - bx) * (avg_y[bucket] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def threshold_bucket_indices(values, levels, n_buckets):
+    """מחזיר את המינימום והמקסימום של כל דלי שבו הסדרה מגיעה לאחד הספים
+
+    כך כל חריגה מעל סף נשמרת לפחות בנקודה אחת (המקסימום של הדלי), וכל חציית סף
+    בתוך דלי נשמרת כזוג נקודות משני צידי הסף - ברזולוציה של פיקסל.
+    """
+    if not len(levels) or len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    lows, highs, bucket_max = _bucket_extremes(values, n_buckets)
+    reached = bucket_max >= min(levels)
+    return np.unique(np.concatenate([lows[reached], highs[reached]]))
+
+
+def mask_bucket_indices(mask, n_buckets):
+    """מחזיר לכל דלי (דלי לכל פיקסל) את הנקודה המסומנת הראשונה בו - לכל היותר n_buckets נקודות
+
+    כך נקודות שסומנו (למשל ציוני z חריגים) נשמרות בהקטנה בלי שמספרן יגדל עם אורך הסדרה.
+    """
+    flagged = np.flatnonzero(mask)
+    if len(flagged) == 0:
+        return flagged
+    bucket_size = -(-len(mask) // n_buckets)
+    buckets = flagged // bucket_size
+    first = np.ones(len(flagged), dtype=bool)
+    first[1:] = buckets[1:] != buckets[:-1]
+    return flagged[first]
+
+
+def downsample(x, y, levels=(), method="lttb", chart_width=CHART_WIDTH_PX):
+    """מקטין סדרה למספר נקודות לפי רוחב הגרף, תוך שמירה על חציות הסף
+
+    מחזיר את האינדקסים שנבחרו (ממוינים); הסדרה המקורית אינה מועתקת.
+    התוצאה חסומה ב-target_points ועוד שתי נקודות לכל פיקסל, ללא תלות באורך הסדרה.
+    """
+    n = len(y)
+    if n <= target_points(method, chart_width):
+        return np.arange(n)
+
+    if method == "minmax":
+        # מינימום ומקסימום בכל פיקסל כבר שומרים כל חציית סף
+        return minmax_indices(y, chart_width)
+
+    selected = lttb_indices(x, y, target_points(method, chart_width))
+    return np.union1d(selected, threshold_bucket_indices(y, levels, chart_width))
@@ -0,0 +1,227 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# פריסת המכונות בתא ההדגמה: (שם, x, y, z)
+DEMO_LAYOUT = (
+    ('M1', 0, 0, 0),
+    ('M2', 10, 0, 0),
+    ('M3', 20, 0, 0),
+    ('M4', 30, 0, 0),
+    ('M5', 5, 10, 0),
+    ('M6', 15, 10, 0),
+    ('M7', 25, 10, 0),
+    ('M8', 35, 10, 0),
+)
+
+# מרווח בין קצה המודל הפיזי לתאום הדיגיטלי שלצידו
+DIGITAL_GAP = 15
+
+# היקפי מפעל לבחירה: (מספר מכונות, מספר חיישנים); None - תא ההדגמה
+PLANT_SCALES = {
+    "תא הדגמה": None,
+    "קו ייצור": (200, 4_000),
+    "מפעל מלא": (5_000, 100_000),
+}
+
+# פריסת מפעל שנוצרת: מרווחי מכונות וקווים, וגודל קווים ואזורים
+MACHINE_SPACING = 10
+LINE_SPACING = 10
+ZONE_MARGIN = 20
+MACHINES_PER_LINE = 20
+LINES_PER_ZONE = 5
+
+# מידות תיבת מכונה
+MACHINE_HALF_WIDTH = 2
+MACHINE_HEIGHT = 4
+
+# קודקודים ומשולשים של תיבה (8 קודקודים, 8 משולשים כמו במודל המקורי)
+BOX_DX = np.array([-1, 1, 1, -1, -1, 1, 1, -1])
+BOX_DY = np.array([-1, -1, 1, 1, -1, -1, 1, 1])
+BOX_DZ = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+BOX_I = np.array([0, 0, 0, 0, 4, 4, 4, 4])
+BOX_J = np.array([1, 2, 4, 3, 5, 6, 2, 1])
+BOX_K = np.array([2, 6, 6, 7, 6, 7, 3, 5])
+
+# מצבי חיישנים - רוב החיישנים תקינים, מעט באזהרה ומעט במצב קריטי
+SENSOR_STATUSES = ('תקין', 'אזהרה', 'קריטי')
+STATUS_PROBABILITIES = (0.7, 0.2, 0.1)
+STATUS_COLORS = {'תקין': 'green', 'אזהרה': 'orange', 'קריטי': 'red'}
+
+# מספר קווי החיבור המוצגים בין העולם הפיזי לדיגיטלי
+MAX_CONNECTION_LINES = 10
+
+
+@dataclass(eq=False)
+class PlantLayout:
+    """מודל פריסת מפעל מבוסס מערכים: מכונות, קווי ייצור, אזורים וחיישנים המוצמדים למכונות"""
+    machine_names: np.ndarray
+    machine_x: np.ndarray
+    machine_y: np.ndarray
+    machine_z: np.ndarray
+    machine_line: np.ndarray
+    line_names: list
+    line_zone: np.ndarray
+    zone_names: list
+    sensor_machine: np.ndarray
+    sensor_dx: np.ndarray
+    sensor_dy: np.ndarray
+    sensor_dz: np.ndarray
+
+    @property
+    def n_machines(self):
+        return len(self.machine_names)
+
+    @property
+    def n_sensors(self):
+        return len(self.sensor_machine)
+
+    @property
+    def machine_zone(self):
+        return self.line_zone[self.machine_line]
+
+    def sensor_positions(self, indices=None):
+        """מחזיר את מיקומי החיישנים (x, y, z) - מיקום המכונה ועוד ההיסט של החיישן"""
+        indices = slice(None) if indices is None else indices
+        machine = self.sensor_machine[indices]
+        return (self.machine_x[machine] + self.sensor_dx[indices],
+                self.machine_y[machine] + self.sensor_dy[indices],
+                self.machine_z[machine] + self.sensor_dz[indices])
+
+    def digital_offset(self):
+        """הזזת התאום הדיגיטלי בציר x - רוחב המפעל ועוד מרווח"""
+        return float(self.machine_x.max() - self.machine_x.min()) + DIGITAL_GAP
+
+
+def attach_sensors(n_machines, n_sensors, rng=None):
+    """מצמיד חיישנים למכונות (לפי הסדר, במחזוריות) עם היסט אקראי מכל מכונה"""
+    rng = np.random.default_rng() if rng is None else rng
+    sensor_machine = np.arange(n_sensors) % n_machines
+    return (sensor_machine,
+            rng.uniform(-2, 2, n_sensors),
+            rng.uniform(-2, 2, n_sensors),
+            rng.uniform(1, 3, n_sensors))
+
+
+def demo_plant_layout(n_sensors=40, rng=None):
+    """פריסת תא ההדגמה (M1-M8 בשני קווים) כמודל PlantLayout"""
+    names = np.array([machine[0] for machine in DEMO_LAYOUT])
+    coords = np.array([machine[1:] for machine in DEMO_LAYOUT], dtype=float)
+    machine_line = (coords[:, 1] // LINE_SPACING).astype(int)
+    return PlantLayout(
+        names, coords[:, 0], coords[:, 1], coords[:, 2], machine_line,
+        [f'קו {i + 1}' for i in range(machine_line.max() + 1)],
+        np.zeros(machine_line.max() + 1, dtype=int),
+        ['אזור 1'],
+        *attach_sensors(len(names), n_sensors, rng)
+    )
+
+
+def generate_plant_layout(n_machines, n_sensors, machines_per_line=MACHINES_PER_LINE,
+                          lines_per_zone=LINES_PER_ZONE, rng=None):
+    """מייצר פריסת מפעל מלאה: מכונות בקווים, קווים באזורים ואזורים ברשת"""
+    machine_idx = np.arange(n_machines)
+    machine_line = machine_idx // machines_per_line
+    position_in_line = machine_idx % machines_per_line
+    n_lines = machine_line[-1] + 1
+    line_zone = np.arange(n_lines) // lines_per_zone
+    n_zones = line_zone[-1] + 1
+
+    # האזורים מסודרים ברשת ריבועית; בתוך אזור הקווים מקבילים וכל קו שני מוסט כמו בתא ההדגמה
+    zones_per_row = int(np.ceil(np.sqrt(n_zones)))
+    zone_width = machines_per_line * MACHINE_SPACING + ZONE_MARGIN
+    zone_depth = lines_per_zone * LINE_SPACING + ZONE_MARGIN
+    zone = line_zone[machine_line]
+    line_in_zone = machine_line % lines_per_zone
+
+    machine_x = ((zone % zones_per_row) * zone_width + position_in_line * MACHINE_SPACING
+                 + (line_in_zone % 2) * MACHINE_SPACING / 2).astype(float)
+    machine_y = ((zone // zones_per_row) * zone_depth + line_in_zone * LINE_SPACING).astype(float)
+    machine_z = np.zeros(n_machines)
+
+    return PlantLayout(
+        np.char.add('M', (machine_idx + 1).astype(str)),
+        machine_x, machine_y, machine_z, machine_line,
+        [f'קו {i + 1}' for i in range(n_lines)],
+        line_zone,
+        [f'אזור {i + 1}' for i in range(n_zones)],
+        *attach_sensors(n_machines, n_sensors, rng)
+    )
+
+
+def build_plant_layout(scale, rng=None):
+    """בונה את פריסת המפעל עבור היקף מתוך PLANT_SCALES"""
+    size = PLANT_SCALES[scale]
+    if size is None:
+        return demo_plant_layout(rng=rng)
+    return generate_plant_layout(*size, rng=rng)
+
+
+def box_vertices(x, y, z):
+    """מחזיר את קודקודי התיבה של מכונה שמרכז בסיסה ב-(x, y, z)"""
+    return (x + BOX_DX * MACHINE_HALF_WIDTH,
+            y + BOX_DY * MACHINE_HALF_WIDTH,
+            z + BOX_DZ * MACHINE_HEIGHT)
+
+
+def factory_geometry(layout):
+    """מחשב את הגיאומטריה הסטטית של המודל: מכונות ומיקומי כל החיישנים"""
+    sensor_x, sensor_y, sensor_z = layout.sensor_positions()
+    return {
+        'layout': layout,
+        'machines': layout.machine_names,
+        'machine_x': layout.machine_x,
+        'machine_y': layout.machine_y,
+        'machine_z': layout.machine_z,
+        'sensor_machine': layout.sensor_machine,
+        'sensor_x': sensor_x,
+        'sensor_y': sensor_y,
+        'sensor_z': sensor_z,
+        'digital_offset': layout.digital_offset(),
+    }
+
+
+def sample_sensor_status(n_sensors, rng=None):
+    """מגריל קוד מצב (אינדקס ב-SENSOR_STATUSES) לכל חיישן"""
+    rng = np.random.default_rng() if rng is None else rng
+    return rng.choice(len(SENSOR_STATUSES), size=n_sensors, p=STATUS_PROBABILITIES)
+
+
+# מספר מכונות שממנו המודל עובר אוטומטית לרשת מאוחדת אחת
+BATCHED_MESH_MIN_MACHINES = 50
+
+
+def batched_box_mesh(x, y, z, half_x=MACHINE_HALF_WIDTH, half_y=MACHINE_HALF_WIDTH, height=MACHINE_HEIGHT):
+    """ממזג תיבות רבות לרשת אינדקסית אחת: קודקודים ומשולשים לכל התיבות יחד
+
+    מידות התיבה יכולות להיות קבועות או מערך עם ערך לכל תיבה.
+    """
+    n_boxes = len(x)
+    half_x = np.broadcast_to(half_x, (n_boxes,))[:, None]
+    half_y = np.broadcast_to(half_y, (n_boxes,))[:, None]
+    height = np.broadcast_to(height, (n_boxes,))[:, None]
+    vertex_x = (np.asarray(x)[:, None] + BOX_DX[None, :] * half_x).ravel()
+    vertex_y = (np.asarray(y)[:, None] + BOX_DY[None, :] * half_y).ravel()
+    vertex_z = (np.asarray(z)[:, None] + BOX_DZ[None, :] * height).ravel()
+
+    # הזזת אינדקסי המשולשים של כל תיבה לפי מיקום הקודקודים שלה במערך המאוחד
+    vertex_offset = (np.arange(n_boxes) * len(BOX_DX))[:, None]
+    i = (BOX_I[None, :] + vertex_offset).ravel()
+    j = (BOX_J[None, :] + vertex_offset).ravel()
+    k = (BOX_K[None, :] + vertex_offset).ravel()
+
+    # אינדקס התיבה של כל קודקוד - לצביעה ולתוויות ריחוף
+    vertex_box = np.repeat(np.arange(n_boxes), len(BOX_DX))
+    return vertex_x, vertex_y, vertex_z, i, j, k, vertex_box
+
+
+def polyline_segments(x0, y0, z0, x1, y1, z1):
+    """מחבר קטעים רבים לקו שבור אחד המופרד ב-None (עקבה אחת במקום עקבה לכל קטע)"""
+    n_segments = len(x0)
+    coords = []
+    for start, end in ((x0, x1), (y0, y1), (z0, z1)):
+        line = np.full(3 * n_segments, None, dtype=object)
+        line[0::3] = start
+        line[1::3] = end
+        coords.append(line)
+    return coords
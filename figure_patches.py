@@ -0,0 +1,154 @@
+"""עדכון גרפים בדפדפן בשינויים בלבד
+
+לכל תצוגה יש FigureStream שזוכר מה הדפדפן כבר מחזיק: מזהה הגרף המלא האחרון שנשלח,
+מספר רצף, ולכל עקבה - נקודות ה-x שנשלחו או המאפיינים האחרונים. כל עוד הדפדפן אישר
+את הגרף המלא, הרצה שולחת רק תיקונים: נקודות חדשות בסוף עקבה חיה (extendTraces,
+וקיצוץ הנקודות שיצאו מחלון הזמן) ועקבות שהמאפיינים שלהן השתנו (restyle), למשל
+חיישנים שעברו בין עקבות הסטטוס. גרף מלא נשלח מחדש רק כשמבנה הגרף השתנה, כשהדפדפן
+אינו מחזיק אותו (טעינה ראשונה) או כשהחמיץ תיקון ברצף.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+# הערך שהרכיב מדווח כשלא הצליח לטעון את plotly.js - התצוגה חוזרת אז ל-st.plotly_chart
+PLOTLY_UNAVAILABLE = "plotly-unavailable"
+PLOTLY_CDN_URL = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+
+
+def figure_json(figure):
+    """JSON של גרף בלי ולידציה - הסידור ש-st.plotly_chart מבצע בכל הרצה"""
+    return pio.to_json(figure, validate=False)
+
+
+def bundle_plotly_js(directory):
+    """כותב את plotly.js של החבילה המותקנת לתיקיית הרכיב ומחזיר את הכתובת היחסית אליו
+
+    כך הרכיב נטען בלי רשת (גם ברשת מפעל סגורה), כמו st.plotly_chart. אם התיקייה אינה
+    ניתנת לכתיבה - כתובת ה-CDN, והרכיב מדווח PLOTLY_UNAVAILABLE אם גם היא לא נטענת.
+    """
+    name = f"plotly-{get_plotlyjs_version()}.min.js"
+    target = Path(directory) / name
+    if not target.exists():
+        partial = target.with_name(f"{name}.{os.getpid()}.tmp")
+        try:
+            partial.write_text(get_plotlyjs(), encoding="utf-8")
+            os.replace(partial, target)
+        except OSError:
+            partial.unlink(missing_ok=True)
+            return PLOTLY_CDN_URL
+    return name
+
+
+def _plain(values):
+    """מערך לרשימה שניתנת ל-JSON: זמנים כמחרוזות ISO, וערכים חסרים כ-null"""
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return np.datetime_as_string(values.astype("datetime64[us]")).tolist()
+    if values.dtype.kind == "f" and not np.isfinite(values).all():
+        return [None if not np.isfinite(value) else value for value in values.tolist()]
+    return values.tolist()
+
+
+def _same(previous, current):
+    if isinstance(current, np.ndarray) or isinstance(previous, np.ndarray):
+        return (isinstance(previous, np.ndarray) and isinstance(current, np.ndarray)
+                and previous.shape == current.shape and np.array_equal(previous, current))
+    return previous == current
+
+
+class FigureStream:
+    """מצב הגרף של תצוגה אחת אצל הדפדפן, ובניית ההודעה הבאה אליו
+
+    בכל הרצה: sync, אחריו append/restyle לכל עקבה שמתעדכנת, ובסוף message. כשנדרש
+    גרף מלא, append/restyle רק רושמים את הערכים שהגרף המלא כבר כולל.
+    """
+
+    def __init__(self):
+        self.figure_id = None
+        self.seq = 0
+        self.full = True
+        self._sent = {}        # עקבה -> נקודות ה-x שהדפדפן מחזיק
+        self._styles = {}      # עקבה -> המאפיינים האחרונים שנשלחו
+        self._extend = {}
+        self._restyle = {}
+
+    def sync(self, figure_id, acknowledged):
+        """מתחיל הודעה חדשה; מחזיר True אם נדרש גרף מלא
+
+        acknowledged הוא מזהה הגרף המלא שהדפדפן דיווח שהציג (ערך הרכיב), או None.
+        """
+        figure_id = str(figure_id)
+        self.full = figure_id != self.figure_id or acknowledged != figure_id
+        if self.full:
+            self._sent.clear()
+            self._styles.clear()
+        self.figure_id = figure_id
+        self._extend, self._restyle = {}, {}
+        return self.full
+
+    def append(self, index, x, y):
+        """עקבה חיה: נשלחות רק הנקודות שאחרי האחרונה שנשלחה, ונחתכות אלה שלפני תחילת החלון
+
+        x, y הם החלון העדכני כולו (x עולה). הדפדפן מחזיק אחר כך את הנקודות הישנות שעדיין
+        בחלון ואחריהן החדשות - הקטנת החלון אינה מחושבת מחדש על הנקודות שכבר הוצגו.
+        """
+        x = np.asarray(x)
+        y = np.asarray(y)
+        sent = self._sent.get(index)
+        if self.full or sent is None or len(sent) == 0 or len(x) == 0:
+            self._sent[index] = x
+            if not self.full:
+                self._restyle[index] = {"x": x, "y": y}
+            return
+        new = np.searchsorted(x, sent[-1], side="right")
+        drop = np.searchsorted(sent, x[0], side="left")
+        if new == len(x) and drop == 0:
+            return
+        self._sent[index] = np.concatenate([sent[drop:], x[new:]])
+        self._extend[index] = (x[new:], y[new:], len(self._sent[index]))
+
+    def restyle(self, index, **attributes):
+        """מחליף מאפיינים של עקבה (מערכים שלמים) - נשלח רק מה שהשתנה מאז ההודעה הקודמת"""
+        previous = self._styles.setdefault(index, {})
+        changed = {name: value for name, value in attributes.items()
+                   if name not in previous or not _same(previous[name], value)}
+        previous.update(changed)
+        if changed and not self.full:
+            self._restyle.setdefault(index, {}).update(changed)
+
+    def message(self, figure=None):
+        """ההודעה לרכיב בדפדפן: גרף מלא (figure - Figure או JSON) או התיקונים מאז ההודעה הקודמת"""
+        if self.full:
+            self.seq += 1
+            return {"figure_id": self.figure_id, "seq": self.seq,
+                    "figure": figure if isinstance(figure, str) else figure_json(figure)}
+        if not self._extend and not self._restyle:
+            return {"figure_id": self.figure_id, "seq": self.seq}
+        base, self.seq = self.seq, self.seq + 1
+        message = {"figure_id": self.figure_id, "base": base, "seq": self.seq}
+        if self._extend:
+            indices = list(self._extend)
+            message["extend"] = {
+                "indices": indices,
+                "x": [_plain(self._extend[i][0]) for i in indices],
+                "y": [_plain(self._extend[i][1]) for i in indices],
+                "max_points": [self._extend[i][2] for i in indices],
+            }
+        if self._restyle:
+            # מאפיינים מקוננים בכתיב הנקודה של plotly.js (marker_size -> marker.size)
+            message["restyle"] = [
+                {"index": index, "update": {name.replace("_", "."): [_plain(value) if isinstance(value, np.ndarray)
+                                                                    else value]
+                                            for name, value in attributes.items()}}
+                for index, attributes in self._restyle.items()]
+        return message
+
+
+def message_size(message):
+    """גודל ההודעה ברשת (בתים) - כפי שהיא מסודרת לארגומנטים של הרכיב"""
+    return len(json.dumps(message, ensure_ascii=False).encode())
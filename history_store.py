@@ -0,0 +1,258 @@
+"""היסטוריית חיישנים על דיסק: אחסון עמודתי מחולק לפי ימים
+
+לכל חיישן תיקייה, ובה לכל יום (UTC) שלושה קבצים:
+    <יום>.ts   חותמות זמן int64 (ns) ברוחב קבוע
+    <יום>.val  ערכי float32 ברוחב קבוע
+    <יום>.idx  אינדקס קטן: מספר הרשומות שנכתבו במלואן, וחותמות הזמן הראשונה והאחרונה
+
+הכתיבה היא הוספה בלבד: קודם העמודות ואחריהן האינדקס. אחרי קריסה באמצע כתיבה
+העמודות עלולות להכיל זנב חלקי - בפתיחה הן נחתכות לאורך שהאינדקס מאשר. אינדקס
+שאבד לגמרי נבנה מחדש מאורך העמודות.
+הקריאה ממפה את העמודות לזיכרון (np.memmap) ללא העתקה וללא פענוח הקובץ. מפת
+המקטעים משותפת לתהליכון הקליטה (שיוצר מקטע חדש במעבר יום) ולקוראים, ולכן כל
+גישה אליה היא תחת נעילה, והקוראים עוברים על עותק של רשימת הימים.
+"""
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from sensor_series import SENSOR_NAMES
+
+NS_PER_DAY = 24 * 3600 * 1_000_000_000
+INDEX_FORMAT = struct.Struct("<qqq")  # מספר רשומות, חותמת ראשונה, חותמת אחרונה
+TS_DTYPE = np.dtype("<i8")
+VALUE_DTYPE = np.dtype("<f4")
+
+DEFAULT_HISTORY_DIR = Path(__file__).resolve().parent / "sensor_history"
+
+# תווים שאסורים בשמות קבצים (גם ב-Windows) - מוחלפים בשם תיקיית החיישן
+_UNSAFE_PATH_CHARS = re.compile(r'[\\/:*?"<>|]')
+
+
+def day_of(timestamp_ns):
+    """מספר היום (מאז 1970) של חותמת זמן"""
+    return int(timestamp_ns) // NS_PER_DAY
+
+
+class Segment:
+    """מקטע יומי של חיישן אחד: שתי עמודות ברוחב קבוע וקובץ אינדקס"""
+
+    def __init__(self, directory, day):
+        self.day = day
+        name = str(np.datetime64(day, "D"))
+        self.ts_path = directory / f"{name}.ts"
+        self.val_path = directory / f"{name}.val"
+        self.idx_path = directory / f"{name}.idx"
+        self.index_missing = not self.idx_path.exists()
+        self.count, self.first, self.last = self._read_index()
+        self._files = None
+
+    def _read_index(self):
+        try:
+            data = self.idx_path.read_bytes()
+        except FileNotFoundError:
+            return 0, None, None
+        if len(data) < INDEX_FORMAT.size:
+            return 0, None, None
+        count, first, last = INDEX_FORMAT.unpack_from(data)
+        return count, (first if count else None), (last if count else None)
+
+    def recover(self):
+        """חותך את העמודות לאורך שהאינדקס מאשר ומחזיר את מספר הרשומות החלקיות שנזרקו
+
+        אם האינדקס מצביע מעבר לנתונים שעל הדיסק (נכתב לפני שהעמודות נשמרו), הוא מתוקן
+        לאורך העמודה הקצרה מבין השתיים. אם קובץ האינדקס חסר לגמרי (הוא נוצר לפני הכתיבה
+        הראשונה, כך שקריסה אינה משאירה עמודות בלעדיו) - גם הוא נבנה מהעמודה הקצרה.
+        """
+        sizes = [path.stat().st_size if path.exists() else 0 for path in (self.ts_path, self.val_path)]
+        complete = min(sizes[0] // TS_DTYPE.itemsize, sizes[1] // VALUE_DTYPE.itemsize)
+        if self.index_missing and complete:
+            self.count = complete
+            self._write_index_file()
+            self.index_missing = False
+        elif self.count > complete:
+            self.count = complete
+            self._write_index_file()
+        dropped = max(sizes[0] // TS_DTYPE.itemsize, sizes[1] // VALUE_DTYPE.itemsize) - self.count
+        for path, itemsize, size in ((self.ts_path, TS_DTYPE.itemsize, sizes[0]),
+                                     (self.val_path, VALUE_DTYPE.itemsize, sizes[1])):
+            if size != self.count * itemsize:
+                with open(path, "r+b" if path.exists() else "wb") as f:
+                    f.truncate(self.count * itemsize)
+        return dropped
+
+    def _write_index_file(self):
+        if self.count:
+            ts = np.memmap(self.ts_path, dtype=TS_DTYPE, mode="r", shape=(self.count,))
+            self.first, self.last = int(ts[0]), int(ts[-1])
+            del ts
+        else:
+            self.first = self.last = None
+        with open(self.idx_path, "r+b" if self.idx_path.exists() else "wb") as f:
+            self._write_index(f)
+
+    def _write_index(self, f):
+        # 24 בתים במקום - האינדקס לעולם אינו מקוצץ, כך שאין רגע שבו הוא ריק
+        f.seek(0)
+        f.write(INDEX_FORMAT.pack(self.count, self.first or 0, self.last or 0))
+        f.flush()
+
+    def append(self, timestamps_ns, values, sync=False):
+        """מוסיף רשומות לסוף המקטע: עמודות, ואחריהן עדכון האינדקס (נקודת האישור)"""
+        if self._files is None:
+            self.ts_path.parent.mkdir(parents=True, exist_ok=True)
+            if not self.idx_path.exists():
+                self.idx_path.write_bytes(b"")
+            self._files = [open(self.ts_path, "ab"), open(self.val_path, "ab"), open(self.idx_path, "r+b")]
+        ts_file, val_file, idx_file = self._files
+        ts_file.write(np.ascontiguousarray(timestamps_ns, dtype=TS_DTYPE).tobytes())
+        val_file.write(np.ascontiguousarray(values, dtype=VALUE_DTYPE).tobytes())
+        for f in (ts_file, val_file):
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+
+        self.count += len(timestamps_ns)
+        if self.first is None:
+            self.first = int(timestamps_ns[0])
+        self.last = int(timestamps_ns[-1])
+        # האינדקס נכתב רק אחרי שהעמודות נשמרו - רשומה נחשבת קיימת רק כשהיא מאושרת בו
+        self._write_index(idx_file)
+        if sync:
+            os.fsync(idx_file.fileno())
+
+    def close(self):
+        if self._files is not None:
+            for f in self._files:
+                f.close()
+            self._files = None
+
+    def arrays(self):
+        """views ממופים לזיכרון של הרשומות המאושרות (חותמות זמן, ערכים)"""
+        if self.count == 0:
+            return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        return (np.memmap(self.ts_path, dtype=TS_DTYPE, mode="r", shape=(self.count,)),
+                np.memmap(self.val_path, dtype=VALUE_DTYPE, mode="r", shape=(self.count,)))
+
+
+class HistoryStore:
+    """היסטוריה עמודתית של חיישנים על דיסק - מקטע לכל חיישן לכל יום"""
+
+    def __init__(self, root=DEFAULT_HISTORY_DIR, sensor_names=SENSOR_NAMES, sync=False):
+        self.root = Path(root)
+        self.sensor_names = list(sensor_names)
+        self.sync = sync
+        self._segments = {name: {} for name in self.sensor_names}
+        self._lock = threading.Lock()
+        self.recovered = self._open()
+
+    def _directory(self, sensor):
+        return self.root / _UNSAFE_PATH_CHARS.sub("_", sensor)
+
+    def _open(self):
+        """טוען את המקטעים הקיימים ומשחזר מקטעים שכתיבתם נקטעה; מחזיר את מספר הרשומות שנזרקו"""
+        dropped = 0
+        for sensor in self.sensor_names:
+            directory = self._directory(sensor)
+            if not directory.exists():
+                continue
+            days = {path.stem for path in directory.iterdir() if path.suffix in (".ts", ".val", ".idx")}
+            for name in days:
+                segment = Segment(directory, int(np.datetime64(name, "D").astype(np.int64)))
+                dropped += segment.recover()
+                self._segments[sensor][segment.day] = segment
+        return dropped
+
+    def _segment(self, sensor, day):
+        with self._lock:
+            segments = self._segments[sensor]
+            if day not in segments:
+                segments[day] = Segment(self._directory(sensor), day)
+            return segments[day]
+
+    def _days(self, sensor, reverse=False):
+        """עותק ממוין של (יום, מקטע) - בטוח למעבר גם כשתהליכון הקליטה מוסיף מקטע ליום חדש"""
+        with self._lock:
+            return sorted(self._segments[sensor].items(), reverse=reverse)
+
+    def last_timestamp(self, sensor):
+        """חותמת הזמן של הרשומה האחרונה שנשמרה לחיישן, או None"""
+        for _, segment in self._days(sensor, reverse=True):
+            if segment.count:
+                return segment.last
+        return None
+
+    def append(self, sensor, timestamps_ns, values):
+        """מוסיף דגימות ממוינות בזמן לחיישן; דגימות שאינן חדשות מהאחרונה שנשמרה נזרקות
+
+        מחזיר את מספר הדגימות שנכתבו.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        last = self.last_timestamp(sensor)
+        if last is not None:
+            first_new = np.searchsorted(timestamps_ns, last, side="right")
+            timestamps_ns, values = timestamps_ns[first_new:], values[first_new:]
+        if len(timestamps_ns) == 0:
+            return 0
+
+        # פיצול האצווה לפי גבולות ימים - כל חלק נכתב למקטע של יומו
+        days = timestamps_ns // NS_PER_DAY
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(days)]):
+            self._segment(sensor, int(days[start])).append(timestamps_ns[start:end], values[start:end], self.sync)
+        # מקטעים של ימים קודמים כבר לא יקבלו נתונים - סוגרים את הקבצים הפתוחים שלהם
+        for day, segment in self._days(sensor):
+            if day < days[-1]:
+                segment.close()
+        return len(timestamps_ns)
+
+    def tail(self, sensor, n, end_ns):
+        """עד n הדגימות האחרונות של חיישן לפני end_ns - נקראות מהמקטעים מהחדש לישן"""
+        parts = []
+        remaining = n
+        for day, segment in self._days(sensor, reverse=True):
+            if day > day_of(end_ns):
+                continue
+            timestamps, values = segment.arrays()
+            last = np.searchsorted(timestamps, end_ns, side="left")
+            first = max(0, last - remaining)
+            parts.append((timestamps[first:last], values[first:last]))
+            remaining -= last - first
+            if remaining <= 0:
+                break
+        if not parts:
+            return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        return (np.concatenate([timestamps for timestamps, _ in reversed(parts)]),
+                np.concatenate([values for _, values in reversed(parts)]))
+
+    def read_segments(self, sensor, start_ns, end_ns):
+        """רשימת views ממופים (חותמות זמן, ערכים) לכל יום בטווח [start_ns, end_ns) - ללא העתקה"""
+        result = []
+        for day, segment in self._days(sensor):
+            if day < day_of(start_ns) or day > day_of(end_ns):
+                continue
+            timestamps, values = segment.arrays()
+            first, last = np.searchsorted(timestamps, [start_ns, end_ns], side="left")
+            if last > first:
+                result.append((timestamps[first:last], values[first:last]))
+        return result
+
+    def read(self, sensor, start_ns, end_ns):
+        """(חותמות זמן, ערכים) בטווח [start_ns, end_ns); טווח ביום אחד מוחזר כ-view ממופה"""
+        segments = self.read_segments(sensor, start_ns, end_ns)
+        if not segments:
+            return np.empty(0, dtype=TS_DTYPE), np.empty(0, dtype=VALUE_DTYPE)
+        if len(segments) == 1:
+            return segments[0]
+        return (np.concatenate([timestamps for timestamps, _ in segments]),
+                np.concatenate([values for _, values in segments]))
+
+    def close(self):
+        for sensor in self.sensor_names:
+            for _, segment in self._days(sensor):
+                segment.close()
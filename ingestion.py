@@ -0,0 +1,311 @@
+"""שרת קליטה מקומי לנתוני חיישנים ומפרסם מדומה לבדיקתו
+
+פורמט המסגרת הבינארית (little-endian):
+    כותרת: b'DTF1' ומספר הרשומות (uint32)
+    רשומות: מזהה חיישן (uint16, אינדקס ב-sensor_names של המאגר), חותמת זמן (int64, ns), ערך (float32)
+
+ב-TCP המסגרות נשלחות ברצף על החיבור; ב-UDP כל datagram מכיל מסגרת אחת או יותר.
+
+הרצה:
+    python ingestion.py serve                 שרת עצמאי (מדפיס סטטיסטיקות)
+    python ingestion.py publish --rate 50000  מפרסם מדומה לשרת
+"""
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from sensor_series import SENSOR_NAMES, sample_sensor_values
+from sensor_store import SensorStore, local_now_ns
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_TCP_PORT = 9870
+DEFAULT_UDP_PORT = 9871
+
+FRAME_MAGIC = b"DTF1"
+FRAME_HEADER = struct.Struct("<4sI")
+RECORD_DTYPE = np.dtype([("sensor", "<u2"), ("timestamp", "<i8"), ("value", "<f4")])
+
+# גודל datagram מרבי - מסגרות UDP גדולות יותר מפוצלות אצל המפרסם
+MAX_DATAGRAM_RECORDS = (65_507 - FRAME_HEADER.size) // RECORD_DTYPE.itemsize
+
+
+class FrameError(ValueError):
+    """מסגרת פגומה - כותרת שאינה מתחילה ב-FRAME_MAGIC"""
+
+
+@dataclass
+class IngestionStats:
+    """מונים מצטברים של השרת"""
+    frames: int = 0
+    points: int = 0
+    dropped: int = 0
+    errors: int = 0
+
+
+def encode_frame(sensor_ids, timestamps_ns, values):
+    """מקודד אצווה של דגימות למסגרת בינארית אחת"""
+    records = np.empty(len(timestamps_ns), dtype=RECORD_DTYPE)
+    records["sensor"] = sensor_ids
+    records["timestamp"] = timestamps_ns
+    records["value"] = values
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(records)) + records.tobytes()
+
+
+def decode_frames(buffer):
+    """מפענח את כל המסגרות השלמות שבתחילת buffer
+
+    מחזיר (רשימת מערכי רשומות, מספר הבתים שנצרכו). הרשומות הן views על buffer
+    (np.frombuffer) - ללא פענוח רשומה-רשומה.
+    """
+    view = memoryview(buffer)
+    chunks = []
+    offset = 0
+    while len(view) - offset >= FRAME_HEADER.size:
+        magic, count = FRAME_HEADER.unpack_from(view, offset)
+        if magic != FRAME_MAGIC:
+            raise FrameError(f"כותרת מסגרת לא תקינה: {magic!r}")
+        end = offset + FRAME_HEADER.size + count * RECORD_DTYPE.itemsize
+        if end > len(view):
+            break
+        chunks.append(np.frombuffer(view, dtype=RECORD_DTYPE, count=count, offset=offset + FRAME_HEADER.size))
+        offset = end
+    return chunks, offset
+
+
+def ingest_records(store, records, history=None):
+    """כותב רשומות מפוענחות למאגר (ולשכבות הצבירה): מיון לפי (חיישן, זמן) וכתיבה אחת לכל חיישן
+
+    רשומות של חיישן לא מוכר, או ישנות מהדגימה האחרונה במאגר, נזרקות. אם ניתנה
+    היסטוריה (HistoryStore), הרשומות שנכתבו נוספות גם לסוף המקטעים שעל הדיסק.
+    מחזיר (נכתבו, נזרקו).
+    """
+    if len(records) == 0:
+        return 0, 0
+    records = records[np.lexsort((records["timestamp"], records["sensor"]))]
+    sensor_ids, starts = np.unique(records["sensor"], return_index=True)
+    accepted = []
+    with store.lock:
+        for sensor_id, part in zip(sensor_ids, np.split(records, starts[1:])):
+            if sensor_id >= len(store.sensor_names):
+                continue
+            sensor = store.sensor_names[sensor_id]
+            last = store.buffers[sensor].last_timestamp()
+            if last is not None:
+                part = part[part["timestamp"] > last]
+            store.write(sensor, part["timestamp"], part["value"])
+            accepted.append((sensor, part))
+
+    # הכתיבה לדיסק מחוץ לנעילה - קריאות הגרף מהמאגר אינן ממתינות לה
+    if history is not None:
+        for sensor, part in accepted:
+            history.append(sensor, part["timestamp"], part["value"])
+    written = sum(len(part) for _, part in accepted)
+    return written, len(records) - written
+
+
+class _TcpFrameProtocol(asyncio.Protocol):
+    """חיבור TCP: צובר בתים ומפענח את כל המסגרות השלמות בכל קריאה"""
+
+    def __init__(self, server):
+        self.server = server
+        self.buffer = bytearray()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        try:
+            chunks, consumed = decode_frames(self.buffer)
+        except FrameError:
+            self.server.stats.errors += 1
+            self.transport.close()
+            return
+        if not chunks:
+            return
+        # הרשומות הן views על ה-buffer - מעתיקים ומשחררים אותן לפני קיצוץ הבתים שנצרכו
+        records, frames = np.concatenate(chunks), len(chunks)
+        del chunks
+        del self.buffer[:consumed]
+        self.server.ingest(records, frames)
+
+
+class _UdpFrameProtocol(asyncio.DatagramProtocol):
+    """datagram UDP: כל datagram מכיל מסגרות שלמות בלבד"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        try:
+            chunks, consumed = decode_frames(data)
+        except FrameError:
+            chunks, consumed = [], 0
+        if consumed != len(data):
+            self.server.stats.errors += 1
+        if chunks:
+            self.server.ingest(np.concatenate(chunks), len(chunks))
+
+
+class IngestionServer:
+    """שרת קליטה מקומי (TCP ו-UDP) שרץ בלולאת asyncio בתהליכון רקע וכותב ל-SensorStore"""
+
+    def __init__(self, store, host=DEFAULT_HOST, tcp_port=DEFAULT_TCP_PORT, udp_port=DEFAULT_UDP_PORT,
+                 history=None):
+        self.store = store
+        self.history = history
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.stats = IngestionStats()
+        self.error = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def ingest(self, records, frames=1):
+        written, dropped = ingest_records(self.store, records, self.history)
+        self.stats.frames += frames
+        self.stats.points += written
+        self.stats.dropped += dropped
+
+    def start(self, timeout=5.0):
+        """מפעיל את השרת בתהליכון רקע וממתין עד שהשקעים מאזינים; מחזיר False אם הפתיחה נכשלה"""
+        self._thread = threading.Thread(target=self._run, name="sensor-ingestion", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        return self.error is None
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and self.error is None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            tcp = self._loop.run_until_complete(
+                self._loop.create_server(lambda: _TcpFrameProtocol(self), self.host, self.tcp_port))
+            udp, _ = self._loop.run_until_complete(
+                self._loop.create_datagram_endpoint(lambda: _UdpFrameProtocol(self),
+                                                    local_addr=(self.host, self.udp_port)))
+        except OSError as error:
+            self.error = error
+            self._ready.set()
+            self._loop.close()
+            return
+
+        # בפורט 0 מערכת ההפעלה בוחרת פורט פנוי - שומרים את הפורטים בפועל
+        self.tcp_port = tcp.sockets[0].getsockname()[1]
+        self.udp_port = udp.get_extra_info("sockname")[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            tcp.close()
+            udp.close()
+            self._loop.run_until_complete(tcp.wait_closed())
+            self._loop.close()
+
+
+def synthetic_frames(batch_size, sample_period_ns, sensor_names=SENSOR_NAMES, start_ns=None, rng=None):
+    """מחולל אינסופי של מסגרות מדומות: batch_size נקודות לכל מסגרת, כל החיישנים בכל חותמת זמן"""
+    rng = np.random.default_rng() if rng is None else rng
+    n_sensors = len(sensor_names)
+    steps = max(1, batch_size // n_sensors)
+    next_ns = local_now_ns() if start_ns is None else start_ns
+    sensor_ids = np.tile(np.arange(n_sensors, dtype=np.uint16), steps)
+    while True:
+        timestamps = next_ns + sample_period_ns * np.arange(steps, dtype=np.int64)
+        values = sample_sensor_values(timestamps, sensor_names, rng)
+        # סדר הרשומות: לכל חותמת זמן כל החיישנים ברצף
+        yield encode_frame(sensor_ids, np.repeat(timestamps, n_sensors), values.T.ravel())
+        next_ns = int(timestamps[-1]) + sample_period_ns
+
+
+def publish(host=DEFAULT_HOST, port=DEFAULT_TCP_PORT, protocol="tcp", rate=50_000, duration=None,
+            batch_size=1_000, sensor_names=SENSOR_NAMES, rng=None):
+    """מפרסם מדומה: שולח מסגרות בקצב rate נקודות לשנייה (0 - מהר ככל האפשר) ומחזיר את מספר הנקודות
+
+    חותמות הזמן מתקדמות בקצב השליחה, כך שהשרת מקבל סדרה רציפה בזמן אמת
+    (ב-rate=0 הן מרווחות במילישנייה ומתקדמות מהר מהשעון).
+    """
+    if protocol == "udp":
+        batch_size = min(batch_size, MAX_DATAGRAM_RECORDS)
+    n_sensors = len(sensor_names)
+    points_per_frame = max(1, batch_size // n_sensors) * n_sensors
+    sample_period_ns = int(1e9 * n_sensors / rate) if rate else 1_000_000
+
+    kind = socket.SOCK_STREAM if protocol == "tcp" else socket.SOCK_DGRAM
+    sent = 0
+    start = time.perf_counter()
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.connect((host, port))
+        for frame in synthetic_frames(batch_size, sample_period_ns, sensor_names, rng=rng):
+            sock.sendall(frame) if protocol == "tcp" else sock.send(frame)
+            sent += points_per_frame
+            elapsed = time.perf_counter() - start
+            if duration is not None and elapsed >= duration:
+                break
+            if rate:
+                # המתנה עד שהקצב המצטבר יורד לקצב היעד
+                ahead = sent / rate - elapsed
+                if ahead > 0:
+                    time.sleep(ahead)
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="שרת קליטה ומפרסם מדומה לנתוני חיישנים")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="הפעלת שרת הקליטה")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--tcp-port", type=int, default=DEFAULT_TCP_PORT)
+    serve.add_argument("--udp-port", type=int, default=DEFAULT_UDP_PORT)
+
+    pub = commands.add_parser("publish", help="שליחת נתונים מדומים לשרת")
+    pub.add_argument("--host", default=DEFAULT_HOST)
+    pub.add_argument("--port", type=int, help="ברירת מחדל: פורט ה-TCP או ה-UDP של השרת")
+    pub.add_argument("--udp", action="store_true", help="שליחה ב-UDP במקום TCP")
+    pub.add_argument("--rate", type=float, default=50_000, help="נקודות לשנייה (0 - ללא הגבלה)")
+    pub.add_argument("--duration", type=float, help="משך השליחה בשניות (ברירת מחדל - ללא הגבלה)")
+    pub.add_argument("--batch", type=int, default=1_000, help="נקודות לכל מסגרת")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = IngestionServer(SensorStore(), args.host, args.tcp_port, args.udp_port)
+        if not server.start():
+            parser.error(f"פתיחת השרת נכשלה: {server.error}")
+        print(f"מאזין ב-{args.host} (TCP {args.tcp_port}, UDP {args.udp_port})")
+        try:
+            while True:
+                time.sleep(1)
+                stats = server.stats
+                print(f"מסגרות: {stats.frames:,}  נקודות: {stats.points:,}  "
+                      f"נזרקו: {stats.dropped:,}  שגיאות: {stats.errors:,}")
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        protocol = "udp" if args.udp else "tcp"
+        port = args.port or (DEFAULT_UDP_PORT if args.udp else DEFAULT_TCP_PORT)
+        try:
+            sent = publish(args.host, port, protocol, args.rate, args.duration, args.batch)
+        except KeyboardInterrupt:
+            return
+        print(f"נשלחו {sent:,} נקודות")
+
+
+if __name__ == "__main__":
+    main()
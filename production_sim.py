@@ -0,0 +1,370 @@
+"""סימולציית אירועים בדידים של קו הייצור M1-M8
+
+הקו הוא שרשרת תחנות עם חוצצים סופיים ביניהן: תחנה שסיימה פריט מעבירה אותו לחוצץ
+הבא, ואם הוא מלא היא נחסמת עד שמתפנה מקום. תור האירועים הוא ערימה (heapq) של
+(זמן, מספר סידורי, סוג, תחנה, גרסה): סיום עיבוד, כשל, תיקון ושינוי קצב. כשל עוצר
+את העיבוד באמצע (הזמן שנותר נשמר וממשיך אחרי התיקון); אירוע סיום שהתבטל מזוהה לפי
+מספר הגרסה של התחנה ומדולג.
+
+כל מקור אקראיות (זמני עיבוד וכשלים לכל תחנה, אירוע התרחיש) הוא זרם נפרד מאותו זרע,
+כך שהרצת בסיס והרצת תרחיש עם אותו זרע נבדלות רק באירוע התרחיש (מספרים אקראיים משותפים).
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+import numpy as np
+
+STATIONS = ("M1", "M2", "M3", "M4", "M5", "M6", "M7", "M8")
+CYCLE_MINUTES = (1.0, 1.1, 0.9, 1.2, 1.0, 1.05, 0.95, 1.0)  # M4 הוא צוואר הבקבוק
+CYCLE_CV = 0.1           # מקדם השונות של זמן העיבוד (התפלגות גמא)
+BUFFER_CAPACITY = 5      # פריטים בחוצץ שלפני כל תחנה
+MTBF_MINUTES = 2400      # זמן ממוצע בין כשלים אקראיים בכל תחנה
+REPAIR_MINUTES = 45      # משך תיקון ממוצע אחרי הגעת המכונאי
+RESPONSE_MINUTES = 30    # זמן תגובה ברירת מחדל של המכונאים
+
+SHIFT_MINUTES = 8 * 60
+INCIDENT_START_MINUTES = 60  # אירוע התרחיש מתחיל אחרי שהקו התייצב
+INCIDENT_REPAIR_SHAPE = 4    # תיקון אירוע התרחיש: גמא, פחות מפוזר מכשל אקראי
+UNSTABLE_MTBF_MINUTES = 20   # באי-יציבות: עצירות קצרות ותכופות
+UNSTABLE_STOP_MINUTES = 4
+
+# ציוד התרחיש -> התחנות שנפגעות; מערכת הבקרה המרכזית עוצרת את כל הקו
+EQUIPMENT_STATIONS = {
+    "מכונה M1 (תחילת קו ייצור)": (0,),
+    "מכונה M4 (אמצע קו ייצור)": (3,),
+    "מכונה M7 (סוף קו ייצור)": (6,),
+    "מערכת בקרה מרכזית": tuple(range(len(STATIONS))),
+}
+SLOW_FACTOR = 2.0  # "ירידה בביצועים (50%)" - זמן העיבוד מוכפל
+
+# חזרות: כל חזרה היא משמרת עם התקלה ובלעדיה, בזרע (seed, k) משלה
+REPLICATION_METRICS = ("productivity", "downtime", "throughput")
+DEFAULT_REPLICATIONS = 400
+REPLICATION_BATCH = 8       # חזרות למשימה בתהליך - מפחית את תקורת ההעברה בין התהליכים
+MIN_REPLICATIONS = 30       # לפני כן רווח הסמך אינו אמין מספיק לעצירה מוקדמת
+CONFIDENCE_Z = 1.96         # רווח סמך 95%
+
+_END, _FAIL, _REPAIR, _SLOW = range(4)
+
+
+class Incident(NamedTuple):
+    stations: tuple
+    start: float
+    duration: float
+    kind: str  # "כשל מלא" / "ירידה בביצועים (50%)" / "אי-יציבות"
+
+
+@dataclass
+class SimulationResult:
+    horizon: float
+    throughput: int
+    events: int
+    busy: np.ndarray = field(repr=False)     # דקות עיבוד לכל תחנה
+    down: np.ndarray = field(repr=False)     # דקות השבתה לכל תחנה
+    blocked: np.ndarray = field(repr=False)  # דקות חסימה (החוצץ הבא מלא) לכל תחנה
+
+    @property
+    def starved(self):
+        """דקות שבהן התחנה חיכתה לפריט (החוצץ שלפניה ריק)"""
+        return np.maximum(0, self.horizon - self.busy - self.down - self.blocked)
+
+
+def _failure_schedule(rng, horizon, response_time, mtbf=MTBF_MINUTES, repair=REPAIR_MINUTES):
+    """זמני כשל ותיקון אקראיים של תחנה אחת עד האופק - לא תלויים במצב הקו"""
+    schedule = []
+    t = rng.exponential(mtbf)
+    while t < horizon:
+        duration = response_time + rng.exponential(repair)
+        schedule.append((t, duration))
+        t += duration + rng.exponential(mtbf)
+    return schedule
+
+
+def scenario_incident(equipment, failure_type, response_time, rng, start=INCIDENT_START_MINUTES):
+    """אירוע התרחיש: התחנות שנפגעות, ומשך האירוע - זמן התגובה ועוד זמן התיקון"""
+    repair = rng.gamma(INCIDENT_REPAIR_SHAPE, REPAIR_MINUTES / INCIDENT_REPAIR_SHAPE)
+    return Incident(EQUIPMENT_STATIONS[equipment], start, response_time + repair, failure_type)
+
+
+def simulate_line(horizon=SHIFT_MINUTES, seed=0, incident=None, response_time=RESPONSE_MINUTES,
+                  cycle_minutes=CYCLE_MINUTES, buffer_capacity=BUFFER_CAPACITY, mtbf=MTBF_MINUTES):
+    """מריץ את הקו עד האופק (דקות) ומחזיר SimulationResult
+
+    incident הוא אירוע תרחיש (Incident) שמתווסף לכשלים האקראיים; response_time חל על
+    כל תיקון. זמני העיבוד מוגרלים מראש באצוות (מערך לכל תחנה) ונקראים לפי מספר הפריט.
+    """
+    n = len(cycle_minutes)
+    streams = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(2 * n + 1)]
+    shape = 1 / CYCLE_CV ** 2
+    draws = [[] for _ in range(n)]
+    items = [0] * n
+
+    def processing_time(i):
+        if items[i] == len(draws[i]):
+            # האצווה הבאה של זמני העיבוד - הזרם של התחנה נשמר גם כשהאצוות מתארכות
+            more = int(horizon / cycle_minutes[i]) + 64
+            draws[i].extend(streams[i].gamma(shape, cycle_minutes[i] / shape, more).tolist())
+        items[i] += 1
+        return draws[i][items[i] - 1]
+
+    events = []
+    sequence = 0
+
+    def push(time, kind, station, version=0):
+        nonlocal sequence
+        heapq.heappush(events, (time, sequence, kind, station, version))
+        sequence += 1
+
+    # כשלים אקראיים ואירוע התרחיש ידועים מראש - כולם נכנסים לתור לפני ההרצה
+    for i in range(n):
+        for start, duration in _failure_schedule(streams[n + i], horizon, response_time, mtbf):
+            push(start, _FAIL, i)
+            push(start + duration, _REPAIR, i)
+    if incident is not None:
+        end = incident.start + incident.duration
+        for i in incident.stations:
+            if incident.kind == "ירידה בביצועים (50%)":
+                push(incident.start, _SLOW, i, SLOW_FACTOR)
+                push(end, _SLOW, i, 1.0)
+            elif incident.kind == "אי-יציבות":
+                rng = streams[-1]
+                t = incident.start + rng.exponential(UNSTABLE_MTBF_MINUTES)
+                while t < end:
+                    stop = rng.exponential(UNSTABLE_STOP_MINUTES)
+                    push(t, _FAIL, i)
+                    push(min(t + stop, end), _REPAIR, i)
+                    t += stop + rng.exponential(UNSTABLE_MTBF_MINUTES)
+            else:
+                push(incident.start, _FAIL, i)
+                push(end, _REPAIR, i)
+
+    buffers = [0] * n            # פריטים שממתינים לפני כל תחנה (לתחנה הראשונה - אספקה בלתי מוגבלת)
+    busy = [False] * n
+    blocked = [False] * n
+    down = [0] * n               # מונה סיבות השבתה פעילות (כשל אקראי ואירוע עשויים לחפוף)
+    end_time = [0.0] * n
+    remaining = [0.0] * n        # זמן עיבוד שנותר לפריט שנקטע בכשל
+    version = [0] * n
+    slowdown = [1.0] * n
+    busy_time = np.zeros(n)
+    down_time = np.zeros(n)
+    blocked_time = np.zeros(n)
+    down_since = [0.0] * n
+    blocked_since = [0.0] * n
+    throughput = 0
+
+    def start_work(i, t, duration):
+        busy[i] = True
+        end_time[i] = t + duration
+        version[i] += 1
+        busy_time[i] += min(duration, horizon - t)
+        push(end_time[i], _END, i, version[i])
+
+    def try_start(i, t):
+        if busy[i] or blocked[i] or down[i] or remaining[i]:
+            return
+        if i > 0:
+            if buffers[i] == 0:
+                return
+            buffers[i] -= 1
+            # התפנה מקום בחוצץ - תחנה קודמת שנחסמה יכולה להעביר את הפריט שלה
+            unblock(i - 1, t)
+        start_work(i, t, processing_time(i) * slowdown[i])
+
+    def unblock(i, t):
+        if blocked[i]:
+            blocked[i] = False
+            blocked_time[i] += t - blocked_since[i]
+            buffers[i + 1] += 1
+            try_start(i, t)
+
+    def finish(i, t):
+        nonlocal throughput
+        busy[i] = False
+        if i == n - 1:
+            throughput += 1
+        elif buffers[i + 1] < buffer_capacity:
+            buffers[i + 1] += 1
+            try_start(i + 1, t)
+        else:
+            blocked[i] = True
+            blocked_since[i] = t
+            return
+        try_start(i, t)
+
+    processed = 0
+    for i in range(n):
+        try_start(i, 0.0)
+    while events and events[0][0] <= horizon:
+        t, _, kind, i, value = heapq.heappop(events)
+        processed += 1
+        if kind == _END:
+            if value == version[i] and busy[i]:
+                finish(i, t)
+        elif kind == _FAIL:
+            down[i] += 1
+            if down[i] == 1:
+                down_since[i] = t
+                if busy[i]:
+                    # העיבוד נקטע: הזמן שנותר נשמר, ואירוע הסיום המתוזמן מתבטל
+                    remaining[i] = end_time[i] - t
+                    busy_time[i] -= min(end_time[i], horizon) - t
+                    busy[i] = False
+                    version[i] += 1
+        elif kind == _REPAIR:
+            down[i] -= 1
+            if down[i] == 0:
+                down_time[i] += t - down_since[i]
+                if remaining[i]:
+                    duration, remaining[i] = remaining[i], 0.0
+                    start_work(i, t, duration)
+                else:
+                    try_start(i, t)
+        else:  # _SLOW
+            if busy[i]:
+                # שינוי קצב באמצע פריט - העבודה שנותרה מתארכת או מתקצרת
+                duration = (end_time[i] - t) / slowdown[i] * value
+                busy_time[i] -= min(end_time[i], horizon) - t
+                start_work(i, t, duration)
+            elif remaining[i]:
+                remaining[i] = remaining[i] / slowdown[i] * value
+            slowdown[i] = value
+
+    # מצבים שעדיין פעילים באופק
+    for i in range(n):
+        if down[i]:
+            down_time[i] += horizon - down_since[i]
+        if blocked[i]:
+            blocked_time[i] += horizon - blocked_since[i]
+    return SimulationResult(horizon, throughput, processed, busy_time, down_time, blocked_time)
+
+
+def _incident_rng(seed):
+    """זרם נפרד מכל זרמי simulate_line - משך האירוע לא משנה את הגרלות הקו"""
+    return np.random.default_rng(np.random.SeedSequence(seed).spawn(2 * len(STATIONS) + 2)[-1])
+
+
+def _failure_impact(result, baseline):
+    """(תפוקה %, זמן השבתה בדקות) - הייצור שאבד מתורגם לדקות של צוואר הבקבוק"""
+    productivity = 100 * result.throughput / max(baseline.throughput, 1)
+    downtime = max(0, baseline.throughput - result.throughput) * max(CYCLE_MINUTES)
+    return productivity, downtime
+
+
+def simulate_equipment_failure(equipment, failure_type, response_time, horizon=SHIFT_MINUTES, seed=0):
+    """השפעת תקלת ציוד על משמרת: אותה משמרת עם האירוע ובלעדיו (אותם מספרים אקראיים)
+
+    מחזיר (תפוקה %, זמן השבתה בדקות, תוצאת התרחיש, תוצאת הבסיס). זמן ההשבתה הוא
+    הייצור שאבד מתורגם לדקות של צוואר הבקבוק.
+    """
+    incident = scenario_incident(equipment, failure_type, response_time, _incident_rng(seed))
+    baseline = simulate_line(horizon, seed, response_time=response_time)
+    result = simulate_line(horizon, seed, incident=incident, response_time=response_time)
+    return (*_failure_impact(result, baseline), result, baseline)
+
+
+def response_table(equipment, failure_types, response_times, n_replications=200, seed=0, horizon=SHIFT_MINUTES):
+    """ממוצע התפוקה וזמן ההשבתה של תקלת ציוד על פני חזרות, לכל ציוד × סוג תקלה × זמן תגובה
+
+    חזרה k רצה בזרע (seed, k) כמו ב-run_replications; משמרת הבסיס תלויה רק בזרע ובזמן
+    התגובה, ולכן היא מורצת פעם אחת לכל הצירופים. מחזיר (תפוקה, זמן השבתה) - מערכים
+    בצורה (ציוד, סוג תקלה, זמן תגובה). מכאן מכוילת טבלת התרחיש ב-scenario_engine.
+    """
+    shape = (len(equipment), len(failure_types), len(response_times))
+    productivity = np.zeros(shape)
+    downtime = np.zeros(shape)
+    for r, response_time in enumerate(response_times):
+        for k in range(n_replications):
+            replication_seed = (seed, k)
+            baseline = simulate_line(horizon, replication_seed, response_time=response_time)
+            for e, name in enumerate(equipment):
+                for f, failure_type in enumerate(failure_types):
+                    incident = scenario_incident(name, failure_type, response_time, _incident_rng(replication_seed))
+                    result = simulate_line(horizon, replication_seed, incident=incident, response_time=response_time)
+                    impact = _failure_impact(result, baseline)
+                    productivity[e, f, r] += impact[0]
+                    downtime[e, f, r] += impact[1]
+    return productivity / n_replications, downtime / n_replications
+
+
+class ReplicationSummary(NamedTuple):
+    n: int
+    mean: dict          # מדד -> ממוצע החזרות עד כה
+    half_width: dict    # מדד -> חצי רוחב רווח הסמך (95%)
+    converged: bool     # רוחב הרווח הגיע ליעד - הריצה נעצרה מוקדם
+
+
+def _replication_batch(equipment, failure_type, response_time, seeds, horizon):
+    """מריץ אצוות חזרות בתהליך עובד - מטריצה חזרות × REPLICATION_METRICS"""
+    rows = []
+    for seed in seeds:
+        productivity, downtime, result, _ = simulate_equipment_failure(
+            equipment, failure_type, response_time, horizon, seed)
+        rows.append((productivity, downtime, result.throughput))
+    return np.array(rows)
+
+
+def run_replications(equipment, failure_type, response_time, n_replications=DEFAULT_REPLICATIONS, seed=0,
+                     workers=None, target_half_width=None, metric="productivity", horizon=SHIFT_MINUTES,
+                     batch=REPLICATION_BATCH):
+    """מריץ חזרות בלתי תלויות של תרחיש תקלת הציוד ומחזיר (yield) סיכום מצטבר אחרי כל אצווה
+
+    חזרה k רצה בזרע (seed, k), והאצוות נצברות לפי סדר השליחה ולא לפי סדר הסיום -
+    כך כל סיכום תלוי רק ב-seed ולא במספר התהליכים. target_half_width עוצר את הריצה
+    כשחצי רוחב רווח הסמך של metric קטן ממנו (אחרי MIN_REPLICATIONS לפחות).
+    workers=1 מריץ בתהליך הנוכחי; None משתמש בכל הליבות.
+    """
+    seeds = [(seed, k) for k in range(n_replications)]
+    tasks = [seeds[start:start + batch] for start in range(0, n_replications, batch)]
+    column = REPLICATION_METRICS.index(metric)
+    n = 0
+    total = np.zeros(len(REPLICATION_METRICS))
+    squares = np.zeros(len(REPLICATION_METRICS))
+
+    def summarize(rows):
+        nonlocal n, total, squares
+        n += len(rows)
+        total += rows.sum(axis=0)
+        squares += (rows ** 2).sum(axis=0)
+        mean = total / n
+        variance = np.maximum(0, squares / n - mean ** 2) * n / max(n - 1, 1)
+        half_width = CONFIDENCE_Z * np.sqrt(variance / n)
+        converged = (target_half_width is not None and n >= MIN_REPLICATIONS
+                     and half_width[column] <= target_half_width)
+        return ReplicationSummary(n, dict(zip(REPLICATION_METRICS, mean.tolist())),
+                                  dict(zip(REPLICATION_METRICS, half_width.tolist())), converged)
+
+    args = (equipment, failure_type, response_time)
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            summary = summarize(_replication_batch(*args, task, horizon))
+            yield summary
+            if summary.converged:
+                return
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # חלון משימות בתהליך: העובדים מקדימים את הצבירה, אבל עצירה מוקדמת לא מבזבזת הרבה עבודה
+        pending = []
+        queued = iter(tasks)
+        try:
+            for task in queued:
+                pending.append(executor.submit(_replication_batch, *args, task, horizon))
+                if len(pending) < 2 * workers:
+                    continue
+                summary = summarize(pending.pop(0).result())
+                yield summary
+                if summary.converged:
+                    return
+            while pending:
+                summary = summarize(pending.pop(0).result())
+                yield summary
+                if summary.converged:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
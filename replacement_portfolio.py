@@ -0,0 +1,188 @@
+"""תכנון תיק החלפות לכל הצי תחת תקציב הון שנתי וקיבולת צוותי התקנה
+
+לכל נכס בוחרים שנת החלפה אחת באופק (או דחייה לסופו), כך שסך העלות - תחזוקה עד
+ההחלפה, החלפה בערך נוכחי, סיכון תפעולי בהמתנה ותחזוקת הנכס החדש - מינימלי, וכל
+שנה עומדת בתקציב ובימי הצוותים. מודל העלות הוא הנוסחאות של מסך הנכס.
+
+הפתרון: רלקסציית לגרנז' - מחיר לכל דולר ולכל יום צוות בכל שנה, כך שכל נכס בוחר
+לבד את השנה הזולה לו (argmin על מטריצה נכסים × שנים), והמחירים מתעדכנים בצעדי
+תת-גרדיאנט. ערך הרלקסציה הוא חסם תחתון לעלות, והפער ממנו מדווח. תכנית אפשרית
+נבנית מהבחירות: בשנה חורגת נדחים הנכסים שהדחייה עולה להם הכי מעט, ושנה עם
+קיבולת פנויה מקדימה נכסים שההקדמה חוסכת להם.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from asset_lifecycle import (CATEGORIES, CATEGORY_PARAMS, DISCOUNT_RATE, REPLACEMENT_INFLATION,
+                             cumulative_maintenance, operational_risk, replacement_npv)
+
+PLANNING_YEARS = 10
+RISK_COST_SHARE = 0.5      # עלות כשל צפויה לשנה, כשיעור מעלות ההחלפה, בהסתברות כשל 1
+BUDGET_SHARE = 0.08        # תקציב שנתי ברירת מחדל - משווי ההחלפה של כל הצי
+CREW_DAYS_PER_YEAR = 220
+DEFAULT_CREWS = 60
+# ימי צוות להחלפת נכס בכל קטגוריה
+CREW_DAYS = {"מכונות ייצור": 5, "ציוד בקרה ומדידה": 2, "תשתיות": 15, "רובוטים וכלי שינוע": 4}
+
+
+class PortfolioPlan(NamedTuple):
+    year: np.ndarray          # שנת ההחלפה לכל נכס; years פירושו דחייה לסוף האופק
+    cost: np.ndarray          # עלות התכנית לכל נכס (ערך נוכחי)
+    total_cost: float
+    lower_bound: float        # חסם תחתון מרלקסציית לגרנז'
+    capex: np.ndarray         # הוצאה הונית לכל שנה (נומינלית)
+    crew_days: np.ndarray     # ימי צוות לכל שנה
+    iterations: int
+
+    @property
+    def gap(self):
+        """הפער היחסי בין התכנית לחסם התחתון - כמה לכל היותר אפשר עוד לחסוך"""
+        if self.total_cost <= 0:
+            return 0.0
+        return (self.total_cost - self.lower_bound) / self.total_cost
+
+
+def replacement_costs(fleet, lifecycle, years=PLANNING_YEARS):
+    """מטריצות נכסים × (years + 1): עלות כוללת לכל שנת החלפה, הוצאה הונית וימי צוות
+
+    עמודה t < years היא החלפה בתחילת שנה t; העמודה האחרונה היא דחייה לסוף האופק
+    (ההחלפה מחוץ לתקציב התכנית). כל אפשרות כוללת החלפה אחת, כך שהעלויות ברות השוואה.
+    """
+    categories = fleet["category"].cat.codes.to_numpy()
+    lifetime = np.array([CATEGORY_PARAMS[name]["base_lifetime"] for name in CATEGORIES], dtype=float)[categories]
+    maintenance_factor = np.array([CATEGORY_PARAMS[name]["maintenance_factor"] for name in CATEGORIES])[categories]
+    digital_age = lifecycle["digital_age"].to_numpy()
+    maintenance = lifecycle["maintenance_cost"].to_numpy(dtype=float)
+    replacement = lifecycle["replacement_cost"].to_numpy(dtype=float)
+    new_maintenance = lifecycle["purchase_cost"].to_numpy(dtype=float) * maintenance_factor  # גיל דיגיטלי 0
+
+    horizon = 12 * years
+    months = np.broadcast_to(12 * np.arange(years + 1), (len(fleet), years + 1))
+    discount = (1 + DISCOUNT_RATE) ** -np.arange(years + 1)
+
+    # סיכון תפעולי בכל שנת המתנה - הגיל הדיגיטלי ממשיך לעלות בקצב תנאי השימוש של הנכס
+    aging = digital_age[:, None] + np.arange(years) * fleet["age_factor"].to_numpy()[:, None]
+    risk = operational_risk(aging / lifetime[:, None] * 100) / 100 * RISK_COST_SHARE * replacement[:, None]
+    risk_until = np.concatenate([np.zeros((len(fleet), 1)), np.cumsum(risk * discount[:years], axis=1)], axis=1)
+
+    cost = (cumulative_maintenance(maintenance[:, None], months, horizon)
+            + replacement_npv(replacement[:, None], months)
+            + risk_until
+            + cumulative_maintenance(new_maintenance[:, None], horizon - months, horizon) * discount)
+    capex = replacement[:, None] * (1 + months[:, :years] * REPLACEMENT_INFLATION)
+    crew = np.array([CREW_DAYS[name] for name in CATEGORIES], dtype=float)[categories]
+    return cost, capex, crew
+
+
+def _loads(choice, capex, crew, years):
+    """הוצאה הונית וימי צוות לכל שנה לפי הבחירות"""
+    planned = choice < years
+    rows = np.flatnonzero(planned)
+    capex_load = np.bincount(choice[rows], capex[rows, choice[rows]], minlength=years)
+    crew_load = np.bincount(choice[rows], crew[rows], minlength=years)
+    return capex_load, crew_load
+
+
+def _repair(choice, cost, capex, crew, budget, crew_capacity):
+    """הופך בחירות לתכנית אפשרית: דחייה מהשנים החורגות, ואחריה הקדמה לשנים עם קיבולת פנויה"""
+    years = len(budget)
+    choice = choice.copy()
+    for t in range(years):
+        members = np.flatnonzero(choice == t)
+        if len(members) == 0:
+            continue
+        # האפשרות הזולה ביותר בשנה מאוחרת יותר, וכמה הדחייה אליה עולה
+        later = t + 1 + cost[members, t + 1:].argmin(axis=1)
+        regret = cost[members, later] - cost[members, t]
+        usage = capex[members, t] / budget[t] + crew[members] / crew_capacity[t]
+        order = np.argsort(-regret / usage, kind="stable")
+        fits = ((np.cumsum(capex[members[order], t]) <= budget[t])
+                & (np.cumsum(crew[members[order]]) <= crew_capacity[t]))
+        moved = order[~fits]
+        choice[members[moved]] = later[moved]
+
+    capex_load, crew_load = _loads(choice, capex, crew, years)
+    for t in range(years):
+        # נכסים שמתוכננים מאוחר יותר וזול להם יותר להחליף כבר בשנה t
+        candidates = np.flatnonzero(choice > t)
+        gain = cost[candidates, choice[candidates]] - cost[candidates, t]
+        candidates, gain = candidates[gain > 0], gain[gain > 0]
+        if len(candidates) == 0:
+            continue
+        usage = capex[candidates, t] / budget[t] + crew[candidates] / crew_capacity[t]
+        order = np.argsort(-gain / usage, kind="stable")
+        candidates = candidates[order]
+        fits = ((np.cumsum(capex[candidates, t]) <= budget[t] - capex_load[t])
+                & (np.cumsum(crew[candidates]) <= crew_capacity[t] - crew_load[t]))
+        pulled = candidates[fits]
+        previous = choice[pulled]
+        planned = previous < years
+        np.subtract.at(capex_load, previous[planned], capex[pulled[planned], previous[planned]])
+        np.subtract.at(crew_load, previous[planned], crew[pulled[planned]])
+        capex_load[t] += capex[pulled, t].sum()
+        crew_load[t] += crew[pulled].sum()
+        choice[pulled] = t
+    return choice
+
+
+def plan_replacements(fleet, lifecycle, years=PLANNING_YEARS, annual_budget=None, crews=DEFAULT_CREWS,
+                      iterations=150):
+    """מתכנן את שנת ההחלפה של כל נכס בצי תחת תקציב שנתי (סקלר או מערך לכל שנה) ומספר צוותים
+
+    מחזיר PortfolioPlan עם חסם תחתון מהרלקסציה - הפער ממנו מודד את איכות התכנית.
+    צי ריק מחזיר תכנית ריקה; בשנה בלי תקציב או בלי צוותים אף החלפה לא נכנסת.
+    """
+    if len(fleet) == 0:
+        empty = np.zeros(0)
+        return PortfolioPlan(np.zeros(0, dtype=np.int64), empty, 0.0, 0.0, np.zeros(years), np.zeros(years), 0)
+
+    cost, capex, crew = replacement_costs(fleet, lifecycle, years)
+    if annual_budget is None:
+        annual_budget = BUDGET_SHARE * capex[:, 0].sum()
+    # קיבולת של דולר אחד / יום צוות אחד במקום אפס - החלוקה מוגדרת, ואף נכס אמיתי לא נכנס בה
+    budget = np.maximum(np.broadcast_to(np.asarray(annual_budget, dtype=float), (years,)), 1.0)
+    crew_capacity = np.full(years, max(float(crews * CREW_DAYS_PER_YEAR), 1.0))
+
+    # מחירי לגרנז' לכל שנה, ביחידות של עלות לכל תקציב שנתי מלא / קיבולת צוותים מלאה
+    capex_price = np.zeros(years)
+    crew_price = np.zeros(years)
+    capex_share = capex / budget
+    crew_share = crew[:, None] / crew_capacity
+
+    best_choice = _repair(cost.argmin(axis=1), cost, capex, crew, budget, crew_capacity)
+    upper = cost[np.arange(len(cost)), best_choice].sum()
+    lower = -np.inf
+    step_scale, stalled = 2.0, 0
+    for iteration in range(iterations):
+        adjusted = cost.copy()
+        adjusted[:, :years] += capex_share * capex_price + crew_share * crew_price
+        choice = adjusted.argmin(axis=1)
+        bound = adjusted[np.arange(len(cost)), choice].sum() - capex_price.sum() - crew_price.sum()
+        if bound > lower:
+            lower, stalled = bound, 0
+        else:
+            stalled += 1
+            if stalled == 10:
+                step_scale, stalled = step_scale / 2, 0
+
+        capex_load, crew_load = _loads(choice, capex, crew, years)
+        capex_gradient = capex_load / budget - 1
+        crew_gradient = crew_load / crew_capacity - 1
+        if iteration % 10 == 9 or iteration == iterations - 1:
+            candidate = _repair(choice, cost, capex, crew, budget, crew_capacity)
+            total = cost[np.arange(len(cost)), candidate].sum()
+            if total < upper:
+                upper, best_choice = total, candidate
+        # צעד פוליאק: לכיוון תת-הגרדיאנט, בגודל יחסי לפער הנוכחי
+        norm = (capex_gradient ** 2).sum() + (crew_gradient ** 2).sum()
+        if norm == 0 or upper - bound <= 1e-9 * upper:
+            break
+        step = step_scale * (upper - bound) / norm
+        capex_price = np.maximum(0, capex_price + step * capex_gradient)
+        crew_price = np.maximum(0, crew_price + step * crew_gradient)
+
+    capex_load, crew_load = _loads(best_choice, capex, crew, years)
+    plan_cost = cost[np.arange(len(cost)), best_choice]
+    return PortfolioPlan(best_choice, plan_cost, float(plan_cost.sum()), float(min(lower, upper)),
+                         capex_load, crew_load, iteration + 1)
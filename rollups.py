@@ -0,0 +1,156 @@
+import numpy as np
+
+NS_PER_SECOND = 1_000_000_000
+
+# שכבות הצבירה: (שם, רזולוציה בשניות, נפח בדליים) - מהעדינה לגסה, כל רזולוציה כפולה של הקודמת
+ROLLUP_TIERS = (
+    ("1s", 1, 24 * 3600),           # יממה
+    ("1m", 60, 31 * 24 * 60),       # חודש
+    ("1h", 3600, 366 * 24),         # שנה
+)
+
+ROLLUP_DTYPE = np.dtype([
+    ("start", "<i8"),   # תחילת הדלי (ns)
+    ("min", "<f4"),
+    ("max", "<f4"),
+    ("sum", "<f8"),
+    ("count", "<i4"),
+    ("last", "<f4"),
+])
+
+
+def _bucket_bounds(buckets):
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    return starts, np.r_[starts[1:], len(buckets)]
+
+
+def aggregate(timestamps_ns, values, resolution_ns):
+    """צובר סדרה ממוינת לדליים ברזולוציה נתונה - מינימום, מקסימום, סכום, ספירה ואחרון לכל דלי"""
+    timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float32)
+    buckets = timestamps_ns // resolution_ns
+    starts, ends = _bucket_bounds(buckets)
+    rows = np.empty(len(starts), dtype=ROLLUP_DTYPE)
+    rows["start"] = buckets[starts] * resolution_ns
+    rows["min"] = np.minimum.reduceat(values, starts)
+    rows["max"] = np.maximum.reduceat(values, starts)
+    rows["sum"] = np.add.reduceat(values.astype(np.float64), starts)
+    rows["count"] = ends - starts
+    rows["last"] = values[ends - 1]
+    return rows
+
+
+def coarsen(rows, resolution_ns):
+    """צובר דליים עדינים לדליים גסים יותר (הרזולוציה חייבת להיות כפולה של העדינה)
+
+    כך הדגימות הגולמיות נסרקות פעם אחת בלבד - כל שכבה נבנית מהשכבה שמתחתיה.
+    """
+    buckets = rows["start"] // resolution_ns
+    starts, ends = _bucket_bounds(buckets)
+    coarse = np.empty(len(starts), dtype=ROLLUP_DTYPE)
+    coarse["start"] = buckets[starts] * resolution_ns
+    coarse["min"] = np.minimum.reduceat(rows["min"], starts)
+    coarse["max"] = np.maximum.reduceat(rows["max"], starts)
+    coarse["sum"] = np.add.reduceat(rows["sum"], starts)
+    coarse["count"] = np.add.reduceat(rows["count"], starts)
+    coarse["last"] = rows["last"][ends - 1]
+    return coarse
+
+
+class RollupTier:
+    """שכבת צבירה אחת: מאגר טבעתי משוכפל של דליים, כך שכל טווח זמן הוא view רציף"""
+
+    def __init__(self, name, resolution_seconds, capacity):
+        self.name = name
+        self.resolution_ns = int(resolution_seconds * NS_PER_SECOND)
+        self.capacity = int(capacity)
+        self._rows = np.zeros(2 * self.capacity, dtype=ROLLUP_DTYPE)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def rows(self):
+        """view של כל הדליים, מהישן לחדש"""
+        end = self._head + self.capacity
+        return self._rows[end - self._size:end]
+
+    def update(self, new):
+        """מוסיף דליים חדשים ברזולוציה של השכבה - דלי שממשיך את הדלי הפתוח האחרון ממוזג בו"""
+        if len(new) == 0:
+            return
+        last = (self._head - 1) % self.capacity
+        if self._size and new["start"][0] == self._rows["start"][last]:
+            # הדלי הראשון באצווה ממשיך את הדלי הפתוח האחרון - ממזגים אותו בשני העותקים
+            positions = [last, last + self.capacity]
+            rows = self._rows
+            rows["min"][positions] = np.minimum(rows["min"][positions], new["min"][0])
+            rows["max"][positions] = np.maximum(rows["max"][positions], new["max"][0])
+            rows["sum"][positions] += new["sum"][0]
+            rows["count"][positions] += new["count"][0]
+            rows["last"][positions] = new["last"][0]
+            new = new[1:]
+        self._extend(new)
+
+    def _extend(self, rows):
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        if n == 0:
+            return
+        first = min(n, self.capacity - self._head)
+        for offset in (0, self.capacity):
+            start = self._head + offset
+            self._rows[start:start + first] = rows[:first]
+            self._rows[offset:offset + n - first] = rows[first:]
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def covers(self, start_ns):
+        """האם השכבה מחזיקה את כל הדליים מ-start_ns (לא נדרסו דליים ישנים יותר)"""
+        return self._size < self.capacity or self.rows()["start"][0] <= start_ns
+
+    def query(self, start_ns, end_ns):
+        """view של הדליים שמתחילים בטווח [start_ns, end_ns)"""
+        rows = self.rows()
+        first, last = np.searchsorted(rows["start"], [start_ns, end_ns], side="left")
+        return rows[first:last]
+
+
+class RollupStore:
+    """שכבות צבירה (1s/1m/1h) לכל חיישן, מתעדכנות בכל כתיבה של דגימות"""
+
+    def __init__(self, sensor_names, tiers=ROLLUP_TIERS):
+        self.tiers = {name: [RollupTier(*tier) for tier in tiers] for name in sensor_names}
+
+    def update(self, sensor, timestamps_ns, values):
+        """מעדכן את כל השכבות של חיישן באצווה ממוינת של דגימות חדשות"""
+        if len(timestamps_ns) == 0:
+            return
+        rows = None
+        for tier in self.tiers[sensor]:
+            if rows is None:
+                rows = aggregate(timestamps_ns, values, tier.resolution_ns)
+            else:
+                rows = coarsen(rows, tier.resolution_ns)
+            tier.update(rows)
+
+    def query(self, sensor, start_ns, end_ns, min_points):
+        """בוחר את השכבה הגסה ביותר שעדיין נותנת לפחות min_points דליים בטווח
+
+        מחזיר (שם השכבה, view של הדליים), או (None, None) כשאף שכבה אינה מספיקה -
+        אז הדגימות הגולמיות הן הרזולוציה המתאימה.
+        """
+        for tier in reversed(self.tiers[sensor]):
+            if not tier.covers(start_ns):
+                # שכבה עדינה יותר מחזיקה טווח קצר עוד יותר
+                break
+            rows = tier.query(start_ns, end_ns)
+            if len(rows) >= min_points:
+                return tier.name, rows
+        return None, None
+
+
+def rollup_series(rows):
+    """ממוצע לכל דלי (הקו בגרף) ומקסימום לכל דלי (לסימון חריגות שבתוך הדלי)"""
+    return rows["sum"] / rows["count"], rows["max"]
@@ -0,0 +1,150 @@
+"""הערכת אורך חיים שימושי שנותר (RUL) מהיסטוריית הביצועים של כל נכס
+
+לכל נכס מותאמים שלושה מודלי התדרדרות, כל אחד כקו ישר במרחב שמיישר אותו:
+    ליניארי      y = c0 + c1 t
+    מעריכי      ln y = c0 + c1 t
+    ויבול        ln(-ln(y / 100)) = c0 + c1 ln(גיל)   (y = 100 exp(-(גיל / η)^β))
+כך ההתאמה היא ריבועים פחותים סגורים (משוואות נורמליות 2×2) על אצווה של נכסים
+בבת אחת. לכל נכס נבחר המודל עם שגיאת ההתאמה הקטנה ביותר, ואי-הוודאות מוערכת
+ב-bootstrap של השאריות: ההיסטוריה נדגמת מחדש, המודל מותאם מחדש לכל הדגימות
+יחד, ומהתחזיות נלקחים אחוזונים - רצועת ביצועים וחודש חציית סף ההחלפה.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from asset_lifecycle import FORECAST_MONTHS, REPLACEMENT_THRESHOLD, months_to_threshold
+
+MODELS = ("linear", "exponential", "weibull")
+MODEL_LABELS = {"linear": "ליניארי", "exponential": "מעריכי", "weibull": "ויבול"}
+RUL_PERCENTILES = (10, 50, 90)
+BOOTSTRAP_SAMPLES = 200
+BOOTSTRAP_CHUNK = 250_000  # נקודות היסטוריה × דגימות בכל נתח - חוסם את הזיכרון בהתאמת צי שלם
+
+
+class RULEstimate(NamedTuple):
+    model: np.ndarray      # אינדקס המודל שנבחר לכל נכס (ב-MODELS)
+    forecast: np.ndarray   # תחזית המודל שנבחר, נכסים × אופק
+    band: np.ndarray       # אחוזוני הביצועים: RUL_PERCENTILES × נכסים × אופק
+    months: np.ndarray     # אחוזוני חודש חציית הסף: RUL_PERCENTILES × נכסים (אורך האופק - לא חוצה בו)
+
+
+def _fit_lines(x, z, w):
+    """ריבועים פחותים משוקללים z ≈ c0 + c1 x לאורך הציר האחרון, לכל האצווה יחד"""
+    sw = w.sum(axis=-1)
+    sx = (w * x).sum(axis=-1)
+    sz = (w * z).sum(axis=-1)
+    sxx = (w * x * x).sum(axis=-1)
+    sxz = (w * x * z).sum(axis=-1)
+    det = sw * sxx - sx ** 2
+    c1 = np.where(det > 0, (sw * sxz - sx * sz) / np.where(det > 0, det, 1), 0)
+    c0 = (sz - c1 * sx) / np.maximum(sw, 1e-12)
+    return c0, c1
+
+
+def _linear_line(y, t, age):
+    return t, y, 1.0
+
+
+def _exponential_line(y, t, age):
+    return t, np.log(y), 1.0
+
+
+def _weibull_line(y, t, age):
+    """ln(-ln(y / 100)) מול ln(גיל); לנקודות שלפני תחילת חיי הנכס משקל 0"""
+    valid = age > 0
+    return np.log(np.where(valid, age, 1)), np.log(-np.log(y / 100)), valid.astype(float)
+
+
+def _linear_curve(c0, c1, t, age):
+    return c0 + c1 * t
+
+
+def _exponential_curve(c0, c1, t, age):
+    return np.exp(np.minimum(c0 + c1 * t, 50))
+
+
+def _weibull_curve(c0, c1, t, age):
+    return 100 * np.exp(-np.exp(np.minimum(c0 + c1 * np.log(np.maximum(age, 1e-3)), 50)))
+
+
+# לכל מודל (לפי הסדר ב-MODELS): ההמרה לקו ישר, והעקומה ממקדמי הקו
+_MODELS = ((_linear_line, _linear_curve), (_exponential_line, _exponential_curve), (_weibull_line, _weibull_curve))
+
+
+def _fit(model, y, t, age):
+    """מקדמי מודל אחד לכל שורה של y (..., נקודות)"""
+    x, z, w = _MODELS[model][0](np.clip(y, 1, 99.5), t, age)
+    x, z, w = np.broadcast_arrays(x, z, w)
+    return _fit_lines(x, z, w)
+
+
+def _curve(model, coefficients, t, age):
+    """ערכי מודל אחד בזמנים t (גיל בחודשים age), חסומים ל-0..100"""
+    c0, c1 = (c[..., None] for c in coefficients)
+    return np.clip(_MODELS[model][1](c0, c1, t, age), 0, 100)
+
+
+def _select(coefficients, y, t, age):
+    """אינדקס המודל עם סכום ריבועי השגיאה הקטן ביותר על הנקודות y"""
+    sse = [((_curve(model, c, t, age) - y) ** 2).sum(axis=-1) for model, c in enumerate(coefficients)]
+    return np.argmin(sse, axis=0)
+
+
+def _forecast(coefficients, chosen, future, age):
+    """תחזית המודל שנבחר לכל שורה - כל מודל מחושב רק על השורות שבחרו בו"""
+    curves = np.empty((*chosen.shape, len(future)))
+    age = np.broadcast_to(age, chosen.shape)
+    for model, (c0, c1) in enumerate(coefficients):
+        rows = chosen == model
+        curves[rows] = _curve(model, (c0[rows], c1[rows]), future, age[rows, None] + future)
+    return curves
+
+
+def fit_models(history, age_months):
+    """מתאים את שלושת המודלים להיסטוריה (נכסים × חודשים, האחרון הוא היום)
+
+    age_months הוא הגיל (בחודשים) של כל נכס היום. מחזיר (מקדמים לכל מודל, אינדקס
+    המודל הטוב לכל נכס).
+    """
+    history = np.asarray(history, dtype=float)
+    t = np.arange(1 - history.shape[-1], 1, dtype=float)
+    age = np.asarray(age_months, dtype=float)[..., None] + t
+    coefficients = [_fit(model, history, t, age) for model in range(len(MODELS))]
+    return coefficients, _select(coefficients, history, t, age)
+
+
+def estimate_rul(history, age_months, horizon=FORECAST_MONTHS, threshold=REPLACEMENT_THRESHOLD,
+                 n_boot=BOOTSTRAP_SAMPLES, percentiles=RUL_PERCENTILES, seed=0):
+    """מעריך RUL לכל נכס: המודל הטוב, תחזיתו, ורצועות bootstrap לביצועים ולחודש חציית הסף
+
+    ה-bootstrap חוזר על כל התהליך - התאמת שלושת המודלים ובחירה ביניהם - בכל דגימה,
+    כך שהרצועות כוללות גם את אי-הוודאות בבחירת המודל ולא רק בפרמטרים שלו.
+    """
+    history = np.atleast_2d(np.asarray(history, dtype=float))
+    age_months = np.atleast_1d(np.asarray(age_months, dtype=float))
+    n, m = history.shape
+    rng = np.random.default_rng(seed)
+    t = np.arange(1 - m, 1, dtype=float)
+    future = np.arange(1, horizon + 1, dtype=float)
+    coefficients, best = fit_models(history, age_months)
+    fitted = _forecast(coefficients, best, t, age_months)
+    forecast = _forecast(coefficients, best, future, age_months)
+    # שאריות מוגדלות בתיקון דרגות החופש (שני מקדמים), כדי שלא יצמצמו את הפיזור
+    residuals = (history - fitted) * np.sqrt(m / (m - 2))
+
+    band = np.empty((len(percentiles), n, horizon))
+    months = np.empty((len(percentiles), n))
+    chunk = max(1, BOOTSTRAP_CHUNK // (m * n_boot))
+    for start in range(0, n, chunk):
+        rows = slice(start, min(start + chunk, n))
+        age = age_months[rows, None]
+        picks = rng.integers(0, m, (rows.stop - rows.start, n_boot, m))
+        samples = fitted[rows, None, :] + np.take_along_axis(residuals[rows, None, :], picks, axis=-1)
+        sample_age = age[..., None] + t
+        sample_coefficients = [_fit(model, samples, t, sample_age) for model in range(len(MODELS))]
+        chosen = _select(sample_coefficients, samples, t, sample_age)
+        curves = _forecast(sample_coefficients, chosen, future, age)   # נכסים × דגימות × אופק
+        band[:, rows] = np.percentile(curves, percentiles, axis=1)
+        months[:, rows] = np.percentile(months_to_threshold(curves, threshold), percentiles, axis=1)
+    return RULEstimate(best, forecast, band, months)
@@ -0,0 +1,402 @@
+"""מנוע ההשפעות של סימולטור תרחישי הקיצון
+
+נוסחאות ההשפעה של כל תרחיש מחושבות על מערכים, כך שאותו קוד משמש גם לנקודה
+בודדת וגם להרצת מונטה קרלו: N הגרלות של כל פרמטר ושל כל גורם אי-ודאות,
+מחולקות לנתחים קבועים עם זרעים נפרדים ומפוזרות על פני ProcessPoolExecutor.
+התוצאה - אחוזונים (P5/P50/P95) לתפוקה, לזמן ההשבתה, לעלות ולהשפעות על התהליכים -
+זהה לכל מספר תהליכים עבור אותו זרע.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SCENARIO_TYPES = ["כשל חיישנים", "הפסקת חשמל/מים", "תקלת ציוד קריטי", "שרשרת תגובה", "תנאי קיצון סביבתיים"]
+PROCESSES = ['קבלת חומרי גלם', 'עיבוד ראשוני', 'הרכבה', 'בקרת איכות', 'אריזה', 'לוגיסטיקה']
+SYSTEMS = ['מערכת חשמל', 'הידראוליקה', 'בקרת איכות', 'ניטור', 'לוגיסטיקה', 'תקשורת']
+
+DOWNTIME_COST_PER_HOUR = 5000  # $ לשעת השבתה
+
+# מקדמי ההשפעה של הבחירות הקטגוריות בכל תרחיש
+REDUNDANCY_FACTOR = {"נמוכה": 0.3, "בינונית": 0.6, "גבוהה": 0.9}
+PATTERN_MULTIPLIER = {"אקראי": 1.0, "חיישנים קריטיים": 1.8, "אזור ספציפי": 1.5}
+UTILITY_IMPACT = {"חשמל": 1.0, "מים": 0.8, "קיטור": 0.7, "אוויר דחוס": 0.6}
+BACKUP_REDUCTION = 0.2  # לכל מערכת גיבוי פעילה
+EQUIPMENT_IMPACT = {
+    "מכונה M1 (תחילת קו ייצור)": 0.9,
+    "מכונה M4 (אמצע קו ייצור)": 0.7,
+    "מכונה M7 (סוף קו ייצור)": 0.5,
+    "מערכת בקרה מרכזית": 0.8
+}
+FAILURE_IMPACT = {"כשל מלא": 1.0, "ירידה בביצועים (50%)": 0.5, "אי-יציבות": 0.7}
+INITIAL_POINT_IMPACT = {"חיישן לחץ M2": 0.4, "משאבה ראשית": 0.8, "חיישן טמפרטורה M5": 0.5, "ספק מתח 24V": 0.7}
+SAFETY_FACTOR = {"מינימלית": 1.3, "סטנדרטית": 1.0, "מתקדמת": 0.6}
+CONDITION_IMPACT = {"טמפרטורה גבוהה": 0.6, "לחות גבוהה": 0.5, "קור קיצוני": 0.7, "רעידת אדמה": 0.9}
+REPAIR_COST = 20000  # $ לתיקון, כפול מקדמי הציוד וסוג התקלה
+
+# תקלת ציוד קריטי מכוילת לסימולציית הקו: תפוקה (%) וזמן השבתה (דקות) ממוצעים של
+# SIMULATED_REPLICATIONS משמרות מסומלצות בכל זמן תגובה (production_sim.response_table, זרע 0),
+# ובין הנקודות אינטרפולציה לינארית. כל שינוי בפרמטרי הקו מחייב הפקה מחדש של הטבלה.
+SIMULATED_REPLICATIONS = 200
+SIMULATED_RESPONSE_TIMES = (5, 15, 30, 60, 90, 120)
+SIMULATED_PRODUCTIVITY = {
+    "מכונה M1 (תחילת קו ייצור)": {
+        "כשל מלא": (91.8, 89.8, 86.9, 81.1, 75.3, 69.8),
+        "ירידה בביצועים (50%)": (98.0, 97.3, 96.3, 94.1, 91.9, 89.7),
+        "אי-יציבות": (99.8, 99.7, 99.7, 99.5, 99.2, 99.0),
+    },
+    "מכונה M4 (אמצע קו ייצור)": {
+        "כשל מלא": (89.4, 87.4, 84.5, 78.5, 72.6, 66.9),
+        "ירידה בביצועים (50%)": (94.8, 93.8, 92.4, 89.5, 86.7, 84.0),
+        "אי-יציבות": (98.3, 98.1, 97.6, 96.5, 95.5, 94.5),
+    },
+    "מכונה M7 (סוף קו ייצור)": {
+        "כשל מלא": (93.1, 91.1, 88.3, 82.6, 76.8, 71.3),
+        "ירידה בביצועים (50%)": (99.0, 98.5, 97.8, 95.7, 93.7, 91.8),
+        "אי-יציבות": (99.9, 99.9, 99.9, 99.8, 99.7, 99.5),
+    },
+    "מערכת בקרה מרכזית": {
+        "כשל מלא": (89.3, 87.2, 84.2, 78.2, 72.1, 66.4),
+        "ירידה בביצועים (50%)": (94.7, 93.7, 92.3, 89.3, 86.4, 83.6),
+        "אי-יציבות": (97.1, 96.5, 95.3, 93.6, 91.7, 90.1),
+    },
+}
+SIMULATED_DOWNTIME = {
+    "מכונה M1 (תחילת קו ייצור)": {
+        "כשל מלא": (34.7, 42.2, 52.0, 70.1, 87.1, 102.7),
+        "ירידה בביצועים (50%)": (8.4, 10.9, 14.8, 22.3, 29.1, 35.7),
+        "אי-יציבות": (0.9, 1.2, 1.3, 1.9, 2.6, 3.5),
+    },
+    "מכונה M4 (אמצע קו ייצור)": {
+        "כשל מלא": (44.8, 52.0, 61.7, 79.5, 96.1, 111.6),
+        "ירידה בביצועים (50%)": (22.0, 25.4, 30.1, 38.9, 47.1, 54.7),
+        "אי-יציבות": (7.0, 8.1, 9.7, 13.1, 15.8, 18.7),
+    },
+    "מכונה M7 (סוף קו ייצור)": {
+        "כשל מלא": (29.2, 36.7, 46.5, 64.9, 82.0, 97.8),
+        "ירידה בביצועים (50%)": (4.1, 5.9, 8.8, 15.9, 22.4, 28.2),
+        "אי-יציבות": (0.3, 0.5, 0.6, 0.8, 1.1, 1.6),
+    },
+    "מערכת בקרה מרכזית": {
+        "כשל מלא": (45.2, 52.6, 62.4, 80.4, 97.2, 112.8),
+        "ירידה בביצועים (50%)": (22.3, 25.8, 30.7, 39.5, 47.9, 55.4),
+        "אי-יציבות": (12.2, 14.5, 18.3, 23.5, 29.1, 33.3),
+    },
+}
+
+# השפעה בסיסית (%) וזמן התאוששות (שעות) לכל תהליך, ופגיעות בסיסית לכל מערכת
+PROCESS_BASE_IMPACTS = {
+    "כשל חיישנים": ([20, 60, 50, 80, 30, 10], [1, 4, 3, 6, 2, 1]),
+    "הפסקת חשמל/מים": ([40, 90, 80, 60, 70, 50], [2, 8, 6, 3, 4, 3]),
+    "תקלת ציוד קריטי": ([30, 80, 90, 50, 40, 20], [2, 6, 8, 4, 3, 1]),
+    "שרשרת תגובה": ([50, 70, 80, 90, 60, 40], [4, 6, 8, 10, 5, 3]),
+    "תנאי קיצון סביבתיים": ([60, 50, 70, 40, 60, 30], [6, 5, 7, 3, 6, 4]),
+}
+BASE_VULNERABILITIES = {
+    "כשל חיישנים": [30, 40, 90, 95, 20, 50],
+    "הפסקת חשמל/מים": [95, 70, 60, 80, 50, 85],
+    "תקלת ציוד קריטי": [60, 80, 70, 50, 40, 30],
+    "שרשרת תגובה": [70, 60, 50, 75, 65, 80],
+    "תנאי קיצון סביבתיים": [50, 60, 40, 65, 55, 75],
+}
+
+# טווחי הגורמים האקראיים של ההשפעה על התהליכים ושל הפגיעות
+IMPACT_MODIFIER_RANGE = (0.8, 1.2)
+RECOVERY_MODIFIER_RANGE = (0.9, 1.1)
+VULNERABILITY_MODIFIER_RANGE = (0.9, 1.1)
+
+# אי-ודאות בפרמטרים המספריים: התפלגות משולשת סביב הערך שנבחר, בתחום המחוון
+PARAMETER_SPREAD = 0.2
+PARAMETER_RANGES = {  # פרמטר: (מינימום, מקסימום, שלם)
+    "כשל חיישנים": {"sensor_failure": (10, 90, False)},
+    "הפסקת חשמל/מים": {"duration": (5, 120, False)},
+    "תקלת ציוד קריטי": {"response_time": (5, 120, False)},
+    "שרשרת תגובה": {"cascade_depth": (1, 5, True)},
+    "תנאי קיצון סביבתיים": {"intensity": (70, 100, False), "duration": (1, 48, False)},
+}
+# אי-ודאות במקדמי ההשפעה הקטגוריים (ציוד, תשתית, נקודת כשל...) - פקטור אחיד סביב 1
+COEFFICIENT_SPREAD = 0.1
+
+# כל ערכי הפרמטרים של כל תרחיש (כמו באפשרויות הממשק) - צירי הרשתות לניתוח רגישות.
+# מערכות הגיבוי מיוצגות במספרן, כי רק הוא משפיע על החישוב.
+SCENARIO_AXES = {
+    "כשל חיישנים": {
+        "sensor_failure": np.arange(10, 91),
+        "pattern": list(PATTERN_MULTIPLIER),
+        "redundancy": list(REDUNDANCY_FACTOR),
+    },
+    "הפסקת חשמל/מים": {
+        "utility": list(UTILITY_IMPACT),
+        "duration": np.arange(5, 121),
+        "backup": np.arange(5),
+    },
+    "תקלת ציוד קריטי": {
+        "equipment": list(EQUIPMENT_IMPACT),
+        "failure_type": list(FAILURE_IMPACT),
+        "response_time": np.arange(5, 121),
+    },
+    "שרשרת תגובה": {
+        "initial_point": list(INITIAL_POINT_IMPACT),
+        "cascade_depth": np.arange(1, 6),
+        "safety": list(SAFETY_FACTOR),
+    },
+    "תנאי קיצון סביבתיים": {
+        "condition": list(CONDITION_IMPACT),
+        "intensity": np.arange(70, 101),
+        "duration": np.arange(1, 49),
+    },
+}
+PARAMETER_LABELS = {
+    "כשל חיישנים": {"sensor_failure": "אחוז חיישנים כושלים", "pattern": "דפוס כשל",
+                    "redundancy": "רמת יתירות במערכת"},
+    "הפסקת חשמל/מים": {"utility": "סוג תשתית", "duration": "משך ההפסקה (דקות)",
+                       "backup": "מספר מערכות גיבוי פעילות"},
+    "תקלת ציוד קריטי": {"equipment": "ציוד קריטי", "failure_type": "סוג תקלה",
+                        "response_time": "זמן תגובה למכונאים (דקות)"},
+    "שרשרת תגובה": {"initial_point": "נקודת כשל התחלתית", "cascade_depth": "עומק שרשרת התגובה",
+                    "safety": "רמת מערכות בטיחות"},
+    "תנאי קיצון סביבתיים": {"condition": "תנאי קיצון", "intensity": "עוצמה (%)", "duration": "משך החשיפה (שעות)"},
+}
+# זוג הצירים של משטח הרגישות המוצג לכל תרחיש (ציר x, ציר y)
+SURFACE_AXES = {
+    "כשל חיישנים": ("sensor_failure", "redundancy"),
+    "הפסקת חשמל/מים": ("duration", "backup"),
+    "תקלת ציוד קריטי": ("response_time", "failure_type"),
+    "שרשרת תגובה": ("cascade_depth", "safety"),
+    "תנאי קיצון סביבתיים": ("intensity", "duration"),
+}
+
+SWEEP_METRICS = ("productivity", "downtime", "cost")
+
+PERCENTILES = (5, 50, 95)
+MC_CHUNK_DRAWS = 65_536  # הגרלות לכל משימה - קובע את הזרעים, ולכן לא תלוי במספר התהליכים
+
+
+def _coefficient(table, labels):
+    """מקדם ההשפעה של בחירה קטגורית - לתווית בודדת, או מערך מקדמים בצורת מערך התוויות"""
+    if isinstance(labels, str):
+        return table[labels]
+    labels = np.asarray(labels)
+    keys, inverse = np.unique(labels, return_inverse=True)
+    return np.array([table[key] for key in keys])[inverse].reshape(labels.shape)
+
+
+def _simulated_response(equipment, failure_type, response_time):
+    """(תפוקה %, זמן השבתה) מטבלת הכיול - אינטרפולציה לפי זמן התגובה, בשידור כמו שאר הגרעין"""
+    knots = np.arange(len(SIMULATED_RESPONSE_TIMES))
+    position = np.interp(response_time, SIMULATED_RESPONSE_TIMES, knots)
+    low = np.minimum(position.astype(int), knots[-1] - 1)
+    weight = position - low
+    e = _coefficient({name: i for i, name in enumerate(EQUIPMENT_IMPACT)}, equipment)
+    f = _coefficient({name: i for i, name in enumerate(FAILURE_IMPACT)}, failure_type)
+    results = []
+    for table in (SIMULATED_PRODUCTIVITY, SIMULATED_DOWNTIME):
+        values = np.array([[table[name][kind] for kind in FAILURE_IMPACT] for name in EQUIPMENT_IMPACT])
+        results.append(values[e, f, low] * (1 - weight) + values[e, f, low + 1] * weight)
+    return results
+
+
+def _backup_count(backup):
+    """מספר מערכות הגיבוי: אורך רשימת המערכות שנבחרו, או מערך של מספרים"""
+    return len(backup) if isinstance(backup, (list, tuple)) else np.asarray(backup)
+
+
+def scenario_kernel(scenario_type, params, coefficient_scale=1.0, integer=False):
+    """השפעות התרחיש כמערכים: (תפוקה %, זמן השבתה בדקות, עלות $)
+
+    כל פרמטר יכול להיות מערך - מספרי, או מערך תוויות לבחירות הקטגוריות - והמערכים
+    משודרים זה מול זה, כך שרשת שלמה של תרחישים מוערכת בקריאה אחת. coefficient_scale
+    מכפיל את מקדם ההשפעה של הבחירה הקטגורית. integer=True מעגל כלפי אפס באותם שלבים
+    כמו החישוב הסקלרי (int), ולכן נותן לקלט בודד תוצאה זהה לו.
+    """
+    trunc = np.trunc if integer else (lambda x: x)
+
+    if scenario_type == "כשל חיישנים":
+        base_impact = np.asarray(params["sensor_failure"]) / 100
+        # יתירות מקטינה את ההשפעה; כשל בחיישנים קריטיים מגדיל אותה
+        mitigated_impact = base_impact * (1 - _coefficient(REDUNDANCY_FACTOR, params["redundancy"]))
+        pattern_multiplier = _coefficient(PATTERN_MULTIPLIER, params["pattern"]) * coefficient_scale
+        productivity = 100 - trunc(mitigated_impact * pattern_multiplier * 100)
+        downtime = trunc(mitigated_impact * pattern_multiplier * 180)
+        cost = trunc(downtime * DOWNTIME_COST_PER_HOUR / 60)
+
+    elif scenario_type == "הפסקת חשמל/מים":
+        duration = np.asarray(params["duration"])
+        base_impact = _coefficient(UTILITY_IMPACT, params["utility"]) * coefficient_scale * duration / 120
+        # כל מערכת גיבוי מקטינה את ההשפעה
+        backup_reduction = _backup_count(params["backup"]) * BACKUP_REDUCTION
+        productivity = 100 - trunc(np.minimum(0.95, base_impact - backup_reduction) * 100)
+        downtime = np.where(backup_reduction < base_impact, duration, trunc(duration * 0.2))
+        cost = trunc(downtime * DOWNTIME_COST_PER_HOUR / 60)
+
+    elif scenario_type == "תקלת ציוד קריטי":
+        # תפוקה והשבתה מטבלת סימולציית הקו; אי-הוודאות במקדמים מגדילה או מקטינה את ההפסד
+        simulated_productivity, simulated_downtime = _simulated_response(
+            params["equipment"], params["failure_type"], np.asarray(params["response_time"], dtype=float))
+        productivity = 100 - trunc((100 - simulated_productivity) * coefficient_scale)
+        downtime = trunc(simulated_downtime * coefficient_scale)
+        repair_impact = (_coefficient(EQUIPMENT_IMPACT, params["equipment"])
+                         * _coefficient(FAILURE_IMPACT, params["failure_type"]) * coefficient_scale)
+        cost = trunc(downtime * DOWNTIME_COST_PER_HOUR / 60 + repair_impact * REPAIR_COST)  # השבתה + תיקון
+
+    elif scenario_type == "שרשרת תגובה":
+        cascade_depth = np.asarray(params["cascade_depth"])
+        base_impact = (_coefficient(INITIAL_POINT_IMPACT, params["initial_point"]) * coefficient_scale
+                       * (1 + cascade_depth * 0.2))
+        mitigated_impact = base_impact * _coefficient(SAFETY_FACTOR, params["safety"])
+        productivity = 100 - trunc(np.minimum(0.95, mitigated_impact) * 100)
+        downtime = trunc(mitigated_impact * cascade_depth * 60)
+        cost = trunc(downtime * DOWNTIME_COST_PER_HOUR / 60 + cascade_depth * 15000)  # השבתה + נזק לציוד
+
+    else:  # תנאי קיצון סביבתיים
+        intensity_factor = np.asarray(params["intensity"]) / 100 * 1.5
+        duration_factor = np.asarray(params["duration"]) / 24
+        base_impact = (_coefficient(CONDITION_IMPACT, params["condition"]) * coefficient_scale
+                       * intensity_factor * duration_factor)
+        productivity = 100 - trunc(np.minimum(0.95, base_impact) * 100)
+        downtime = trunc(base_impact * 240)  # עד 4 שעות השבתה
+        cost = trunc(downtime * DOWNTIME_COST_PER_HOUR / 60 + base_impact * 50000)  # השבתה + נזק תשתיתי
+
+    return productivity, downtime, cost
+
+
+def parameter_grid(scenario_type, params, axes):
+    """params שבו כל פרמטר ב-axes מוחלף בכל ערכיו (SCENARIO_AXES) - הציר ה-i בממד ה-i
+
+    התוצאה מועברת ל-scenario_kernel ומוערכת כרשת מלאה בשידור, ללא לולאה על צירופים.
+    """
+    grid = dict(params)
+    for i, name in enumerate(axes):
+        values = np.asarray(SCENARIO_AXES[scenario_type][name])
+        shape = [1] * len(axes)
+        shape[i] = len(values)
+        grid[name] = values.reshape(shape)
+    return grid
+
+
+def evaluate_grid(scenario_type, params, axes, integer=True):
+    """(תפוקה, זמן השבתה, עלות) על כל צירופי הצירים - מערכים בצורה (אורך ציר לכל ציר)"""
+    shape = tuple(len(SCENARIO_AXES[scenario_type][name]) for name in axes)
+    results = scenario_kernel(scenario_type, parameter_grid(scenario_type, params, axes), integer=integer)
+    return tuple(np.broadcast_to(result, shape) for result in results)
+
+
+def parameter_sweep(scenario_type):
+    """כל צירופי הפרמטרים של התרחיש בקריאה אחת לגרעין
+
+    מחזיר {"axes": שמות הפרמטרים, מדד: טנזור עם ממד לכל פרמטר} - לאחר מכן כל שינוי
+    בפרמטרים הוא חיפוש בטנזור (sweep_index) ולא חישוב מחדש.
+    """
+    axes = list(SCENARIO_AXES[scenario_type])
+    results = evaluate_grid(scenario_type, {}, axes)
+    sweep = {"axes": axes}
+    for metric, result in zip(SWEEP_METRICS, results):
+        sweep[metric] = np.ascontiguousarray(result)
+    return sweep
+
+
+def sweep_index(scenario_type, params):
+    """מיקום הצירוף params בטנזור הסריקה - אינדקס אחד לכל ציר"""
+    index = []
+    for name, values in SCENARIO_AXES[scenario_type].items():
+        value = _backup_count(params[name]) if name == "backup" else params[name]
+        index.append(int(np.flatnonzero(np.asarray(values) == value)[0]))
+    return tuple(index)
+
+
+def tornado_ranges(tensor, index):
+    """לכל פרמטר: (מינימום, מקסימום) של המדד כשרק הוא משתנה והשאר קבועים בצירוף index"""
+    ranges = []
+    for axis in range(tensor.ndim):
+        line = tensor[index[:axis] + (slice(None),) + index[axis + 1:]]
+        ranges.append((line.min(), line.max()))
+    return ranges
+
+
+def sweep_slice(tensor, index, y_axis, x_axis):
+    """חתך דו-ממדי (y × x) של הטנזור, כשכל שאר הצירים קבועים בצירוף index"""
+    selector = list(index)
+    selector[y_axis] = selector[x_axis] = slice(None)
+    plane = tensor[tuple(selector)]
+    return plane if y_axis < x_axis else plane.T
+
+
+def process_kernel(scenario_type, impact_modifier, recovery_modifier):
+    """השפעה (%) וזמן התאוששות (שעות) לכל תהליך - מטריצות (הגרלות × תהליכים), ללא עיגול"""
+    base_impacts, base_recovery = PROCESS_BASE_IMPACTS[scenario_type]
+    impacts = np.minimum(100, np.outer(impact_modifier, base_impacts))
+    recovery = np.maximum(1, np.outer(recovery_modifier, base_recovery))
+    return impacts, recovery
+
+
+def vulnerability_kernel(scenario_type, vulnerability_modifier):
+    """רמת פגיעות (0-100) לכל מערכת - מטריצה (הגרלות × מערכות), ללא עיגול"""
+    return np.minimum(100, np.outer(vulnerability_modifier, BASE_VULNERABILITIES[scenario_type]))
+
+
+def draw_parameters(scenario_type, params, n, rng):
+    """n הגרלות של הפרמטרים המספריים של התרחיש סביב הערכים שנבחרו"""
+    draws = dict(params)
+    for name, (low, high, integer) in PARAMETER_RANGES[scenario_type].items():
+        value = float(params[name])
+        spread = PARAMETER_SPREAD * value
+        values = np.clip(rng.triangular(value - spread, value, value + spread, n), low, high)
+        draws[name] = np.rint(values) if integer else values
+    return draws
+
+
+def simulate_chunk(scenario_type, params, n, seed):
+    """נתח הגרלות אחד: כל הפרמטרים וגורמי אי-הוודאות מוגרלים יחד ומוערכים כמערכים
+
+    מחזיר מילון של מערכי float32 באורך n - המדדים, וגורמי ההשפעה על התהליכים ועל
+    המערכות (ההשפעות עצמן מחושבות מהאחוזונים שלהם, ראו monte_carlo).
+    """
+    rng = np.random.default_rng(seed)
+    draws = draw_parameters(scenario_type, params, n, rng)
+    coefficient_scale = rng.uniform(1 - COEFFICIENT_SPREAD, 1 + COEFFICIENT_SPREAD, n)
+    productivity, downtime, cost = scenario_kernel(scenario_type, draws, coefficient_scale)
+    return {
+        "productivity": productivity.astype(np.float32),
+        "downtime": downtime.astype(np.float32),
+        "cost": cost.astype(np.float32),
+        "impact_modifier": rng.uniform(*IMPACT_MODIFIER_RANGE, n).astype(np.float32),
+        "recovery_modifier": rng.uniform(*RECOVERY_MODIFIER_RANGE, n).astype(np.float32),
+        "vulnerability_modifier": rng.uniform(*VULNERABILITY_MODIFIER_RANGE, n).astype(np.float32),
+    }
+
+
+def monte_carlo(scenario_type, params, n_draws=100_000, seed=0, workers=None, chunk_draws=MC_CHUNK_DRAWS):
+    """מריץ n_draws הגרלות של התרחיש ומחזיר אחוזונים לכל מדד
+
+    ההגרלות מחולקות לנתחים בגודל קבוע, ולכל נתח זרע משלו (SeedSequence.spawn) - כך
+    התוצאה תלויה רק ב-seed ולא במספר התהליכים. workers=1 מריץ בתהליך הנוכחי;
+    None משתמש בכל הליבות. מחזיר מילון: מדד -> מערך אחוזונים בסדר PERCENTILES
+    (לתהליכים ולמערכות - מטריצה אחוזונים × תהליכים), ו-"n_draws".
+
+    האחוזונים הם סטטיסטי סדר (inverted_cdf). ההשפעה על כל תהליך ועל כל מערכת היא
+    פונקציה מונוטונית של גורם אקראי יחיד, ולכן האחוזון שלה הוא הפונקציה של אחוזון
+    הגורם - מדויק, בלי למיין מיליון ערכים לכל תהליך.
+    """
+    sizes = [min(chunk_draws, n_draws - start) for start in range(0, n_draws, chunk_draws)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = ([scenario_type] * len(sizes), [params] * len(sizes), sizes, seeds)
+
+    if workers == 1 or len(sizes) == 1:
+        chunks = list(map(simulate_chunk, *tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(simulate_chunk, *tasks))
+
+    percentiles = {key: np.percentile(np.concatenate([chunk[key] for chunk in chunks]), PERCENTILES,
+                                      method="inverted_cdf").astype(float)
+                   for key in chunks[0]}
+    process_impacts, recovery_times = process_kernel(scenario_type, percentiles["impact_modifier"],
+                                                     percentiles["recovery_modifier"])
+    return {
+        "n_draws": n_draws,
+        "productivity": percentiles["productivity"],
+        "downtime": percentiles["downtime"],
+        "cost": percentiles["cost"],
+        "process_impacts": process_impacts,
+        "recovery_times": recovery_times,
+        "vulnerabilities": vulnerability_kernel(scenario_type, percentiles["vulnerability_modifier"]),
+    }
@@ -0,0 +1,131 @@
+import numpy as np
+
+# הגדרות החיישנים המוצגים בתצוגות זרימת הנתונים
+SENSOR_NAMES = ['טמפרטורה (°C)', 'לחץ (bar)', 'רעידות (mm/s)', 'זרם חשמלי (A)', 'מהירות (RPM)']
+
+# ערכי בסיס וספים
+BASE_VALUES = {
+    'טמפרטורה (°C)': 75,
+    'לחץ (bar)': 120,
+    'רעידות (mm/s)': 2.5,
+    'זרם חשמלי (A)': 80,
+    'מהירות (RPM)': 1750
+}
+
+THRESHOLDS = {
+    'טמפרטורה (°C)': {'warning': 80, 'critical': 85},
+    'לחץ (bar)': {'warning': 130, 'critical': 140},
+    'רעידות (mm/s)': {'warning': 3.0, 'critical': 3.5},
+    'זרם חשמלי (A)': {'warning': 90, 'critical': 95},
+    'מהירות (RPM)': {'warning': 1800, 'critical': 1850}
+}
+
+SENSOR_COLORS = {
+    'טמפרטורה (°C)': 'red',
+    'לחץ (bar)': 'blue',
+    'רעידות (mm/s)': 'orange',
+    'זרם חשמלי (A)': 'purple',
+    'מהירות (RPM)': 'green'
+}
+
+# נקודת ההתערבות במצב אופטימיזציה (חלק יחסי מציר הזמן)
+OPTIMIZATION_FRACTION = 0.7
+
+
+def sensor_arrays(sensor_names=SENSOR_NAMES):
+    """מחזיר מערכי בסיס, סף אזהרה וסף קריטי בסדר החיישנים"""
+    base = np.array([BASE_VALUES[s] for s in sensor_names], dtype=float)
+    warning = np.array([THRESHOLDS[s]['warning'] for s in sensor_names], dtype=float)
+    critical = np.array([THRESHOLDS[s]['critical'] for s in sensor_names], dtype=float)
+    return base, warning, critical
+
+
+def generate_sensor_series(timepoints, with_anomalies=False, optimized=False,
+                           sensor_names=SENSOR_NAMES, rng=None):
+    """מייצר מטריצת ערכי חיישנים (חיישנים × זמן) בפעולות על מערכים שלמים"""
+    rng = np.random.default_rng() if rng is None else rng
+    base, _, _ = sensor_arrays(sensor_names)
+    base = base[:, None]
+
+    # תנודתיות טבעית - מגמה סינוסית ו-5% רעש
+    noise_level = 0.05 * base
+    trend = np.sin(np.linspace(0, 4 * np.pi, timepoints))[None, :] * 0.1 * base
+    values = base + trend + rng.standard_normal((len(sensor_names), timepoints)) * noise_level
+
+    if with_anomalies:
+        inject_anomalies(values, base[:, 0], rng)
+
+    if optimized:
+        damp_after_optimization(values, base[:, 0])
+
+    return values
+
+
+def inject_anomalies(values, base, rng):
+    """מוסיף 2-3 חלונות אנומליה (פיק מעלה או מטה) לכל חיישן, במקום"""
+    n_sensors, timepoints = values.shape
+
+    # אורך החלון נמדד ביחס לסדרה של 100 נקודות, כך שהאנומליה נשארת נראית גם בסדרות ארוכות
+    scale = max(1, timepoints // 100)
+    counts = rng.integers(2, 4, size=n_sensors)
+    sensor_idx = np.repeat(np.arange(n_sensors), counts)
+    n_anomalies = len(sensor_idx)
+
+    starts = rng.integers(10 * scale, timepoints - 20 * scale + 1, size=n_anomalies)
+    lengths = rng.integers(3, 9, size=n_anomalies) * scale
+    upward = rng.random(n_anomalies) > 0.5
+
+    # פריסת כל החלונות לזוגות (חיישן, אינדקס) בפעולה אחת
+    offsets = np.arange(lengths.max())
+    positions = starts[:, None] + offsets[None, :]
+    valid = (offsets[None, :] < lengths[:, None]) & (positions < timepoints)
+    rows = np.broadcast_to(sensor_idx[:, None], positions.shape)[valid]
+    cols = positions[valid]
+
+    peak = np.where(upward, 1.2, 0.85)
+    levels = (base[sensor_idx] * peak)[:, None]
+    levels = np.broadcast_to(levels, positions.shape)[valid]
+    noise = rng.standard_normal(len(rows)) * (0.05 * base[rows] / 2)
+    values[rows, cols] = levels + noise
+    return values
+
+
+def damp_after_optimization(values, base, fraction=OPTIMIZATION_FRACTION):
+    """מקטין את החריגה מהבסיס לאחר נקודת ההתערבות, במקום"""
+    optimization_point = int(values.shape[1] * fraction)
+    tail = values[:, optimization_point:]
+    tail -= base[:, None]
+    tail *= 0.6
+    tail += base[:, None]
+    return values
+
+
+def threshold_masks(values, sensor_names=SENSOR_NAMES):
+    """מחזיר מסכות בוליאניות של נקודות אזהרה ונקודות קריטיות
+
+    values היא מטריצה (חיישנים × זמן), או סדרה חד-ממדית עם חיישן יחיד ב-sensor_names.
+    """
+    _, warning, critical = sensor_arrays(sensor_names)
+    shape = (-1,) + (1,) * (np.ndim(values) - 1)
+    critical_mask = values >= critical.reshape(shape)
+    warning_mask = (values >= warning.reshape(shape)) & ~critical_mask
+    return warning_mask, critical_mask
+
+
+# מחזור המגמה הסינוסית בדגימה לפי זמן מוחלט (12 שעות)
+TREND_PERIOD_SECONDS = 12 * 3600
+
+
+def sample_sensor_values(timestamps_ns, sensor_names=SENSOR_NAMES, rng=None):
+    """מחזיר ערכי חיישנים (חיישנים × זמן) כפונקציה של חותמות זמן מוחלטות
+
+    בניגוד ל-generate_sensor_series המגמה נקבעת לפי הזמן עצמו, כך שאצוות עוקבות
+    מתחברות לסדרה רציפה אחת.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    base, _, _ = sensor_arrays(sensor_names)
+    base = base[:, None]
+    seconds = np.asarray(timestamps_ns, dtype=np.int64) / 1e9
+    trend = np.sin(2 * np.pi * seconds / TREND_PERIOD_SECONDS)[None, :] * 0.1 * base
+    noise = rng.standard_normal((len(sensor_names), len(seconds))) * (0.05 * base)
+    return (base + trend + noise).astype(np.float32)
@@ -0,0 +1,168 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from rollups import RollupStore
+from sensor_series import SENSOR_NAMES, sample_sensor_values
+
+# מרווח דגימה ברירת מחדל ונפח המאגר - חודש שלם של דגימות כל 10 שניות
+SAMPLE_PERIOD_SECONDS = 10
+DEFAULT_CAPACITY = 30 * 24 * 3600 // SAMPLE_PERIOD_SECONDS
+
+NS_PER_SECOND = 1_000_000_000
+_EPOCH = datetime(1970, 1, 1)
+
+
+def local_now_ns():
+    """הזמן המקומי הנוכחי בננו-שניות - אותו שעון שבו הדאשבורד מציג את הנתונים"""
+    return (datetime.now() - _EPOCH) // (datetime.resolution) * 1000
+
+
+class RingBuffer:
+    """מאגר טבעתי בנפח קבוע לחיישן יחיד: חותמות זמן (ns) וערכי float32
+
+    כל דגימה נכתבת פעמיים - במקומה ובמקום המקביל בחצי השני של המערך,
+    כך שכל חלון של הדגימות האחרונות הוא תמיד פרוסה רציפה (view) ללא העתקה.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._timestamps = np.zeros(2 * self.capacity, dtype=np.int64)
+        self._values = np.zeros(2 * self.capacity, dtype=np.float32)
+        self._head = 0  # מיקום הכתיבה הבא בטווח [0, capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp_ns, value):
+        """מוסיף דגימה אחת ב-O(1)"""
+        head = self._head
+        self._timestamps[head] = self._timestamps[head + self.capacity] = timestamp_ns
+        self._values[head] = self._values[head + self.capacity] = value
+        self._head = (head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, timestamps_ns, values):
+        """מוסיף אצווה של דגימות; אצווה הגדולה מהנפח שומרת רק את סופה"""
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float32)[-self.capacity:]
+        n = len(timestamps_ns)
+        if n == 0:
+            return
+
+        # כתיבה בשני קטעים לכל היותר (עד סוף המערך ומההתחלה), לשני העותקים
+        first = min(n, self.capacity - self._head)
+        for offset in (0, self.capacity):
+            start = self._head + offset
+            self._timestamps[start:start + first] = timestamps_ns[:first]
+            self._values[start:start + first] = values[:first]
+            self._timestamps[offset:offset + n - first] = timestamps_ns[first:]
+            self._values[offset:offset + n - first] = values[first:]
+
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def latest(self, n=None):
+        """מחזיר views של n הדגימות האחרונות (ברירת מחדל - כל התוכן)"""
+        n = self._size if n is None else min(int(n), self._size)
+        end = self._head + self.capacity
+        return self._timestamps[end - n:end], self._values[end - n:end]
+
+    def since(self, start_ns):
+        """מחזיר views של כל הדגימות שחותמת הזמן שלהן >= start_ns"""
+        timestamps, values = self.latest()
+        first = np.searchsorted(timestamps, start_ns, side="left")
+        return timestamps[first:], values[first:]
+
+    def last_timestamp(self):
+        """חותמת הזמן של הדגימה האחרונה, או None אם המאגר ריק"""
+        if self._size == 0:
+            return None
+        return int(self._timestamps[self._head + self.capacity - 1])
+
+
+class SensorStore:
+    """אוסף מאגרים טבעתיים - אחד לכל חיישן - עם נעילה לכתיבה מקבילית
+
+    כל כתיבה מעדכנת גם את שכבות הצבירה (RollupStore), כך שטווחים ארוכים נקראים
+    מהן ולא מהדגימות הגולמיות.
+    """
+
+    def __init__(self, sensor_names=SENSOR_NAMES, capacity=DEFAULT_CAPACITY,
+                 sample_period=SAMPLE_PERIOD_SECONDS):
+        self.sensor_names = list(sensor_names)
+        self.sample_period_ns = int(sample_period * NS_PER_SECOND)
+        self.buffers = {name: RingBuffer(capacity) for name in self.sensor_names}
+        self.rollups = RollupStore(self.sensor_names)
+        self.lock = threading.Lock()
+
+    def write(self, sensor, timestamps_ns, values):
+        """כותב אצווה ממוינת למאגר ולשכבות הצבירה של חיישן - הקורא מחזיק את הנעילה"""
+        self.buffers[sensor].extend(timestamps_ns, values)
+        self.rollups.update(sensor, timestamps_ns, values)
+
+    def extend(self, sensor, timestamps_ns, values):
+        """מוסיף אצווה של דגימות לחיישן אחד"""
+        with self.lock:
+            self.write(sensor, timestamps_ns, values)
+
+    def covers(self, sensor, start_ns):
+        """האם המאגר מחזיק את כל הדגימות של חיישן מ-start_ns (לא נדרסו דגימות ישנות יותר)"""
+        with self.lock:
+            buffer = self.buffers[sensor]
+            return len(buffer) < buffer.capacity or buffer.latest()[0][0] <= start_ns
+
+    def load_history(self, history, now_ns):
+        """ממלא את המאגרים מההיסטוריה שעל הדיסק (HistoryStore) - עד נפח המאגר, לפני now_ns"""
+        with self.lock:
+            for name in self.sensor_names:
+                self.write(name, *history.tail(name, self.buffers[name].capacity, now_ns + 1))
+
+    def window(self, sensor, seconds, now_ns):
+        """מחזיר views של חלון הזמן האחרון בגודל seconds עבור חיישן"""
+        with self.lock:
+            return self.buffers[sensor].since(now_ns - int(seconds * NS_PER_SECOND))
+
+    def since(self, sensor, start_ns):
+        """מחזיר views של כל הדגימות של חיישן מחותמת הזמן start_ns ואילך"""
+        with self.lock:
+            return self.buffers[sensor].since(start_ns)
+
+    def rollup_window(self, sensor, seconds, now_ns, min_points):
+        """דליי הצבירה של חלון הזמן מהשכבה הגסה ביותר שנותנת לפחות min_points נקודות
+
+        מחזיר (שם השכבה, עותק של הדליים), או (None, None) כשהדגימות הגולמיות נדרשות.
+        """
+        with self.lock:
+            tier, rows = self.rollups.query(sensor, now_ns - int(seconds * NS_PER_SECOND), now_ns + 1, min_points)
+            # עותק - הדלי הפתוח האחרון ממשיך להתעדכן מחוץ לנעילה
+            return tier, (None if rows is None else rows.copy())
+
+    def advance_synthetic(self, now_ns, rng=None):
+        """משלים דגימות מדומות מהדגימה האחרונה ועד now_ns ומחזיר את מספרן
+
+        במאגר ריק מתמלא כל הנפח לאחור, כך שהגרף מציג היסטוריה כבר בהרצה הראשונה.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        with self.lock:
+            first = self.buffers[self.sensor_names[0]]
+            last = first.last_timestamp()
+            if last is None:
+                n_new = first.capacity
+                last = now_ns - n_new * self.sample_period_ns
+            else:
+                n_new = (now_ns - last) // self.sample_period_ns
+                if n_new > first.capacity:
+                    # פער ארוך מהנפח - מדלגים קדימה ושומרים על יישור לרשת הדגימה
+                    last += (n_new - first.capacity) * self.sample_period_ns
+                    n_new = first.capacity
+            if n_new <= 0:
+                return 0
+
+            timestamps = last + self.sample_period_ns * np.arange(1, n_new + 1, dtype=np.int64)
+            values = sample_sensor_values(timestamps, self.sensor_names, rng)
+            for i, name in enumerate(self.sensor_names):
+                self.write(name, timestamps, values[i])
+            return int(n_new)
@@ -0,0 +1,255 @@
+import numpy as np
+
+from factory_layout import MACHINE_HALF_WIDTH, MACHINE_HEIGHT
+
+# שכבות רמת הפירוט: חיישנים בודדים, אשכול לכל מכונה, אשכול לכל אזור
+LOD_TIERS = {"גבוהה": "sensors", "בינונית": "machines", "נמוכה": "zones"}
+
+# תקציב סמנים לכל צד של המודל ותקציב תיבות מכונה - שומרים על גודל הגרף קבוע
+MARKER_BUDGET = 5_000
+MACHINE_BOX_BUDGET = 1_000
+
+# גודל תא ברשת המרחבית (יחידות מודל)
+GRID_CELL_SIZE = 20.0
+
+# מרווח סביב גבולות אזור בבחירת אזור מפורט
+ZONE_BOUNDS_MARGIN = 3.0
+
+
+class SpatialGrid:
+    """אינדקס מרחבי ברשת אחידה על נקודות במישור XY
+
+    הנקודות ממוינות לפי מזהה התא, כך שכל תא הוא קטע רציף במערך הסדר
+    ושאילתת מלבן קוראת רק את שורות התאים שהמלבן חותך.
+    """
+
+    def __init__(self, x, y, cell_size=GRID_CELL_SIZE):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.cell_size = float(cell_size)
+        self.x0 = float(self.x.min()) if len(self.x) else 0.0
+        self.y0 = float(self.y.min()) if len(self.y) else 0.0
+
+        cell_x, cell_y = self._cell_coords(self.x, self.y)
+        self.nx = int(cell_x.max()) + 1 if len(self.x) else 1
+        self.ny = int(cell_y.max()) + 1 if len(self.y) else 1
+        cell = cell_y * self.nx + cell_x
+
+        self.order = np.argsort(cell, kind="stable")
+        self.cell_start = np.searchsorted(cell[self.order], np.arange(self.nx * self.ny + 1))
+
+    def _cell_coords(self, x, y):
+        cell_x = np.floor((np.asarray(x) - self.x0) / self.cell_size).astype(np.int64)
+        cell_y = np.floor((np.asarray(y) - self.y0) / self.cell_size).astype(np.int64)
+        return cell_x, cell_y
+
+    def query_bbox(self, xmin, ymin, xmax, ymax):
+        """מחזיר (ממוינים) את אינדקסי הנקודות שבתוך המלבן"""
+        (cx0, cx1), (cy0, cy1) = self._cell_coords([xmin, xmax], [ymin, ymax])
+        cx0, cx1 = max(cx0, 0), min(cx1, self.nx - 1)
+        cy0, cy1 = max(cy0, 0), min(cy1, self.ny - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return np.empty(0, dtype=np.int64)
+
+        # כל שורת תאים בטווח היא קטע רציף אחד במערך הסדר
+        rows = np.arange(cy0, cy1 + 1) * self.nx
+        chunks = [self.order[self.cell_start[row + cx0]:self.cell_start[row + cx1 + 1]] for row in rows]
+        candidates = np.concatenate(chunks)
+
+        inside = ((self.x[candidates] >= xmin) & (self.x[candidates] <= xmax)
+                  & (self.y[candidates] >= ymin) & (self.y[candidates] <= ymax))
+        return np.sort(candidates[inside])
+
+
+def zone_bounds(layout, zone):
+    """מלבן התוחם את מכונות האזור (כולל שוליים לחיישנים)"""
+    in_zone = layout.machine_zone == zone
+    margin = MACHINE_HALF_WIDTH + ZONE_BOUNDS_MARGIN
+    return (layout.machine_x[in_zone].min() - margin, layout.machine_y[in_zone].min() - margin,
+            layout.machine_x[in_zone].max() + margin, layout.machine_y[in_zone].max() + margin)
+
+
+def aggregate_clusters(group, n_groups, x, y, z, status, n_statuses=3):
+    """מאגד נקודות לאשכולות: מרכז, כמות, ספירה לפי מצב והמצב החמור ביותר"""
+    count = np.bincount(group, minlength=n_groups)
+    safe_count = np.maximum(count, 1)
+    status_counts = np.bincount(group * n_statuses + status,
+                                minlength=n_groups * n_statuses).reshape(n_groups, n_statuses)
+
+    # המצב החמור ביותר באשכול - המצב הגבוה ביותר שיש בו לפחות חיישן אחד
+    worst = n_statuses - 1 - np.argmax(status_counts[:, ::-1] > 0, axis=1)
+
+    present = np.flatnonzero(count)
+    return {
+        'group': present,
+        'x': (np.bincount(group, weights=x, minlength=n_groups) / safe_count)[present],
+        'y': (np.bincount(group, weights=y, minlength=n_groups) / safe_count)[present],
+        'z': (np.bincount(group, weights=z, minlength=n_groups) / safe_count)[present],
+        'count': count[present],
+        'status_counts': status_counts[present],
+        'status': worst[present],
+    }
+
+
+def cluster_marker_size(count):
+    """גודל סמן לאשכול - גדל לוגריתמית עם מספר החיישנים"""
+    return np.clip(8 + 3 * np.log2(np.maximum(count, 1)), 8, 30)
+
+
+def _sensor_markers(layout, indices, x, y, z, status):
+    machines = layout.machine_names[layout.sensor_machine[indices]]
+    return {
+        'x': x[indices],
+        'y': y[indices],
+        'z': z[indices],
+        'status': status[indices],
+        'size': np.full(len(indices), 8.0),
+        'text': [f'חיישן {i + 1} · {m}' for i, m in zip(indices, machines)],
+    }
+
+
+def _cluster_markers(names, clusters, status_labels):
+    counts = clusters['status_counts']
+    return {
+        'x': clusters['x'],
+        'y': clusters['y'],
+        'z': clusters['z'],
+        'status': clusters['status'],
+        'size': cluster_marker_size(clusters['count']),
+        'text': [
+            f'{name}: {total} חיישנים · ' + ' · '.join(f'{c} {label}' for c, label in zip(row, status_labels))
+            for name, total, row in zip(names[clusters['group']], clusters['count'], counts)
+        ],
+    }
+
+
+def _concat_markers(*parts):
+    parts = [part for part in parts if part is not None and len(part['x'])]
+    if not parts:
+        return {key: np.empty(0) for key in ('x', 'y', 'z', 'status', 'size')} | {'text': []}
+    merged = {key: np.concatenate([part[key] for part in parts]) for key in ('x', 'y', 'z', 'status', 'size')}
+    merged['text'] = [text for part in parts for text in part['text']]
+    return merged
+
+
+def _stride_sample(indices, budget):
+    if len(indices) <= budget:
+        return indices
+    return indices[np.linspace(0, len(indices) - 1, budget).astype(np.int64)]
+
+
+def lod_markers(layout, grid, sensor_x, sensor_y, sensor_z, status, detail_level,
+                status_labels, focus_zone=None, budget=MARKER_BUDGET):
+    """מחזיר את סמני החיישנים לתצוגה לפי שכבת הפירוט, בתוך תקציב הסמנים
+
+    ברמה גבוהה מוצגים חיישנים בודדים - באזור הנבחר בלבד כשהמפעל חורג מהתקציב,
+    ושאר המפעל מוצג כאשכולות מכונה (או אזור, אם גם הם חורגים מהתקציב).
+    """
+    tier = LOD_TIERS[detail_level]
+    machine_zone = layout.machine_zone
+    zone_names = np.array(layout.zone_names)
+    n_zones = len(zone_names)
+
+    def clusters_by_machine(sensor_mask):
+        group = layout.sensor_machine[sensor_mask]
+        clusters = aggregate_clusters(group, layout.n_machines, sensor_x[sensor_mask],
+                                      sensor_y[sensor_mask], sensor_z[sensor_mask], status[sensor_mask])
+        return _cluster_markers(layout.machine_names, clusters, status_labels)
+
+    def clusters_by_zone(sensor_mask):
+        group = machine_zone[layout.sensor_machine[sensor_mask]]
+        clusters = aggregate_clusters(group, n_zones, sensor_x[sensor_mask],
+                                      sensor_y[sensor_mask], sensor_z[sensor_mask], status[sensor_mask])
+        return _cluster_markers(zone_names, clusters, status_labels)
+
+    all_sensors = np.ones(layout.n_sensors, dtype=bool)
+
+    if tier == "zones":
+        return clusters_by_zone(all_sensors)
+
+    if tier == "machines":
+        if layout.n_machines <= budget:
+            return clusters_by_machine(all_sensors)
+        return clusters_by_zone(all_sensors)
+
+    # שכבת חיישנים בודדים
+    if focus_zone is None:
+        if layout.n_sensors <= budget:
+            return _sensor_markers(layout, np.arange(layout.n_sensors), sensor_x, sensor_y, sensor_z, status)
+        if layout.n_machines <= budget:
+            return clusters_by_machine(all_sensors)
+        return clusters_by_zone(all_sensors)
+
+    # פירוט מלא רק בתוך גבולות האזור הנבחר (שאילתה על האינדקס המרחבי)
+    detail_idx = grid.query_bbox(*zone_bounds(layout, focus_zone))
+    detail_idx = _stride_sample(detail_idx, budget // 2)
+    outside = all_sensors.copy()
+    outside[detail_idx] = False
+
+    # שאר המפעל - אשכולות מכונה אם נכנסים ביתרת התקציב, אחרת אשכולות אזור
+    remaining_machines = np.unique(layout.sensor_machine[outside]).size
+    if remaining_machines <= budget - len(detail_idx):
+        context = clusters_by_machine(outside)
+    else:
+        context = clusters_by_zone(outside)
+    detail = _sensor_markers(layout, detail_idx, sensor_x, sensor_y, sensor_z, status)
+    return _concat_markers(detail, context)
+
+
+def lod_machine_boxes(layout, focus_zone=None, budget=MACHINE_BOX_BUDGET):
+    """מחזיר את התיבות לשרטוט: כל המכונות, או - במפעל גדול - אזורים כתיבות שטוחות
+    ומכונות בודדות רק באזור הנבחר
+
+    מחזיר מילון עם מרכזי תיבות, חצאי רוחב, גבהים, מזהה צבע ותווית לכל תיבה.
+    """
+    n = layout.n_machines
+    if n <= budget:
+        return {
+            'x': layout.machine_x, 'y': layout.machine_y, 'z': layout.machine_z,
+            'half_x': np.full(n, MACHINE_HALF_WIDTH, dtype=float),
+            'half_y': np.full(n, MACHINE_HALF_WIDTH, dtype=float),
+            'height': np.full(n, MACHINE_HEIGHT, dtype=float),
+            'color': np.arange(n),
+            'label': np.asarray(layout.machine_names),
+        }
+
+    machine_zone = layout.machine_zone
+    n_zones = len(layout.zone_names)
+    zones = np.arange(n_zones)
+    if focus_zone is not None:
+        zones = zones[zones != focus_zone]
+
+    # תיבת אזור - מלבן התוחם את מכונות האזור, בגובה חצי מכונה
+    xmin = np.full(n_zones, np.inf)
+    ymin = np.full(n_zones, np.inf)
+    xmax = np.full(n_zones, -np.inf)
+    ymax = np.full(n_zones, -np.inf)
+    np.minimum.at(xmin, machine_zone, layout.machine_x)
+    np.minimum.at(ymin, machine_zone, layout.machine_y)
+    np.maximum.at(xmax, machine_zone, layout.machine_x)
+    np.maximum.at(ymax, machine_zone, layout.machine_y)
+
+    boxes = {
+        'x': (xmin[zones] + xmax[zones]) / 2,
+        'y': (ymin[zones] + ymax[zones]) / 2,
+        'z': np.zeros(len(zones)),
+        'half_x': (xmax[zones] - xmin[zones]) / 2 + MACHINE_HALF_WIDTH,
+        'half_y': (ymax[zones] - ymin[zones]) / 2 + MACHINE_HALF_WIDTH,
+        'height': np.full(len(zones), MACHINE_HEIGHT / 2),
+        'color': zones,
+        'label': np.array(layout.zone_names)[zones],
+    }
+
+    if focus_zone is not None:
+        focus = np.flatnonzero(machine_zone == focus_zone)[:budget]
+        boxes = {
+            'x': np.concatenate([boxes['x'], layout.machine_x[focus]]),
+            'y': np.concatenate([boxes['y'], layout.machine_y[focus]]),
+            'z': np.concatenate([boxes['z'], layout.machine_z[focus]]),
+            'half_x': np.concatenate([boxes['half_x'], np.full(len(focus), MACHINE_HALF_WIDTH, dtype=float)]),
+            'half_y': np.concatenate([boxes['half_y'], np.full(len(focus), MACHINE_HALF_WIDTH, dtype=float)]),
+            'height': np.concatenate([boxes['height'], np.full(len(focus), MACHINE_HEIGHT, dtype=float)]),
+            'color': np.concatenate([boxes['color'], focus]),
+            'label': np.concatenate([boxes['label'], np.asarray(layout.machine_names)[focus]]),
+        }
+    return boxes
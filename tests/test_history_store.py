@@ -0,0 +1,136 @@
+"""שחזור ההיסטוריה שעל הדיסק אחרי קריסה, וגישה מקבילה של תהליכון הקליטה והקוראים"""
+import threading
+
+import numpy as np
+import pytest
+
+from history_store import INDEX_FORMAT, NS_PER_DAY, HistoryStore
+from sensor_series import SENSOR_NAMES
+
+SENSOR = SENSOR_NAMES[0]
+DAY = 20_000
+N = 2_000
+
+
+@pytest.fixture
+def stored(tmp_path):
+    """מקטע יומי אחד עם N רשומות מאושרות; מחזיר (תיקייה, מקטע, חותמות זמן, ערכים)"""
+    timestamps = DAY * NS_PER_DAY + np.arange(N, dtype=np.int64) * 10**10
+    values = np.arange(N, dtype=np.float32)
+    history = HistoryStore(tmp_path)
+    history.append(SENSOR, timestamps, values)
+    history.close()
+    return tmp_path, history._segments[SENSOR][DAY], timestamps, values
+
+
+def read_all(history, timestamps):
+    return history.read(SENSOR, timestamps[0], timestamps[-1] + 1)
+
+
+def test_clean_reopen(stored):
+    root, _, timestamps, values = stored
+    history = HistoryStore(root)
+    stored_timestamps, stored_values = read_all(history, timestamps)
+    assert history.recovered == 0
+    assert np.array_equal(stored_timestamps, timestamps) and np.array_equal(stored_values, values)
+
+
+def test_torn_tail_is_truncated(stored):
+    # קריסה באמצע כתיבת רשומה: בתים חלקיים בסוף שתי העמודות, והאינדקס לא עודכן
+    root, segment, timestamps, values = stored
+    with open(segment.ts_path, "ab") as f:
+        f.write(b"\x01" * 13)
+    with open(segment.val_path, "ab") as f:
+        f.write(b"\x02" * 6)
+
+    history = HistoryStore(root)
+    stored_timestamps, stored_values = read_all(history, timestamps)
+    assert history.recovered == 1
+    assert np.array_equal(stored_timestamps, timestamps) and np.array_equal(stored_values, values)
+    assert segment.ts_path.stat().st_size == N * 8
+    assert segment.val_path.stat().st_size == N * 4
+
+
+def test_stale_index_drops_unconfirmed_records(stored):
+    # העמודות נשמרו אבל הקריסה קדמה לעדכון האינדקס - הרשומות הללו אינן מאושרות
+    root, segment, timestamps, values = stored
+    extra = timestamps[-1] + np.arange(1, 6, dtype=np.int64) * 10**10
+    with open(segment.ts_path, "ab") as f:
+        f.write(extra.tobytes())
+    with open(segment.val_path, "ab") as f:
+        f.write(np.zeros(5, dtype=np.float32).tobytes())
+
+    history = HistoryStore(root)
+    assert history.recovered == 5
+    assert history.last_timestamp(SENSOR) == timestamps[-1]
+    assert np.array_equal(read_all(history, timestamps)[0], timestamps)
+    # הכתיבה ממשיכה מהרשומה המאושרת האחרונה
+    assert history.append(SENSOR, extra, np.ones(5, dtype=np.float32)) == 5
+    assert np.array_equal(history.read(SENSOR, timestamps[0], extra[-1] + 1)[1][-5:], np.ones(5))
+    history.close()
+
+
+def test_index_ahead_of_columns_is_clamped(stored):
+    # האינדקס מאשר יותר ממה שנשמר בעמודת הזמנים - מתוקן לאורך העמודה הקצרה
+    root, segment, timestamps, values = stored
+    with open(segment.ts_path, "r+b") as f:
+        f.truncate((N - 3) * 8)
+
+    history = HistoryStore(root)
+    assert history.last_timestamp(SENSOR) == timestamps[-4]
+    assert INDEX_FORMAT.unpack(segment.idx_path.read_bytes())[0] == N - 3
+    assert history.append(SENSOR, timestamps[-3:], values[-3:]) == 3
+    stored_timestamps, stored_values = read_all(history, timestamps)
+    assert np.array_equal(stored_timestamps, timestamps) and np.array_equal(stored_values, values)
+    history.close()
+
+
+def test_missing_index_is_rebuilt(stored):
+    root, segment, timestamps, values = stored
+    segment.idx_path.unlink()
+
+    history = HistoryStore(root)
+    stored_timestamps, stored_values = read_all(history, timestamps)
+    assert history.recovered == 0
+    assert np.array_equal(stored_timestamps, timestamps) and np.array_equal(stored_values, values)
+    assert INDEX_FORMAT.unpack(segment.idx_path.read_bytes()) == (N, timestamps[0], timestamps[-1])
+
+
+def test_empty_index_confirms_nothing(stored):
+    # קובץ האינדקס נוצר אבל הקריסה קדמה לאישור הראשון - אין רשומות מאושרות
+    root, segment, timestamps, _ = stored
+    segment.idx_path.write_bytes(b"")
+
+    history = HistoryStore(root)
+    assert history.recovered == N
+    assert history.last_timestamp(SENSOR) is None
+    assert len(read_all(history, timestamps)[0]) == 0
+
+
+def test_readers_during_day_rollover(tmp_path):
+    # תהליכון הקליטה פותח מקטע ליום חדש בכל אצווה בזמן שהקוראים עוברים על המקטעים
+    history = HistoryStore(tmp_path)
+    errors = []
+    done = threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                history.tail(SENSOR, 100, 10**20)
+                history.read_segments(SENSOR, 0, 10**20)
+        except Exception as error:  # noqa: BLE001 - כל חריגה בקורא היא כישלון הבדיקה
+            errors.append(error)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    try:
+        for day in range(DAY, DAY + 200):
+            history.append(SENSOR, day * NS_PER_DAY + np.arange(3, dtype=np.int64), np.zeros(3))
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    history.close()
+    assert not errors
+    assert len(history.tail(SENSOR, 10**6, 10**20)[0]) == 600
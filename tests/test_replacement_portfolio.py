@@ -0,0 +1,37 @@
+"""תכנון תיק ההחלפות בקצוות: צי ריק ותקציב אפס"""
+import numpy as np
+import pytest
+
+from asset_lifecycle import fleet_lifecycle, generate_fleet
+from replacement_portfolio import PLANNING_YEARS, plan_replacements
+
+
+@pytest.fixture(scope="module")
+def fleet():
+    fleet = generate_fleet(500)
+    return fleet, fleet_lifecycle(fleet)
+
+
+def test_empty_fleet(fleet):
+    # כל הקטגוריות הוסרו מהסינון - אין נכסים ולכן גם התקציב הוא אפס
+    fleet, lifecycle = fleet
+    plan = plan_replacements(fleet.iloc[:0], lifecycle.iloc[:0], annual_budget=0.0)
+    assert len(plan.year) == 0 and plan.total_cost == 0.0
+    assert plan.gap == 0.0
+    assert np.array_equal(plan.capex, np.zeros(PLANNING_YEARS))
+
+
+def test_zero_budget_defers_everything(fleet):
+    fleet, lifecycle = fleet
+    with np.errstate(all="raise"):
+        plan = plan_replacements(fleet, lifecycle, annual_budget=0.0)
+    assert (plan.year == PLANNING_YEARS).all()
+    assert plan.capex.sum() == 0 and np.isfinite(plan.gap)
+
+
+def test_year_without_budget(fleet):
+    fleet, lifecycle = fleet
+    budget = np.full(PLANNING_YEARS, 0.05 * lifecycle["replacement_cost"].sum())
+    budget[0] = 0.0
+    plan = plan_replacements(fleet, lifecycle, annual_budget=budget)
+    assert plan.capex[0] == 0 and (plan.capex <= budget).all()